@@ -14,6 +14,114 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-# (opcjonalnie) zmienne dla Ollama, jeśli używasz:
-# OLLAMA_API_URL = os.getenv("OLLAMA_API_URL")
-# OLLAMA_MODEL_NAME = os.getenv("OLLAMA_MODEL_NAME")
+# Pula połączeń HTTP współdzielonego klienta Supabase (PostgREST + Auth)
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+SUPABASE_POOL_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+
+# Weryfikacja tokenów dostępu: "remote" (auth.get_user przy każdym żądaniu) lub "local"
+# (podpis i ważność sprawdzane lokalnie: HS256 z SUPABASE_JWT_SECRET albo klucze z JWKS)
+SUPABASE_JWT_VERIFICATION = os.getenv("SUPABASE_JWT_VERIFICATION", "remote")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWKS_CACHE_TTL = float(os.getenv("JWKS_CACHE_TTL", "600"))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+# Co ile sekund token z cache jest ponownie sprawdzany w Supabase (unieważnienie sesji)
+AUTH_REVOCATION_CHECK_INTERVAL = float(os.getenv("AUTH_REVOCATION_CHECK_INTERVAL", "60"))
+# Dostęp do GET /metrics (wewnętrzne dane o backendach i kolejce): wymaga nagłówka "Authorization: Bearer <METRICS_TOKEN>";
+# pusty token wyłącza endpoint
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Zmienne dla Ollama
+OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
+OLLAMA_MODEL_NAME = os.getenv("OLLAMA_MODEL_NAME", "mistral")
+# Mniejszy, szybszy model dla małych zapytań (pusty = zawsze OLLAMA_MODEL_NAME); trafiają do niego
+# teksty do OLLAMA_DRAFT_MAX_CHARS znaków z co najwyżej OLLAMA_DRAFT_MAX_COUNT fiszkami
+OLLAMA_DRAFT_MODEL_NAME = os.getenv("OLLAMA_DRAFT_MODEL_NAME", "")
+OLLAMA_DRAFT_MAX_CHARS = int(os.getenv("OLLAMA_DRAFT_MAX_CHARS", "1500"))
+OLLAMA_DRAFT_MAX_COUNT = int(os.getenv("OLLAMA_DRAFT_MAX_COUNT", "5"))
+# Lista serwerów Ollama rozdzielona przecinkami (pusta = tylko OLLAMA_API_URL)
+OLLAMA_API_URLS = [url.strip().rstrip("/") for url in os.getenv("OLLAMA_API_URLS", "").split(",") if url.strip()]
+OLLAMA_HEALTH_CHECK_INTERVAL = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", "15"))
+# Po tylu kolejnych błędach serwer jest wyłączany z puli na OLLAMA_EJECT_SECONDS sekund
+OLLAMA_EJECT_AFTER_FAILURES = int(os.getenv("OLLAMA_EJECT_AFTER_FAILURES", "3"))
+OLLAMA_EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+
+# Współdzielony klient HTTP dla Ollama (pula połączeń keep-alive i limity czasu)
+OLLAMA_POOL_MAX_CONNECTIONS = int(os.getenv("OLLAMA_POOL_MAX_CONNECTIONS", "10"))
+OLLAMA_POOL_MAX_KEEPALIVE = int(os.getenv("OLLAMA_POOL_MAX_KEEPALIVE", "5"))
+OLLAMA_POOL_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_POOL_KEEPALIVE_EXPIRY", "60"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "60"))
+
+# Cache wyników generowania (klucz: hash znormalizowanego tekstu + model + liczba fiszek)
+GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", "256"))
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", "86400"))
+# Ścieżka do pliku SQLite dla cache na dysku (pusta = tylko pamięć)
+GENERATION_CACHE_DB = os.getenv("GENERATION_CACHE_DB", "")
+GENERATION_CACHE_DB_MAX_BYTES = int(os.getenv("GENERATION_CACHE_DB_MAX_BYTES", str(50 * 1024 * 1024)))
+# Liczba kontekstów Ollama przechowywanych dla akcji "generuj więcej" (LRU)
+GENERATION_CONTEXT_SIZE = int(os.getenv("GENERATION_CONTEXT_SIZE", "128"))
+
+# Czyszczenie tekstu źródłowego przed generowaniem (białe znaki, nagłówki/stopki, powtórzone akapity)
+PREPROCESS_TEXT = os.getenv("PREPROCESS_TEXT", "true").lower() == "true"
+
+# Wykrywanie prawie identycznych pytań przed zapisem zestawu (podobieństwo kosinusowe n-gramów znakowych)
+DETECT_DUPLICATES = os.getenv("DETECT_DUPLICATES", "true").lower() == "true"
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.getenv("DUPLICATE_SIMILARITY_THRESHOLD", "0.85"))
+# Indeks LSH pytań użytkownika jest trzymany w pamięci (LRU) i przebudowywany po tylu sekundach,
+# żeby zmiany wprowadzone poza zapisem nowego zestawu (edycja, import) też zostały uwzględnione
+DUPLICATE_INDEX_CACHE_SIZE = int(os.getenv("DUPLICATE_INDEX_CACHE_SIZE", "128"))
+DUPLICATE_INDEX_TTL = float(os.getenv("DUPLICATE_INDEX_TTL", "600"))
+
+# Długie teksty są dzielone na fragmenty generowane równolegle
+OLLAMA_CHUNK_MAX_CHARS = int(os.getenv("OLLAMA_CHUNK_MAX_CHARS", "4000"))
+OLLAMA_CHUNK_CONCURRENCY = int(os.getenv("OLLAMA_CHUNK_CONCURRENCY", "2"))
+# Bezpiecznik: po tylu kolejnych błędach Ollama zapytania są od razu odrzucane przez OLLAMA_BREAKER_COOLDOWN sekund
+OLLAMA_BREAKER_FAILURES = int(os.getenv("OLLAMA_BREAKER_FAILURES", "5"))
+OLLAMA_BREAKER_COOLDOWN = float(os.getenv("OLLAMA_BREAKER_COOLDOWN", "30"))
+# Adaptacyjny limit odczytu: percentyl zaobserwowanych czasów (na jednostkę pracy) razy mnożnik, w granicach min-max
+OLLAMA_TIMEOUT_PERCENTILE = float(os.getenv("OLLAMA_TIMEOUT_PERCENTILE", "95"))
+OLLAMA_TIMEOUT_MULTIPLIER = float(os.getenv("OLLAMA_TIMEOUT_MULTIPLIER", "2"))
+OLLAMA_TIMEOUT_MIN = float(os.getenv("OLLAMA_TIMEOUT_MIN", "10"))
+OLLAMA_TIMEOUT_MAX = float(os.getenv("OLLAMA_TIMEOUT_MAX", "180"))
+# Ile razy dogenerować brakujące fiszki, gdy model zwróci ich mniej niż zamówiono
+OLLAMA_TOP_UP_ATTEMPTS = int(os.getenv("OLLAMA_TOP_UP_ATTEMPTS", "1"))
+# Jak długo Ollama ma trzymać model w pamięci po zapytaniu: czas z jednostką ("30m", "1h30m") albo liczba sekund
+# ("1.5" jest wysyłane jako "1500ms"; -1 = bez limitu). Błędna wartość zatrzymuje start aplikacji
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Załadowanie modelu przy starcie aplikacji i okresowe odświeżanie go przed wygaśnięciem keep_alive
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+# Ładowanie dużego modelu z dysku może trwać dłużej niż zwykły limit odczytu
+OLLAMA_WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", "300"))
+# Wysyłanie schematu JSON odpowiedzi jako "format" (ograniczone dekodowanie po stronie Ollama)
+OLLAMA_STRUCTURED_OUTPUT = os.getenv("OLLAMA_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+# Import zestawów z plików: liczba fiszek wstawianych jednym zapytaniem i maksymalna długość pola
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_FIELD_CHARS = int(os.getenv("IMPORT_MAX_FIELD_CHARS", "2000"))
+# Eksport biblioteki: liczba fiszek pobieranych z bazy jednym zapytaniem (stronicowanie po kluczu)
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+# Liczba zestawów na jednej stronie dashboardu (kolejne doładowywane przycisk "Pokaż więcej")
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "20"))
+
+# Co ile sekund sprawdzać, czy klient czekający na generowanie nie rozłączył się
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+# Kolejka zadań generowania: liczba równoległych wywołań Ollama i maksymalna długość kolejki
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "2"))
+GENERATION_QUEUE_MAX = int(os.getenv("GENERATION_QUEUE_MAX", "20"))
+# Sprawiedliwy podział kolejki: limit zadań jednego użytkownika w kolejce (0 = bez limitu)
+# i wagi wybranych użytkowników/klientów API w postaci "id:waga,id:waga" (domyślna waga to 1)
+GENERATION_QUEUE_MAX_PER_USER = int(os.getenv("GENERATION_QUEUE_MAX_PER_USER", "5"))
+GENERATION_USER_WEIGHTS = os.getenv("GENERATION_USER_WEIGHTS", "")
+# Limit zleceń generowania na użytkownika (token bucket): tyle na minutę, z chwilowym zapasem RATE_BURST (0 = bez limitu)
+GENERATION_RATE_PER_MINUTE = float(os.getenv("GENERATION_RATE_PER_MINUTE", "20"))
+GENERATION_RATE_BURST = int(os.getenv("GENERATION_RATE_BURST", "10"))
+# Plik SQLite ze stanem zadań. Trwałość jest opcjonalna: pusta wartość (domyślnie) to baza w pamięci procesu,
+# więc po restarcie serwera stan i wyniki zadań są tracone - ustaw ścieżkę pliku, żeby je zachować
+GENERATION_JOBS_DB = os.getenv("GENERATION_JOBS_DB", "")
+GENERATION_JOB_TTL = float(os.getenv("GENERATION_JOB_TTL", "3600"))
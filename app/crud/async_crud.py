@@ -0,0 +1,461 @@
+"""
+This module provides asynchronous Create, Read, Update, and Delete (CRUD) operations
+for the Supabase tables related to flashcards and flashcard sets.
+
+It mirrors `app.crud.crud`, but runs on the async Supabase client, so route handlers
+can await database round trips instead of blocking the event loop.
+"""
+
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from postgrest.types import ReturnMethod
+from supabase import AClient
+from app.crud.crud import is_not_found, is_unique_violation
+from app.schemas.schemas import FlashcardSetCreate, FlashcardCreate
+from fastapi import HTTPException, status
+from typing import AsyncIterator, Optional, Tuple, Union, Dict, Any, List
+
+async def create_flashcard_set(supabase: AClient, set_data: FlashcardSetCreate, user_id: str) -> Dict[str, Any]:
+    """Creates a new flashcard set and its associated flashcards in the database.
+
+    The set and all its flashcards are inserted in one transaction by the `create_flashcard_set`
+    database function (see `supabase/migrations`), called with a single RPC. Uniqueness of the
+    set name per user is enforced by the `(user_id, name)` unique constraint, so a failed insert
+    leaves nothing behind and no separate existence check is needed.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param set_data: The data for the flashcard set to be created, including its name and a list of flashcards.
+    :type set_data: FlashcardSetCreate
+    :param user_id: The ID of the user who is creating the flashcard set.
+    :type user_id: str
+    :raises HTTPException: If `user_id` is missing or if the set cannot be created.
+    :raises ValueError: If the set name is empty or a set with the same name already exists for the user.
+    :returns: A dictionary representing the newly created flashcard set, including its ID and inserted flashcards.
+    :rtype: Dict[str, Any]
+    :dependencies:
+        - `supabase`: For database operations.
+        - `app.schemas.schemas.FlashcardSetCreate`: For input data validation.
+    """
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Brak user_id")
+
+    set_name = set_data.name.strip()
+    if not set_name:
+        raise ValueError("Nazwa zestawu nie może być pusta.")
+
+    flashcards_to_insert = [
+        {'question': fc.question.strip(), 'answer': fc.answer.strip()}
+        for fc in set_data.flashcards
+        if fc.question.strip() and fc.answer.strip()
+    ]
+
+    try:
+        response = await supabase.rpc('create_flashcard_set', {
+            'p_user_id': user_id,
+            'p_name': set_name,
+            'p_flashcards': flashcards_to_insert
+        }).execute()
+    except Exception as e:
+        if is_unique_violation(e):
+            raise ValueError(f"Zestaw o nazwie '{set_name}' już istnieje.")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Błąd: {str(e)}")
+
+    new_set = response.data
+    if not new_set:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Nie udało się utworzyć zestawu")
+
+    return {
+        'id': new_set['id'],
+        'name': new_set['name'],
+        'user_id': new_set['user_id'],
+        'created_at': new_set.get('created_at'),
+        'flashcards': new_set.get('flashcards') or []
+    }
+
+async def add_flashcards(supabase: AClient, set_id: Union[str, int], flashcards: List[FlashcardCreate]) -> int:
+    """Inserts a batch of flashcards into an existing set with a single request.
+
+    The set must already be owned by the caller (e.g. created by `create_flashcard_set` in
+    the same import); ownership is not checked again for every batch.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param set_id: The ID of the set the flashcards are added to.
+    :type set_id: Union[str, int]
+    :param flashcards: The flashcards to insert.
+    :type flashcards: List[FlashcardCreate]
+    :raises HTTPException: If the insert fails.
+    :returns: The number of inserted flashcards.
+    :rtype: int
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    if not flashcards:
+        return 0
+    rows = [{'set_id': set_id, 'question': fc.question, 'answer': fc.answer} for fc in flashcards]
+    try:
+        # Bez zwracania wstawionych wierszy - przy dużych importach to zbędny transfer
+        await supabase.table('flashcards').insert(rows, returning=ReturnMethod.minimal).execute()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Nie udało się dodać fiszek: {str(e)}")
+    return len(rows)
+
+async def get_flashcard_set(supabase: AClient, set_id: Union[str, int], user_id: str) -> Union[Dict[str, Any], None]:
+    """Retrieves a single flashcard set by its ID, ensuring it belongs to the specified user.
+
+    Includes all associated flashcards within the returned set data.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param set_id: The ID of the flashcard set to retrieve.
+    :type set_id: Union[str, int]
+    :param user_id: The ID of the user who owns the flashcard set.
+    :type user_id: str
+    :returns: A dictionary representing the flashcard set, or `None` if not found or not owned by the user.
+    :rtype: Union[Dict[str, Any], None]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    response = await supabase.table('flashcard_sets').select('*, flashcards(*)').eq('id', set_id).eq('user_id', user_id).execute()
+    if not response.data:
+        return None
+    return response.data[0]
+
+async def get_flashcard_sets(supabase: AClient, user_id: str) -> List[Dict[str, Any]]:
+    """Retrieves all flashcard sets for a given user.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param user_id: The ID of the user whose flashcard sets are to be retrieved.
+    :type user_id: str
+    :returns: A list of dictionaries, each representing a flashcard set. Returns an empty list if no sets are found.
+    :rtype: List[Dict[str, Any]]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    response = await supabase.table('flashcard_sets').select('*').eq('user_id', user_id).execute()
+    return response.data or []
+
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row['created_at'], row['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor: str) -> Tuple[str, Union[str, int]]:
+    # Wartości z kursora trafiają do filtra PostgREST, więc muszą być znacznikiem czasu i identyfikatorem
+    try:
+        created_at, set_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        datetime.fromisoformat(created_at)
+        if not isinstance(set_id, int):
+            set_id = str(UUID(set_id))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Niepoprawny kursor stronicowania.")
+    return created_at, set_id
+
+async def get_flashcard_sets_page(
+    supabase: AClient, user_id: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Retrieves one page of a user's flashcard sets, newest first, with their card counts.
+
+    Pages are cut with keyset pagination on `(created_at, id)` instead of an offset, so every
+    page costs the same single query however many sets the user has. The card count comes from
+    PostgREST's aggregate embedding (`flashcards(count)`) in that same query.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param user_id: The ID of the user whose flashcard sets are to be retrieved.
+    :type user_id: str
+    :param limit: The maximum number of sets on the page.
+    :type limit: int
+    :param cursor: The `next_cursor` returned with the previous page, or `None` for the first page.
+    :type cursor: Optional[str]
+    :raises ValueError: If the cursor is malformed.
+    :returns: The sets on the page (`id`, `name`, `created_at`, `card_count`) and the cursor
+              of the next page, or `None` if this is the last one.
+    :rtype: Tuple[List[Dict[str, Any]], Optional[str]]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    query = supabase.table('flashcard_sets')\
+        .select('id, name, created_at, flashcards(count)')\
+        .eq('user_id', user_id)
+    if cursor:
+        created_at, set_id = _decode_cursor(cursor)
+        # Znacznik czasu zawiera znaki zastrzeżone w składni filtrów PostgREST, więc idzie w cudzysłowie
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{set_id})')
+    # Jeden wiersz ponad limit mówi, czy istnieje następna strona
+    response = await query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute()
+    rows = response.data or []
+
+    sets = [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'created_at': row['created_at'],
+            'card_count': (row.get('flashcards') or [{}])[0].get('count', 0)
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = _encode_cursor(sets[-1]) if len(rows) > limit else None
+    return sets, next_cursor
+
+async def get_user_flashcards(supabase: AClient, user_id: str, page_size: int = 1000) -> List[Dict[str, Any]]:
+    """Retrieves the questions of all flashcards in all sets of a given user.
+
+    The rows are fetched page by page with `iter_user_flashcard_pages`, so the result is not cut
+    short by the PostgREST `max-rows` limit (1000 rows by default) on large libraries.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param user_id: The ID of the user whose flashcards are to be retrieved.
+    :type user_id: str
+    :param page_size: The maximum number of flashcards per query; must not exceed `max-rows`.
+    :type page_size: int
+    :returns: A list of dictionaries with the flashcard `id`, `question`, `set_id` and the set's `name`
+              under `flashcard_sets`. Returns an empty list if the user has no flashcards.
+    :rtype: List[Dict[str, Any]]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    flashcards: List[Dict[str, Any]] = []
+    async for page in iter_user_flashcard_pages(supabase, user_id, page_size):
+        flashcards.extend(page)
+    return flashcards
+
+async def iter_user_flashcard_pages(supabase: AClient, user_id: str, page_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Pages through all flashcards of all sets of a given user, grouped by set.
+
+    Uses keyset pagination on `(set_id, id)`: every page continues after the last row of the
+    previous one, so each query costs the same regardless of how deep into the library it is,
+    and only one page is held in memory at a time. Sets without flashcards are not returned
+    (the export uses `iter_user_set_export`, which includes them).
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param user_id: The ID of the user whose flashcards are to be retrieved.
+    :type user_id: str
+    :param page_size: The maximum number of flashcards per page.
+    :type page_size: int
+    :returns: An async iterator of pages; each row has the flashcard `id`, `set_id`, `question`,
+              `answer` and the set's `name` under `flashcard_sets`.
+    :rtype: AsyncIterator[List[Dict[str, Any]]]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    last_row = None
+    while True:
+        query = supabase.table('flashcards')\
+            .select('id, set_id, question, answer, flashcard_sets!inner(user_id, name)')\
+            .eq('flashcard_sets.user_id', user_id)
+        if last_row is not None:
+            set_id, card_id = last_row['set_id'], last_row['id']
+            query = query.or_(f'set_id.gt.{set_id},and(set_id.eq.{set_id},id.gt.{card_id})')
+        response = await query.order('set_id').order('id').limit(page_size).execute()
+        page = response.data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_row = page[-1]
+
+async def iter_user_set_export(
+    supabase: AClient, user_id: str, page_size: int
+) -> AsyncIterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Pages through all sets of a given user together with their flashcards, empty sets included.
+
+    Sets are read with keyset pagination on `id`; the flashcards of each page of sets are then
+    read with keyset pagination on `(set_id, id)`. Every set is yielded at least once - a set
+    without flashcards as `(set, [])` - and a large set is split over several segments of at
+    most `page_size` flashcards.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param user_id: The ID of the user whose sets are to be retrieved.
+    :type user_id: str
+    :param page_size: The maximum number of sets or flashcards per query.
+    :type page_size: int
+    :returns: An async iterator of `(set, flashcards)` segments in set order; the set has `id` and
+              `name`, each flashcard has `id`, `set_id`, `question` and `answer`.
+    :rtype: AsyncIterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    last_set_id = None
+    while True:
+        query = supabase.table('flashcard_sets').select('id, name').eq('user_id', user_id)
+        if last_set_id is not None:
+            query = query.gt('id', last_set_id)
+        response = await query.order('id').limit(page_size).execute()
+        sets = response.data or []
+        if sets:
+            async for segment in _iter_set_segments(supabase, sets, page_size):
+                yield segment
+        if len(sets) < page_size:
+            return
+        last_set_id = sets[-1]['id']
+
+async def _iter_set_segments(
+    supabase: AClient, sets: List[Dict[str, Any]], page_size: int
+) -> AsyncIterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    # Zestawy i fiszki są posortowane po identyfikatorze zestawu, więc można je przechodzić równolegle
+    pending = iter(sets)
+    current, current_sent = next(pending), False
+    last_row = None
+    while True:
+        query = supabase.table('flashcards')\
+            .select('id, set_id, question, answer')\
+            .in_('set_id', [flashcard_set['id'] for flashcard_set in sets])
+        if last_row is not None:
+            set_id, card_id = last_row['set_id'], last_row['id']
+            query = query.or_(f'set_id.gt.{set_id},and(set_id.eq.{set_id},id.gt.{card_id})')
+        response = await query.order('set_id').order('id').limit(page_size).execute()
+        page = response.data or []
+        start = 0
+        while start < len(page):
+            set_id = page[start]['set_id']
+            end = start
+            while end < len(page) and page[end]['set_id'] == set_id:
+                end += 1
+            while current['id'] != set_id:
+                if not current_sent:
+                    yield current, []
+                current, current_sent = next(pending), False
+            yield current, page[start:end]
+            current_sent = True
+            start = end
+        if len(page) < page_size:
+            break
+        last_row = page[-1]
+    if not current_sent:
+        yield current, []
+    for flashcard_set in pending:
+        yield flashcard_set, []
+
+async def get_flashcard_for_editing(supabase: AClient, card_id: Union[str, int], user_id: str) -> Union[Dict[str, Any], None]:
+    """Retrieves a specific flashcard for editing, ensuring it belongs to the specified user.
+
+    This function checks ownership by joining with the `flashcard_sets` table.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param card_id: The ID of the flashcard to retrieve.
+    :type card_id: Union[str, int]
+    :param user_id: The ID of the user who owns the flashcard.
+    :type user_id: str
+    :returns: A dictionary representing the flashcard or `None` if not found or not owned by the user.
+    :rtype: Union[Dict[str, Any], None]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    response = await supabase.table('flashcards').select('*, flashcard_sets!inner(user_id)').eq('id', card_id).execute()
+    if not response.data or response.data[0]['flashcard_sets']['user_id'] != user_id:
+        return None
+    return response.data[0]
+
+async def update_flashcard(supabase: AClient, card_id: Union[str, int], user_id: str, flashcard_data: dict) -> Dict[str, Any]:
+    """Updates an existing flashcard in the database.
+
+    Ownership is checked in the same UPDATE statement that changes the flashcard
+    (see `update_flashcards`), so the edit costs a single round trip.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param card_id: The ID of the flashcard to update.
+    :type card_id: Union[str, int]
+    :param user_id: The ID of the user who owns the flashcard. Used for authorization.
+    :type user_id: str
+    :param flashcard_data: A dictionary containing the fields to update (e.g., 'question', 'answer').
+    :type flashcard_data: dict
+    :raises HTTPException: If the flashcard is not found or if the update operation fails.
+    :returns: A dictionary representing the updated flashcard.
+    :rtype: Dict[str, Any]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    updated = await update_flashcards(supabase, user_id, [{**flashcard_data, 'id': str(card_id)}])
+    return updated[0]
+
+async def update_flashcards(
+    supabase: AClient, user_id: str, flashcards: List[Dict[str, Any]], set_id: Optional[Union[str, int]] = None
+) -> List[Dict[str, Any]]:
+    """Updates many flashcards with a single conditional UPDATE statement.
+
+    The `update_flashcards` database function (see `supabase/migrations`) changes only the
+    flashcards whose set belongs to `user_id` (and, if given, whose set is `set_id`), in one
+    statement called with one RPC. The change is all-or-nothing: if any flashcard does not
+    match, nothing is updated.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param user_id: The ID of the user who owns the flashcards. Used for authorization.
+    :type user_id: str
+    :param flashcards: The changes, each with the flashcard `id` and the fields to update ('question', 'answer').
+    :type flashcards: List[Dict[str, Any]]
+    :param set_id: The ID of the set all flashcards must belong to, or `None` for any set of the user.
+    :type set_id: Optional[Union[str, int]]
+    :raises HTTPException: If any flashcard is not found (404) or if the update operation fails.
+    :returns: The updated flashcards.
+    :rtype: List[Dict[str, Any]]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    if not flashcards:
+        return []
+    try:
+        response = await supabase.rpc('update_flashcards', {
+            'p_user_id': user_id,
+            'p_flashcards': flashcards,
+            'p_set_id': str(set_id) if set_id is not None else None
+        }).execute()
+    except Exception as e:
+        if is_not_found(e):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flashcard not found")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to update flashcard: {str(e)}")
+    if not response.data:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update flashcard")
+    return response.data
+
+async def delete_flashcard_set(supabase: AClient, set_id: Union[str, int], user_id: str) -> Dict[str, str]:
+    """Deletes a flashcard set and all its associated flashcards from the database.
+
+    This function first verifies that the flashcard set exists and is owned by the specified user
+    before proceeding with the deletion.
+
+    :param supabase: The async Supabase client instance.
+    :type supabase: AClient
+    :param set_id: The ID of the flashcard set to delete.
+    :type set_id: Union[str, int]
+    :param user_id: The ID of the user who owns the flashcard set. Used for authorization.
+    :type user_id: str
+    :raises HTTPException: If the flashcard set is not found or if the delete operation fails.
+    :returns: A dictionary with a success message.
+    :rtype: Dict[str, str]
+    :dependencies:
+        - `supabase`: For database operations.
+    """
+    response = await supabase.table('flashcard_sets')\
+        .select('id')\
+        .eq('id', set_id)\
+        .eq('user_id', user_id)\
+        .execute()
+
+    if not response.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flashcard set not found")
+
+    try:
+        await supabase.table('flashcard_sets')\
+            .delete()\
+            .eq('id', set_id)\
+            .eq('user_id', user_id)\
+            .execute()
+
+        return {"message": "Flashcard set deleted successfully"}
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Nie udało się usunąć zestawu fiszek: {str(e)}"
+        )
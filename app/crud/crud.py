@@ -10,11 +10,27 @@ from fastapi import HTTPException, status
 from typing import Union, Dict, Any, List
 import uuid
 
+# Kod błędu PostgreSQL dla naruszenia ograniczenia unikalności
+UNIQUE_VIOLATION = '23505'
+
+def is_unique_violation(exc: Exception) -> bool:
+    """Tells whether a PostgREST error was caused by a unique constraint (e.g. a duplicate set name)."""
+    return getattr(exc, 'code', None) == UNIQUE_VIOLATION or "duplicate key" in str(exc).lower()
+
+# Kod błędu zgłaszany przez funkcję update_flashcards, gdy fiszka nie istnieje lub nie należy do użytkownika
+NO_DATA_FOUND = 'P0002'
+
+def is_not_found(exc: Exception) -> bool:
+    """Tells whether a PostgREST error means that the targeted rows do not exist or are not owned by the user."""
+    return getattr(exc, 'code', None) == NO_DATA_FOUND
+
 def create_flashcard_set(supabase: Client, set_data: FlashcardSetCreate, user_id: str) -> Dict[str, Any]:
     """Creates a new flashcard set and its associated flashcards in the database.
 
-    Ensures that the user ID is provided and that the set name is unique for the user.
-    If flashcards are provided in `set_data`, they are also inserted and linked to the new set.
+    The set and all its flashcards are inserted in one transaction by the `create_flashcard_set`
+    database function (see `supabase/migrations`), called with a single RPC. Uniqueness of the
+    set name per user is enforced by the `(user_id, name)` unique constraint, so a failed insert
+    leaves nothing behind and no separate existence check is needed.
 
     :param supabase: The Supabase client instance.
     :type supabase: Client
@@ -22,7 +38,7 @@ def create_flashcard_set(supabase: Client, set_data: FlashcardSetCreate, user_id
     :type set_data: FlashcardSetCreate
     :param user_id: The ID of the user who is creating the flashcard set.
     :type user_id: str
-    :raises HTTPException: If `user_id` is missing, if the set cannot be created, or if flashcards cannot be added.
+    :raises HTTPException: If `user_id` is missing or if the set cannot be created.
     :raises ValueError: If the set name is empty or a set with the same name already exists for the user.
     :returns: A dictionary representing the newly created flashcard set, including its ID and inserted flashcards.
     :rtype: Dict[str, Any]
@@ -32,73 +48,39 @@ def create_flashcard_set(supabase: Client, set_data: FlashcardSetCreate, user_id
     """
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Brak user_id")
-    
+
     set_name = set_data.name.strip()
     if not set_name:
         raise ValueError("Nazwa zestawu nie może być pusta.")
-    
-    existing_set = supabase.table('flashcard_sets')\
-        .select('id')\
-        .eq('user_id', user_id)\
-        .eq('name', set_name)\
-        .execute()
-    
-    if existing_set.data:
-        raise ValueError(f"Zestaw o nazwie '{set_name}' już istnieje.")
-    
-    new_set_data = {
-        'name': set_name,
-        'user_id': user_id
-    }
-    
+
+    flashcards_to_insert = [
+        {'question': fc.question.strip(), 'answer': fc.answer.strip()}
+        for fc in set_data.flashcards
+        if fc.question.strip() and fc.answer.strip()
+    ]
+
     try:
-        set_response = supabase.table('flashcard_sets')\
-            .insert(new_set_data)\
-            .execute()
-        
-        if not set_response.data:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Nie udało się utworzyć zestawu")
-        
-        new_set = set_response.data[0]
-        new_set_id = new_set['id']
-        
-        inserted_flashcards = []
-        if set_data.flashcards:
-            flashcards_to_insert = []
-            for fc in set_data.flashcards:
-                question = fc.question.strip()
-                answer = fc.answer.strip()
-                if question and answer:
-                    flashcards_to_insert.append({
-                        'question': question,
-                        'answer': answer,
-                        'set_id': new_set_id
-                    })
-            
-            if flashcards_to_insert:
-                flashcards_response = supabase.table('flashcards')\
-                    .insert(flashcards_to_insert)\
-                    .execute()
-                
-                if flashcards_response.data:
-                    inserted_flashcards = flashcards_response.data
-                else:
-                    supabase.table('flashcard_sets').delete().eq('id', new_set_id).execute()
-                    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Nie udało się dodać fiszek")
-        
-        return {
-            'id': new_set['id'],
-            'name': new_set['name'],
-            'user_id': new_set['user_id'],
-            'created_at': new_set.get('created_at'),
-            'flashcards': inserted_flashcards
-        }
-        
+        response = supabase.rpc('create_flashcard_set', {
+            'p_user_id': user_id,
+            'p_name': set_name,
+            'p_flashcards': flashcards_to_insert
+        }).execute()
     except Exception as e:
-        if "duplicate key" in str(e).lower():
+        if is_unique_violation(e):
             raise ValueError(f"Zestaw o nazwie '{set_name}' już istnieje.")
-        else:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Błąd: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Błąd: {str(e)}")
+
+    new_set = response.data
+    if not new_set:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Nie udało się utworzyć zestawu")
+
+    return {
+        'id': new_set['id'],
+        'name': new_set['name'],
+        'user_id': new_set['user_id'],
+        'created_at': new_set.get('created_at'),
+        'flashcards': new_set.get('flashcards') or []
+    }
 
 def get_flashcard_set(supabase: Client, set_id: Union[str, int], user_id: str) -> Union[Dict[str, Any], None]:
     """Retrieves a single flashcard set by its ID, ensuring it belongs to the specified user.
@@ -160,7 +142,8 @@ def get_flashcard_for_editing(supabase: Client, card_id: Union[str, int], user_i
 def update_flashcard(supabase: Client, card_id: Union[str, int], user_id: str, flashcard_data: dict):
     """Updates an existing flashcard in the database.
 
-    First, it verifies that the flashcard exists and is owned by the specified user.
+    Ownership is checked by the `update_flashcards` database function (see `supabase/migrations`)
+    in the same UPDATE statement that changes the flashcard, so the edit is a single RPC.
 
     :param supabase: The Supabase client instance.
     :type supabase: Client
@@ -176,11 +159,15 @@ def update_flashcard(supabase: Client, card_id: Union[str, int], user_id: str, f
     :dependencies:
         - `supabase`: For database operations.
     """
-    card_to_edit = get_flashcard_for_editing(supabase, card_id, user_id)
-    if not card_to_edit:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flashcard not found")
-
-    response = supabase.table('flashcards').update(flashcard_data).eq('id', card_id).execute()
+    try:
+        response = supabase.rpc('update_flashcards', {
+            'p_user_id': user_id,
+            'p_flashcards': [{**flashcard_data, 'id': str(card_id)}]
+        }).execute()
+    except Exception as e:
+        if is_not_found(e):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flashcard not found")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to update flashcard: {str(e)}")
     if not response.data:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update flashcard")
     return response.data[0]
@@ -1,13 +1,38 @@
 from fastapi import Depends, HTTPException, status, Request
-from app.config import SUPABASE_URL, SUPABASE_SERVICE_KEY
-from supabase import create_client, Client
+import hmac
+from app.config import SUPABASE_URL, SUPABASE_SERVICE_KEY, SUPABASE_JWT_VERIFICATION, METRICS_TOKEN
+from app.services import token_verifier
+from app.supabase_client import get_pooled_client, get_pooled_async_client
+from supabase import create_client, Client, AClient
 from typing import Any
 
 def get_supabase_client() -> Client:
+    # Współdzielony klient z pulą połączeń (tworzony w lifespan aplikacji)
+    return get_pooled_client()
+
+async def get_async_supabase_client() -> AClient:
+    # Klient asynchroniczny dla warstwy danych (app.crud.async_crud)
+    return get_pooled_async_client()
+
+def get_auth_client() -> Client:
+    # Osobny klient na żądanie dla operacji zapisujących sesję użytkownika
+    # (sign_in_with_password, sign_out) - nie mogą one modyfikować klienta współdzielonego
     if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
         raise Exception("Supabase configuration missing")
     return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
+def require_metrics_token(request: Request) -> None:
+    # /metrics nie jest dla użytkowników aplikacji - tylko dla monitoringu znającego METRICS_TOKEN
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    auth_header = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(auth_header.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
 def get_current_user(request: Request, supabase: Client = Depends(get_supabase_client)) -> Any:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -31,6 +56,10 @@ def get_current_user(request: Request, supabase: Client = Depends(get_supabase_c
         token = token[len("Bearer "):]
 
     try:
+        if SUPABASE_JWT_VERIFICATION == "local":
+            # Weryfikacja lokalna + cache, bez zapytania do Supabase przy każdym żądaniu
+            return token_verifier.get_user(token, supabase)
+
         user_response = supabase.auth.get_user(token)
         if user_response.user is None:
             raise credentials_exception
@@ -7,3 +7,20 @@ class GenerationFailedError(HTTPException):
 class SaveFailedError(HTTPException):
     def __init__(self, detail: str):
         super().__init__(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
+
+class GenerationQueueFullError(HTTPException):
+    def __init__(self, detail: str = "Zbyt wiele żądań generowania. Spróbuj ponownie za chwilę."):
+        super().__init__(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail, headers={"Retry-After": "5"})
+
+class GenerationRateLimitedError(HTTPException):
+    def __init__(self, retry_after: int, detail: str = "Przekroczono limit żądań generowania. Spróbuj ponownie za chwilę."):
+        super().__init__(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail, headers={"Retry-After": str(retry_after)})
+
+class ClientDisconnectedError(HTTPException):
+    def __init__(self, detail: str = "Klient przerwał połączenie."):
+        # 499 - kod "Client Closed Request" (nginx); odpowiedzi i tak nikt nie odbierze
+        super().__init__(status_code=499, detail=detail)
+
+class OllamaUnavailableError(HTTPException):
+    def __init__(self, retry_after: int, detail: str = "Usługa generowania fiszek jest chwilowo niedostępna. Spróbuj ponownie za chwilę."):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail, headers={"Retry-After": str(retry_after)})
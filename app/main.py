@@ -1,21 +1,49 @@
 import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Depends, HTTPException, status
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from supabase import Client
-from app.dependencies import get_current_user, get_supabase_client
-from app.routers import auth, flashcards, mcp
-from app.crud.crud import get_flashcard_sets
-from typing import Any
+from supabase import AClient
+from app.dependencies import get_current_user, get_async_supabase_client, require_metrics_token
+from app.routers import auth, flashcards, mcp, jobs, imports, exports
+from app.crud.async_crud import get_flashcard_sets_page
+from typing import Any, Optional
+from app.config import DASHBOARD_PAGE_SIZE
 from app.exceptions import GenerationFailedError, SaveFailedError
+from app import supabase_client
+from app.services import ollama, model_keeper, model_router
+from app.services.metrics import metrics
+from app.services.ollama_backends import backend_pool
+from app.services.circuit_breaker import ollama_breaker
+from app.services.generation_jobs import job_manager
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    supabase_client.open_pool()
+    supabase_client.get_pooled_async_client()
+    ollama.get_http_client()
+    ollama.start_health_checks()
+    model_keeper.start_model_keeper()
+    job_manager.start()
+    yield
+    await job_manager.stop()
+    await model_keeper.stop_model_keeper()
+    await ollama.stop_health_checks()
+    await ollama.close_http_client()
+    await supabase_client.close_async_pool()
+    supabase_client.close_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 templates = Jinja2Templates(directory="app/templates")
 
 app.include_router(auth.router)
 app.include_router(flashcards.router)
 app.include_router(mcp.router, prefix="/mcp")
+app.include_router(jobs.router, prefix="/jobs")
+app.include_router(imports.router, prefix="/import")
+app.include_router(exports.router, prefix="/export")
 
 @app.exception_handler(GenerationFailedError)
 async def generation_failed_exception_handler(request: Request, exc: GenerationFailedError):
@@ -42,8 +70,19 @@ async def http_exception_handler(request: Request, exc: HTTPException):
                 "code": str(exc.status_code)
             }
         },
+        headers=exc.headers,
     )
 
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+def read_metrics():
+    return {
+        **metrics.snapshot(),
+        "ollama_backends": backend_pool.stats(),
+        "ollama_circuit": ollama_breaker.state,
+        "ollama_models": model_router.model_stats(),
+        "generation_scheduler": job_manager.scheduler_stats(),
+    }
+
 @app.get("/")
 def read_root():
     return RedirectResponse(url="/login")
@@ -51,8 +90,24 @@ def read_root():
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(
     request: Request,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AClient = Depends(get_async_supabase_client),
+    current_user: Any = Depends(get_current_user)
+):
+    flashcard_sets, next_cursor = await get_flashcard_sets_page(supabase, current_user.id, DASHBOARD_PAGE_SIZE)
+    return templates.TemplateResponse(
+        "dashboard.html",
+        {"request": request, "user": current_user, "flashcard_sets": flashcard_sets, "next_cursor": next_cursor}
+    )
+
+@app.get("/dashboard/sets")
+async def dashboard_sets(
+    cursor: Optional[str] = None,
+    supabase: AClient = Depends(get_async_supabase_client),
     current_user: Any = Depends(get_current_user)
 ):
-    flashcard_sets = get_flashcard_sets( supabase, current_user.id)
-    return templates.TemplateResponse("dashboard.html", {"request": request, "user": current_user, "flashcard_sets": flashcard_sets})
\ No newline at end of file
+    # Kolejna strona zestawów (JSON) doładowywana przez dashboard przyciskiem "Pokaż więcej"
+    try:
+        flashcard_sets, next_cursor = await get_flashcard_sets_page(supabase, current_user.id, DASHBOARD_PAGE_SIZE, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"sets": flashcard_sets, "next_cursor": next_cursor}
\ No newline at end of file
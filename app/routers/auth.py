@@ -8,7 +8,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from supabase import Client
 
-from app.dependencies import get_supabase_client
+from app.dependencies import get_supabase_client, get_auth_client
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -22,7 +22,7 @@ async def login_user(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    supabase: Client = Depends(get_supabase_client)
+    supabase: Client = Depends(get_auth_client)
 ):
     if not email or not password:
         return templates.TemplateResponse(request=request, name="login.html", context={"error_message": "Email i hasło są wymagane."})
@@ -92,7 +92,7 @@ async def register_user(
         return templates.TemplateResponse(request=request, name="register.html", context={"error_message": error_message})
 
 @router.post("/logout")
-async def logout_user(supabase: Client = Depends(get_supabase_client)):
+async def logout_user(supabase: Client = Depends(get_auth_client)):
     try:
         supabase.auth.sign_out()
     except Exception as e:
@@ -0,0 +1,50 @@
+"""
+This module defines the route for exporting all of a user's flashcard sets.
+
+Sets and their flashcards are read page by page with keyset pagination (`EXPORT_PAGE_SIZE`
+rows per query) and each page is encoded (`app.services.flashcard_export`) and sent before
+the next one is fetched, so an export keeps memory use flat regardless of library size.
+Sets without flashcards are included.
+"""
+
+from datetime import date
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from supabase import AClient
+
+from app.config import EXPORT_PAGE_SIZE
+from app.crud.async_crud import iter_user_set_export
+from app.dependencies import get_async_supabase_client, get_current_user
+from app.services.flashcard_export import EXPORT_MEDIA_TYPES, encode
+from app.services.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("")
+async def export_flashcards(
+    format: str = "ndjson",
+    supabase: AClient = Depends(get_async_supabase_client),
+    current_user: Any = Depends(get_current_user)
+):
+    """Eksportuje wszystkie zestawy użytkownika jako NDJSON, CSV lub archiwum zip (plik CSV na zestaw)"""
+    fmt = format.strip().lower()
+
+    async def counted_segments():
+        async for flashcard_set, cards in iter_user_set_export(supabase, current_user.id, EXPORT_PAGE_SIZE):
+            metrics.increment("export.rows", len(cards))
+            yield flashcard_set, cards
+
+    try:
+        body = encode(counted_segments(), fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    metrics.increment(f"export.requests.{fmt}")
+    filename = f"fiszki-{date.today().isoformat()}.{fmt}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,31 +1,51 @@
+import asyncio
 import json
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from supabase import Client
+from supabase import AClient
 from typing import List, Any
 
-from app.crud.crud import get_flashcard_set, get_flashcard_for_editing, create_flashcard_set, delete_flashcard_set
+from app.crud.async_crud import get_flashcard_set, get_flashcard_for_editing, create_flashcard_set, delete_flashcard_set
 from app.services import flashcard_service
-from app.services.ollama import generate_flashcards_from_text
-from app.schemas.schemas import FlashcardUpdate, FlashcardSetCreate, FlashcardCreate
-from app.dependencies import get_supabase_client, get_current_user
+from app.services.ollama import (
+    generate_flashcards_from_text,
+    stream_flashcards_from_text,
+    generate_more_flashcards,
+    claim_generation_context,
+)
+from app.services.generation_jobs import job_manager
+from app.services.disconnect import cancel_on_disconnect
+from app.services.duplicate_detection import duplicate_indexes
+from app.services.metrics import metrics
+from app.services.text_preprocessing import prepare_source_text
+from app.schemas.schemas import FlashcardUpdate, FlashcardBatchUpdate, FlashcardSetCreate, FlashcardCreate
+from app.dependencies import get_async_supabase_client, get_current_user
 
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
+def _parse_count(value: Any) -> int:
+    try:
+        return max(1, min(int(value), 20))
+    except (ValueError, TypeError):
+        return 5
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @router.get("/sets/{set_id}", response_class=HTMLResponse)
 async def set_detail_view(
     set_id: int,
     request: Request,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AClient = Depends(get_async_supabase_client),
     current_user: Any = Depends(get_current_user)
 ):
     """Wyświetla szczegóły zestawu fiszek z możliwością nauki"""
     try:
-        db_set = get_flashcard_set(
+        db_set = await get_flashcard_set(
             supabase=supabase, 
             set_id=str(set_id),
             user_id=current_user.id
@@ -67,12 +87,12 @@ async def set_detail_view(
 async def edit_flashcard_view(
     card_id: UUID,
     request: Request,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AClient = Depends(get_async_supabase_client),
     current_user: Any = Depends(get_current_user)
 ):
     """Formularz edycji fiszki"""
     try:
-        flashcard = get_flashcard_for_editing(supabase, str(card_id), current_user.id)
+        flashcard = await get_flashcard_for_editing(supabase, str(card_id), current_user.id)
         
         if flashcard is None:
             raise HTTPException(
@@ -103,59 +123,92 @@ async def edit_flashcard_post(
     request: Request,
     question: str = Form(...),
     answer: str = Form(...),
-    supabase: Client = Depends(get_supabase_client),
+    set_id: str = Form(""),
+    supabase: AClient = Depends(get_async_supabase_client),
     current_user: Any = Depends(get_current_user)
 ):
     """Zapisuje zmiany w fiszce"""
-    try:
-        flashcard = get_flashcard_for_editing(supabase, str(card_id), current_user.id)
-        if not flashcard:
-            return RedirectResponse(
-                url="/dashboard", 
-                status_code=status.HTTP_303_SEE_OTHER
-            )
+    question = question.strip()
+    answer = answer.strip()
+    # Formularz wraca z wpisaną treścią - bez ponownego odczytu fiszki z bazy
+    submitted = {"id": str(card_id), "set_id": set_id, "question": question, "answer": answer}
 
-        question = question.strip()
-        answer = answer.strip()
-        
-        if not question or not answer:
-            return templates.TemplateResponse(
-                "edit_flashcard.html",
-                {
-                    "request": request,
-                    "user": current_user,
-                    "flashcard": flashcard,
-                    "error_message": "Pytanie i odpowiedź nie mogą być puste."
-                },
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
-            )
+    if not question or not answer:
+        return templates.TemplateResponse(
+            "edit_flashcard.html",
+            {
+                "request": request,
+                "user": current_user,
+                "flashcard": submitted,
+                "error_message": "Pytanie i odpowiedź nie mogą być puste."
+            },
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
 
+    try:
+        # Sprawdzenie właściciela i zapis w jednym poleceniu UPDATE
         flashcard_data = FlashcardUpdate(question=question, answer=answer)
-        updated_flashcard = flashcard_service.update_flashcard(
+        updated_flashcard = await flashcard_service.update_flashcard(
             supabase, 
             str(card_id), 
             current_user.id, 
             flashcard_data.model_dump(exclude_unset=True)
         )
-        
-        return RedirectResponse(
-            url=f"/sets/{flashcard['set_id']}", 
-            status_code=status.HTTP_303_SEE_OTHER
-        )
-
     except HTTPException as e:
-        flashcard = get_flashcard_for_editing(supabase, str(card_id), current_user.id)
+        if e.status_code == status.HTTP_404_NOT_FOUND:
+            return RedirectResponse(
+                url="/dashboard", 
+                status_code=status.HTTP_303_SEE_OTHER
+            )
         return templates.TemplateResponse(
             "edit_flashcard.html",
             {
                 "request": request,
                 "user": current_user,
-                "flashcard": flashcard or {},
+                "flashcard": submitted,
                 "error_message": f"Błąd podczas zapisywania: {e.detail}"
             },
             status_code=e.status_code
         )
 
+    return RedirectResponse(
+        url=f"/sets/{updated_flashcard['set_id']}", 
+        status_code=status.HTTP_303_SEE_OTHER
+    )
+
+@router.get("/sets/{set_id}/edit", response_class=HTMLResponse)
+async def edit_set_view(
+    set_id: UUID,
+    request: Request,
+    supabase: AClient = Depends(get_async_supabase_client),
+    current_user: Any = Depends(get_current_user)
+):
+    """Formularz zbiorczej edycji wszystkich fiszek zestawu"""
+    db_set = await get_flashcard_set(supabase=supabase, set_id=str(set_id), user_id=current_user.id)
+    if db_set is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail="Zestaw fiszek nie został znaleziony"
+        )
+    return templates.TemplateResponse(
+        "edit_set.html",
+        {"request": request, "user": current_user, "set": db_set}
+    )
+
+@router.post("/sets/{set_id}/cards")
+async def update_set_flashcards(
+    set_id: UUID,
+    changes: FlashcardBatchUpdate,
+    supabase: AClient = Depends(get_async_supabase_client),
+    current_user: Any = Depends(get_current_user)
+):
+    """Zapisuje zmiany wielu fiszek zestawu jednym zapytaniem (JSON)"""
+    try:
+        updated = await flashcard_service.update_flashcards(supabase, str(set_id), current_user.id, changes.flashcards)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return {"updated": len(updated), "flashcards": updated}
+
 @router.get("/generate", response_class=HTMLResponse)
 async def handle_generate_view_get(
     request: Request,
@@ -169,7 +222,7 @@ async def handle_generate_view_get(
 @router.post("/generate", response_class=HTMLResponse)
 async def handle_generate_view_post(
     request: Request,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AClient = Depends(get_async_supabase_client),
     current_user: Any = Depends(get_current_user)
 ):
     try:
@@ -178,11 +231,7 @@ async def handle_generate_view_post(
 
         if action == "generate":
             text = form_data.get("text", "").strip()
-            try:
-                count = int(form_data.get("count", 5))
-                count = max(1, min(count, 20))
-            except (ValueError, TypeError):
-                count = 5
+            count = _parse_count(form_data.get("count", 5))
 
             if not text:
                 return templates.TemplateResponse(
@@ -194,8 +243,13 @@ async def handle_generate_view_post(
                     }
                 )
 
+            text, preprocess_report = prepare_source_text(text)
+
             try:
-                generated_flashcards = await generate_flashcards_from_text(text, count)
+                generated_flashcards = await cancel_on_disconnect(
+                    request, job_manager.run(current_user.id, text, count, generate=generate_flashcards_from_text)
+                )
+                claim_generation_context(current_user.id, text)
                 
                 if not generated_flashcards:
                     return templates.TemplateResponse(
@@ -214,7 +268,8 @@ async def handle_generate_view_post(
                         "user": current_user, 
                         "generated_flashcards": generated_flashcards,
                         "original_text": text,
-                        "original_count": count
+                        "original_count": count,
+                        "preprocess_report": preprocess_report
                     }
                 )
                 
@@ -228,6 +283,52 @@ async def handle_generate_view_post(
                     }
                 )
 
+        elif action == "more":
+            text = form_data.get("original_text", "").strip()
+            count = _parse_count(form_data.get("original_count", 5))
+            current_flashcards = [
+                {"question": q.strip(), "answer": a.strip()}
+                for q, a in zip(form_data.getlist("questions"), form_data.getlist("answers"))
+                if q.strip() and a.strip()
+            ]
+
+            if not text:
+                return templates.TemplateResponse(
+                    "generate.html",
+                    {
+                        "request": request,
+                        "user": current_user,
+                        "generated_flashcards": current_flashcards,
+                        "error_message": "Brak tekstu źródłowego - wygeneruj fiszki od nowa."
+                    }
+                )
+
+            async def generate_more(text: str, count: int) -> List[FlashcardCreate]:
+                return await generate_more_flashcards(
+                    text, count, [fc["question"] for fc in current_flashcards], current_user.id
+                )
+
+            try:
+                more_flashcards = await cancel_on_disconnect(
+                    request, job_manager.run(current_user.id, text, count, generate=generate_more)
+                )
+                error_message = None if more_flashcards else "Nie udało się wygenerować nowych fiszek."
+            except HTTPException as e:
+                more_flashcards = []
+                error_message = e.detail
+
+            return templates.TemplateResponse(
+                "generate.html",
+                {
+                    "request": request,
+                    "user": current_user,
+                    "generated_flashcards": current_flashcards + [fc.model_dump() for fc in more_flashcards],
+                    "original_text": text,
+                    "original_count": count,
+                    "error_message": error_message
+                }
+            )
+
         elif action == "save":
             set_name = form_data.get("name", "").strip()
             questions = form_data.getlist("questions")
@@ -245,15 +346,23 @@ async def handle_generate_view_post(
                         "request": request, 
                         "user": current_user, 
                         "generated_flashcards": generated_flashcards, 
+                        "original_text": form_data.get("original_text", ""),
+                        "original_count": _parse_count(form_data.get("original_count", 5)),
                         "error_message": "Nazwa zestawu nie może być pusta."
                     }
                 )
 
+            skipped = set()
+            if form_data.get("duplicates_reviewed"):
+                # Fiszki oznaczone na liście duplikatów jako do pominięcia nie są zapisywane; indeksy odnoszą się
+                # do pozycji w przesłanym formularzu, więc są sprawdzane przed odrzuceniem pustych fiszek
+                skipped = {int(index) for index in form_data.getlist("skip_duplicates") if index.isdigit()}
+
             flashcards_to_create = []
-            for q, a in zip(questions, answers):
+            for index, (q, a) in enumerate(zip(questions, answers)):
                 question = q.strip()
                 answer = a.strip()
-                if question and answer:
+                if question and answer and index not in skipped:
                     flashcards_to_create.append(FlashcardCreate(question=question, answer=answer))
 
             if not flashcards_to_create:
@@ -266,13 +375,32 @@ async def handle_generate_view_post(
                     }
                 )
 
+            flashcards_to_create, merged_count, duplicate_flags = await flashcard_service.find_duplicates(
+                supabase, flashcards_to_create, current_user.id
+            )
+            if any(duplicate_flags) and not form_data.get("duplicates_reviewed"):
+                return templates.TemplateResponse(
+                    "generate.html",
+                    {
+                        "request": request,
+                        "user": current_user,
+                        "generated_flashcards": [fc.model_dump() for fc in flashcards_to_create],
+                        "original_text": form_data.get("original_text", ""),
+                        "original_count": _parse_count(form_data.get("original_count", 5)),
+                        "set_name": set_name,
+                        "duplicate_flags": duplicate_flags,
+                        "merged_count": merged_count
+                    }
+                )
+
             try:
                 set_data = FlashcardSetCreate(name=set_name, flashcards=flashcards_to_create)
-                created_set = create_flashcard_set(
+                created_set = await create_flashcard_set(
                     supabase=supabase, 
                     set_data=set_data, 
                     user_id=current_user.id
                 )
+                duplicate_indexes.add_set(current_user.id, created_set)
                 
                 return RedirectResponse(
                     url="/dashboard", 
@@ -305,14 +433,61 @@ async def handle_generate_view_post(
             }
         )
 
+@router.post("/generate/stream")
+async def handle_generate_stream(
+    request: Request,
+    current_user: Any = Depends(get_current_user)
+):
+    """Generuje fiszki strumieniowo (Server-Sent Events) - każda fiszka jest wysyłana od razu po wygenerowaniu"""
+    form_data = await request.form()
+    text = form_data.get("text", "").strip()
+    count = _parse_count(form_data.get("count", 5))
+
+    async def event_stream():
+        if not text:
+            yield _sse_event("error", {"message": "Tekst źródłowy nie może być pusty."})
+            return
+        source_text, report = prepare_source_text(text)
+        if report is not None:
+            yield _sse_event("preprocess", {
+                "original_chars": report.original_chars,
+                "cleaned_chars": report.cleaned_chars,
+                "trimmed_percent": round(report.trimmed_percent, 1),
+                "cleaned_tokens": report.cleaned_tokens
+            })
+        sent = 0
+        try:
+            # Strumień zajmuje miejsce workera z kolejki zadań: wspólny limit równoległych generowań,
+            # 429 przy pełnej kolejce, limit żądań użytkownika i sprawiedliwa kolejność
+            async with job_manager.slot(current_user.id, count):
+                async for flashcard in stream_flashcards_from_text(source_text, count):
+                    sent += 1
+                    yield _sse_event("card", flashcard.model_dump())
+            claim_generation_context(current_user.id, source_text)
+            # Oczyszczony tekst wraca do formularza wyników - od niego zależy klucz kontekstu dla "Generuj więcej"
+            yield _sse_event("done", {"count": sent, "original_text": source_text, "original_count": count})
+        except HTTPException as e:
+            yield _sse_event("error", {"message": e.detail, "count": sent})
+        except asyncio.CancelledError:
+            # Klient zamknął połączenie - przerwanie iteracji zamyka strumień z Ollama
+            metrics.increment("generation.cancelled.disconnect")
+            raise
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/sets/{set_id}/delete")
 async def delete_flashcard_set_endpoint(
     set_id: UUID,
-    supabase: Client = Depends(get_supabase_client),
+    supabase: AClient = Depends(get_async_supabase_client),
     current_user: Any = Depends(get_current_user)
 ):
     try:
-        delete_flashcard_set(supabase=supabase, set_id=str(set_id), user_id=current_user.id)
+        await delete_flashcard_set(supabase=supabase, set_id=str(set_id), user_id=current_user.id)
+        duplicate_indexes.invalidate(current_user.id)
         return RedirectResponse(
             url="/dashboard", 
             status_code=status.HTTP_303_SEE_OTHER
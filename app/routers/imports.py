@@ -0,0 +1,123 @@
+"""
+This module defines the routes for importing flashcard sets from files.
+
+The upload is parsed as a stream (`app.services.flashcard_import`) and inserted in
+batches of `IMPORT_CHUNK_SIZE`; progress and row errors are streamed back as NDJSON.
+Batches are not rolled back: if a later batch fails, the set stays with the cards
+inserted so far and the final `error` event says so (`partial`, `set_id`, `imported`).
+"""
+
+import asyncio
+import io
+import json
+import os
+from typing import Any
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.templating import Jinja2Templates
+from supabase import AClient
+
+from app.config import IMPORT_CHUNK_SIZE
+from app.crud.async_crud import add_flashcards, create_flashcard_set
+from app.dependencies import get_async_supabase_client, get_current_user
+from app.schemas.schemas import FlashcardSetCreate
+from app.services.duplicate_detection import duplicate_indexes
+from app.services.flashcard_import import IMPORT_FORMATS, detect_format, iter_batches, iter_rows
+from app.services.metrics import metrics
+
+router = APIRouter()
+templates = Jinja2Templates(directory="app/templates")
+
+
+def _ndjson_event(event: str, data: dict) -> str:
+    return json.dumps({"event": event, **data}, ensure_ascii=False) + "\n"
+
+
+@router.get("", response_class=HTMLResponse)
+async def import_view(
+    request: Request,
+    current_user: Any = Depends(get_current_user)
+):
+    """Wyświetla formularz importu zestawu z pliku"""
+    return templates.TemplateResponse(
+        "import.html",
+        {"request": request, "user": current_user, "formats": IMPORT_FORMATS}
+    )
+
+
+@router.post("")
+async def import_flashcards(
+    file: UploadFile = File(...),
+    name: str = Form(""),
+    format: str = Form(""),
+    supabase: AClient = Depends(get_async_supabase_client),
+    current_user: Any = Depends(get_current_user)
+):
+    """Importuje zestaw fiszek z pliku CSV/TSV/JSONL lub eksportu Anki; postęp jest strumieniowany jako NDJSON"""
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_name = name.strip() or os.path.splitext(os.path.basename(file.filename or ""))[0].strip()
+    if not set_name:
+        raise HTTPException(status_code=400, detail="Nazwa zestawu nie może być pusta.")
+
+    # FastAPI zamyka pliki formularza zaraz po zwróceniu odpowiedzi, a ta jest dopiero strumieniowana -
+    # generator przejmuje plik tymczasowy z uploadem i sam go zamyka
+    upload, file.file = file.file, io.BytesIO()
+
+    async def import_events():
+        batches = iter_batches(iter_rows(upload, fmt), IMPORT_CHUNK_SIZE)
+        set_id = None
+        rows = imported = failed = 0
+        try:
+            while True:
+                # Odczyt i parsowanie pliku (potencjalnie z dysku) nie blokuje pętli zdarzeń
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                flashcards = [row.flashcard for row in batch if row.flashcard is not None]
+                errors = [{"line": row.line, "error": row.error} for row in batch if row.error]
+                if flashcards and set_id is None:
+                    try:
+                        created = await create_flashcard_set(
+                            supabase, FlashcardSetCreate(name=set_name, flashcards=flashcards), current_user.id
+                        )
+                    except ValueError as e:
+                        yield _ndjson_event("error", {"message": str(e), "rows": rows, "imported": imported})
+                        return
+                    set_id = created["id"]
+                elif flashcards:
+                    await add_flashcards(supabase, set_id, flashcards)
+                if flashcards:
+                    # Zaimportowane fiszki muszą być widoczne dla wykrywania duplikatów przy kolejnych zapisach
+                    duplicate_indexes.invalidate(current_user.id)
+                rows += len(batch)
+                imported += len(flashcards)
+                failed += len(errors)
+                metrics.increment("import.rows", len(batch))
+                metrics.increment("import.failed_rows", len(errors))
+                yield _ndjson_event("progress", {"rows": rows, "imported": imported, "failed": failed, "errors": errors})
+
+            if set_id is None:
+                yield _ndjson_event("error", {"message": "Plik nie zawiera żadnej poprawnej fiszki.", "rows": rows, "failed": failed})
+                return
+            yield _ndjson_event("done", {"set_id": set_id, "name": set_name, "rows": rows, "imported": imported, "failed": failed})
+        except HTTPException as e:
+            if set_id is None:
+                yield _ndjson_event("error", {"message": e.detail, "rows": rows, "imported": imported})
+                return
+            # Wcześniejsze partie zostały już zapisane - zestaw istnieje z częścią fiszek
+            yield _ndjson_event("error", {
+                "message": f"{e.detail} Zestaw „{set_name}” został utworzony i zawiera {imported} zaimportowanych fiszek.",
+                "partial": True,
+                "set_id": set_id,
+                "name": set_name,
+                "rows": rows,
+                "imported": imported,
+            })
+        finally:
+            await asyncio.to_thread(upload.close)
+
+    return StreamingResponse(import_events(), media_type="application/x-ndjson")
@@ -0,0 +1,40 @@
+"""
+This module defines the API routes for background flashcard generation jobs.
+A job is submitted with the source text and polled until its result is ready.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any
+
+from app.schemas.schemas import FlashcardGenerateRequest, GenerationJobStatus
+from app.services.generation_jobs import job_manager
+from app.services.text_preprocessing import prepare_source_text
+from app.dependencies import get_current_user
+
+router = APIRouter()
+
+@router.post("/generate", status_code=status.HTTP_202_ACCEPTED)
+async def submit_generation_job(
+    request: FlashcardGenerateRequest,
+    current_user: Any = Depends(get_current_user)
+):
+    """Dodaje zadanie generowania fiszek do kolejki i zwraca jego identyfikator"""
+    text = request.text.strip()
+    if not text:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tekst źródłowy nie może być pusty.")
+    count = max(1, min(request.count, 20))
+    text, _ = prepare_source_text(text)
+
+    job_id = job_manager.submit(current_user.id, text, count)
+    return {"job_id": job_id, "status": "queued", "queue_depth": job_manager.queue_depth()}
+
+@router.get("/{job_id}", response_model=GenerationJobStatus)
+async def get_generation_job(
+    job_id: str,
+    current_user: Any = Depends(get_current_user)
+):
+    """Zwraca stan zadania generowania (i wygenerowane fiszki, gdy jest gotowe)"""
+    job = await job_manager.get(job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Zadanie nie zostało znalezione")
+    return job
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from typing import Any, Dict, List, Optional
 
 from app.schemas.schemas import FlashcardGenerateRequest, AIGenerationResponse, ToolDefinition, ToolExecuteRequest, ToolExecuteResponse
 # from app.dependencies import get_current_user # Remove this import
 
 from app.services.ollama import generate_flashcards_from_text
+from app.services.generation_jobs import job_manager
+from app.services.disconnect import cancel_on_disconnect
+from app.services.text_preprocessing import prepare_source_text
 
 router = APIRouter()
 
@@ -12,12 +15,14 @@ router = APIRouter()
 async def generate_flashcards_ai_function(
     text: str,
     count: int,
+    client_id: str = "mcp",
     # current_user: Any, # Remove this parameter
     # supabase: Any # Assuming supabase client might be needed, though not directly used in this specific function
 ) -> Dict:
     try:
-        # Call the existing Ollama service function
-        flashcards_data = await generate_flashcards_from_text(text, count)
+        text, _ = prepare_source_text(text)
+        # Call the existing Ollama service function through the bounded job queue
+        flashcards_data = await job_manager.run(client_id, text, count, generate=generate_flashcards_from_text)
         # Ensure the output matches the AIGenerationResponse schema
         return {"flashcards": flashcards_data}
     except HTTPException as e:
@@ -44,6 +49,7 @@ async def get_tool_definitions():
 @router.post("/tools/execute", response_model=ToolExecuteResponse)
 async def execute_tool(
     request: ToolExecuteRequest,
+    http_request: Request,
     # current_user: Any = Depends(get_current_user) # Remove this dependency
 ):
     tool_name = request.tool_name
@@ -61,11 +67,14 @@ async def execute_tool(
         # Validate parameters using the appropriate Pydantic model
         if tool_name == "generateFlashcardsAI":
             validated_params = FlashcardGenerateRequest(**parameters)
-            result = await tool_function(
+            # Rozłączenie klienta MCP anuluje generowanie (i zwalnia Ollama)
+            result = await cancel_on_disconnect(http_request, tool_function(
                 text=validated_params.text,
                 count=validated_params.count,
+                # Klient API (adres) jest osobnym "użytkownikiem" w sprawiedliwej kolejce
+                client_id=f"mcp:{http_request.client.host if http_request.client else 'unknown'}",
                 # current_user=current_user # Remove this parameter from the call
-            )
+            ))
         else:
             # Handle other tools if they are added in the future
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Tool '{tool_name}' not supported for execution.")
@@ -20,6 +20,14 @@ class FlashcardUpdate(FlashcardBase):
     """Schemat uzywany do aktualizacji istniejacej fiszki."""
     pass
 
+class FlashcardBatchItem(FlashcardUpdate):
+    """Schemat jednej fiszki w zbiorczej edycji zestawu."""
+    id: UUID
+
+class FlashcardBatchUpdate(BaseModel):
+    """Schemat zbiorczej edycji wielu fiszek zestawu jednym zapisem (Command Model)."""
+    flashcards: List[FlashcardBatchItem]
+
 class Flashcard(FlashcardBase):
     """Pelny schemat fiszki, uzywany w odpowiedziach API (DTO)."""
     id: Optional[UUID] = None
@@ -87,6 +95,15 @@ class TokenData(BaseModel):
     """Schemat dla danych zakodowanych w tokenie."""
     username: Optional[str] = None
 
+class TokenUser(BaseModel):
+    """Schemat uzytkownika odtworzony z lokalnie zweryfikowanego tokena Supabase."""
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    aud: Optional[str] = None
+    app_metadata: Dict = {}
+    user_metadata: Dict = {}
+
 class AIGenerationRequest(BaseModel):
     """Schemat dla zadania wygenerowania fiszek przez AI (Command Model)."""
     text: str
@@ -104,6 +121,16 @@ class FlashcardSaveRequest(BaseModel):
     name: str
     flashcards: List[FlashcardCreate]
 
+class GenerationJobStatus(BaseModel):
+    """Schemat stanu zadania generowania fiszek w tle (DTO)."""
+    job_id: str
+    status: str
+    count: int
+    flashcards: Optional[List[FlashcardCreate]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
 # =============================================================================
 # 5. SCHEMATY DLA MODEL CONTEXT PROTOCOL (MCP)
 # =============================================================================
@@ -0,0 +1,112 @@
+"""
+This module provides a circuit breaker for calls to the Ollama service.
+
+After `failure_threshold` consecutive failures the circuit opens and calls are
+rejected immediately with HTTP 503 instead of each waiting for a timeout. Once
+`cooldown` seconds have passed, the circuit half-opens and lets a single probe
+call through: success closes it again, failure re-opens it for another cooldown.
+"""
+
+import math
+import threading
+import time
+from typing import Callable
+
+from app.config import OLLAMA_BREAKER_FAILURES, OLLAMA_BREAKER_COOLDOWN
+from app.exceptions import OllamaUnavailableError
+from app.services.metrics import metrics
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = OLLAMA_BREAKER_FAILURES,
+        cooldown: float = OLLAMA_BREAKER_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._state = STATE_CLOSED
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def check(self) -> None:
+        """Raises `OllamaUnavailableError` while the circuit is open, without taking the probe slot.
+
+        Used to reject work before it is queued.
+        """
+        with self._lock:
+            if self._current_state() == STATE_OPEN:
+                self._reject()
+
+    def before_call(self) -> None:
+        """Admits a call or raises `OllamaUnavailableError`.
+
+        In the half-open state only one probe call is admitted at a time. Every admitted
+        call must be followed by `record_success`, `record_failure` or `release`.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_OPEN or (state == STATE_HALF_OPEN and self._probe_in_flight):
+                self._reject()
+            if state == STATE_HALF_OPEN:
+                self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != STATE_CLOSED:
+                metrics.increment(f"{self.name}.closed")
+            self._state = STATE_CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            probe_failed = self._probe_in_flight
+            self._probe_in_flight = False
+            if probe_failed or self._failures >= self.failure_threshold:
+                if self._state == STATE_CLOSED:
+                    metrics.increment(f"{self.name}.opened")
+                self._state = STATE_OPEN
+                self._opened_at = self._clock()
+
+    def release(self) -> None:
+        """Ends an admitted call that neither proved nor disproved the service's health (e.g. cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def _current_state(self) -> str:
+        if self._state == STATE_OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._state = STATE_HALF_OPEN
+        return self._state
+
+    def _reject(self) -> None:
+        metrics.increment(f"{self.name}.rejected")
+        remaining = self.cooldown - (self._clock() - self._opened_at)
+        raise OllamaUnavailableError(retry_after=max(1, math.ceil(remaining)))
+
+
+ollama_breaker = CircuitBreaker("ollama.breaker")
@@ -0,0 +1,48 @@
+"""
+This module stops work whose HTTP client has already gone away.
+
+A closed tab or a resubmitted form leaves the handler waiting for a generation
+nobody will read. `cancel_on_disconnect` polls the request for a disconnect and
+cancels the awaited work, which propagates down to the Ollama call and closes
+its connection, so the inference slot is freed at once.
+"""
+
+import asyncio
+from typing import Awaitable, TypeVar
+
+from starlette.requests import Request
+
+from app.config import DISCONNECT_POLL_INTERVAL
+from app.exceptions import ClientDisconnectedError
+from app.services.metrics import metrics
+
+T = TypeVar("T")
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = DISCONNECT_POLL_INTERVAL) -> T:
+    """Awaits `awaitable`, cancelling it if the client disconnects first.
+
+    :param request: The request whose client is watched.
+    :type request: Request
+    :param awaitable: The work to run (e.g. `job_manager.run(...)`).
+    :type awaitable: Awaitable[T]
+    :param poll_interval: How often to check for a disconnect, in seconds.
+    :type poll_interval: float
+    :raises ClientDisconnectedError: If the client disconnected before the work finished.
+    :returns: The result of `awaitable`.
+    :rtype: T
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                metrics.increment("generation.cancelled.disconnect")
+                raise ClientDisconnectedError()
+    finally:
+        if not task.done():
+            task.cancel()
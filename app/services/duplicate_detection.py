@@ -0,0 +1,243 @@
+"""
+This module detects near-duplicate flashcard questions.
+
+Questions are turned into hashed character n-gram vectors (feature hashing, so no
+vocabulary has to be kept). Within one batch all pairs are compared at once with a
+NumPy matrix product of the L2-normalized vectors, which gives the cosine similarity
+matrix. Against all of a user's stored cards, MinHash signatures of the n-gram sets
+are split into LSH bands: only questions that share a band bucket become candidates,
+so a lookup does not compare the new question with every stored one.
+
+The index of a user's stored questions is kept in `duplicate_indexes` (an LRU with a TTL),
+so it is built once instead of on every save; newly saved sets are added to it directly.
+"""
+
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.config import DUPLICATE_INDEX_CACHE_SIZE, DUPLICATE_INDEX_TTL, DUPLICATE_SIMILARITY_THRESHOLD
+from app.schemas.schemas import FlashcardCreate
+
+NGRAM_SIZE = 3
+# Liczba wymiarów wektora (n-gramy są haszowane do tylu kubełków)
+VECTOR_DIM = 1 << 12
+# 16 pasm po 4 wiersze: para o podobieństwie Jaccarda 0.5 trafia do wspólnego kubełka z prawdopodobieństwem ~0.65,
+# a przy 0.7 już ~0.98, co z zapasem pokrywa próg podobieństwa kosinusowego
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+_PRIME = (1 << 31) - 1
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, _PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", text.casefold()).split())
+
+
+def ngram_hashes(text: str, n: int = NGRAM_SIZE) -> np.ndarray:
+    """Returns the stable 32-bit hashes of the character n-grams of a normalized question."""
+    padded = f" {normalize_question(text)} "
+    grams = [padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))]
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def vectorize(texts: Sequence[str], dim: int = VECTOR_DIM) -> np.ndarray:
+    """Builds a matrix of L2-normalized hashed n-gram count vectors, one row per text."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        np.add.at(vectors[row], (ngram_hashes(text) % dim).astype(np.intp), 1.0)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def similarity_matrix(texts: Sequence[str]) -> np.ndarray:
+    """Cosine similarity of every pair of texts."""
+    vectors = vectorize(texts)
+    return vectors @ vectors.T
+
+
+def find_duplicate_pairs(texts: Sequence[str], threshold: float = DUPLICATE_SIMILARITY_THRESHOLD) -> List[Tuple[int, int, float]]:
+    """Finds pairs of near-duplicate texts within one batch.
+
+    :param texts: The texts (questions) to compare.
+    :type texts: Sequence[str]
+    :param threshold: Minimum cosine similarity for a pair to count as a duplicate.
+    :type threshold: float
+    :returns: `(i, j, similarity)` tuples with `i < j`, ordered by `i` and `j`.
+    :rtype: List[Tuple[int, int, float]]
+    """
+    if len(texts) < 2:
+        return []
+    upper = np.triu(similarity_matrix(texts), k=1)
+    return [(int(i), int(j), float(upper[i, j])) for i, j in np.argwhere(upper >= threshold)]
+
+
+def merge_duplicates(
+    flashcards: Sequence[FlashcardCreate], threshold: float = DUPLICATE_SIMILARITY_THRESHOLD
+) -> Tuple[List[FlashcardCreate], int]:
+    """Drops flashcards whose question nearly repeats an earlier one in the same batch.
+
+    :returns: The flashcards without the repeats (the first occurrence is kept) and the number removed.
+    :rtype: Tuple[List[FlashcardCreate], int]
+    """
+    removed = set()
+    for i, j, _ in find_duplicate_pairs([fc.question for fc in flashcards], threshold):
+        if i not in removed:
+            removed.add(j)
+    return [fc for index, fc in enumerate(flashcards) if index not in removed], len(removed)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature of the character n-gram set of a question."""
+    hashes = np.unique(ngram_hashes(text)) % np.uint64(_PRIME)
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % np.uint64(_PRIME)
+    return permuted.min(axis=1)
+
+
+@dataclass
+class DuplicateMatch:
+    question: str
+    similarity: float
+    card: Dict[str, Any]
+
+
+class DuplicateIndex:
+    """LSH index of stored questions for finding near-duplicates of new ones."""
+
+    def __init__(self, threshold: float = DUPLICATE_SIMILARITY_THRESHOLD, bands: int = LSH_BANDS):
+        if MINHASH_PERMUTATIONS % bands:
+            raise ValueError("The number of MinHash permutations must be divisible by the number of bands.")
+        self.threshold = threshold
+        self.bands = bands
+        self._rows = MINHASH_PERMUTATIONS // bands
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._cards: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def _band_keys(self, text: str) -> List[Tuple[int, bytes]]:
+        signature = minhash_signature(text)
+        return [(band, signature[band * self._rows:(band + 1) * self._rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, card: Dict[str, Any]) -> None:
+        """Indexes a stored card (a dict with at least a `question`)."""
+        index = len(self._cards)
+        self._cards.append(card)
+        for key in self._band_keys(card["question"]):
+            self._buckets.setdefault(key, []).append(index)
+
+    def candidates(self, question: str) -> List[int]:
+        found = set()
+        for key in self._band_keys(question):
+            found.update(self._buckets.get(key, ()))
+        return sorted(found)
+
+    def query(self, question: str) -> Optional[DuplicateMatch]:
+        """Returns the most similar stored card at or above the threshold, if any."""
+        candidates = self.candidates(question)
+        if not candidates:
+            return None
+        vectors = vectorize([question] + [self._cards[index]["question"] for index in candidates])
+        similarities = vectors[1:] @ vectors[0]
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        card = self._cards[candidates[best]]
+        return DuplicateMatch(question=card["question"], similarity=float(similarities[best]), card=card)
+
+
+def build_index(cards: Iterable[Dict[str, Any]], threshold: float = DUPLICATE_SIMILARITY_THRESHOLD) -> DuplicateIndex:
+    index = DuplicateIndex(threshold)
+    for card in cards:
+        if card.get("question"):
+            index.add(card)
+    return index
+
+
+class DuplicateIndexCache:
+    """Thread-safe LRU cache of per-user duplicate indexes with a per-entry expiry time."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, DuplicateIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, now: Optional[float] = None) -> Optional[DuplicateIndex]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id: str, index: DuplicateIndex, now: Optional[float] = None) -> None:
+        if self.max_size <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, index)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def add_set(self, user_id: str, created_set: Dict[str, Any]) -> None:
+        """Adds the cards of a newly saved set to the user's cached index, if there is one."""
+        index = self.get(user_id)
+        if index is None:
+            return
+        for card in created_set.get("flashcards") or []:
+            if card.get("question"):
+                index.add({
+                    "id": card.get("id"),
+                    "question": card["question"],
+                    "set_id": created_set.get("id"),
+                    "flashcard_sets": {"name": created_set.get("name")},
+                })
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+duplicate_indexes = DuplicateIndexCache(DUPLICATE_INDEX_CACHE_SIZE, DUPLICATE_INDEX_TTL)
+
+
+def flag_existing_duplicates(
+    questions: Sequence[str],
+    existing_cards: Union[DuplicateIndex, Iterable[Dict[str, Any]]],
+    threshold: float = DUPLICATE_SIMILARITY_THRESHOLD,
+) -> List[Optional[DuplicateMatch]]:
+    """Looks up each new question among a user's stored cards.
+
+    :param questions: Questions of the flashcards about to be saved.
+    :type questions: Sequence[str]
+    :param existing_cards: The user's stored cards, e.g. from `async_crud.get_user_flashcards`,
+                           or an index already built from them.
+    :type existing_cards: Union[DuplicateIndex, Iterable[Dict[str, Any]]]
+    :returns: For every question, the matching stored card or `None`.
+    :rtype: List[Optional[DuplicateMatch]]
+    """
+    index = existing_cards if isinstance(existing_cards, DuplicateIndex) else build_index(existing_cards, threshold)
+    if not len(index):
+        return [None] * len(questions)
+    return [index.query(question) for question in questions]
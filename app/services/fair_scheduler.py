@@ -0,0 +1,201 @@
+"""
+This module shares generation capacity fairly between users and API clients.
+
+`FairQueue` is a weighted fair queue (self-clocked fair queueing): every owner gets a
+virtual clock, a job is tagged with the virtual time at which it would finish if the
+owner got its weighted share, and the job with the smallest tag is served first. The
+cost of a job is its flashcard count, so a small request from one user is served
+before the bulk requests another user queued earlier, and a user with a long backlog
+only ever competes with their own jobs. `TokenBucket` limits how often each owner may
+submit jobs in the first place. Streamed generations are admitted through the same
+queue (`JobManager.slot`), so they are ordered and limited like background jobs.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Liczba właścicieli, dla których trzymamy statystyki czasu oczekiwania (LRU)
+WAIT_STATS_OWNERS = 256
+WAIT_STATS_WINDOW = 100
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """Parses a "owner:weight,owner:weight" setting; malformed entries are skipped."""
+    weights = {}
+    for item in value.split(","):
+        owner, _, weight = item.strip().rpartition(":")
+        try:
+            if owner and float(weight) > 0:
+                weights[owner] = float(weight)
+        except ValueError:
+            continue
+    return weights
+
+
+class TokenBucket:
+    """Per-owner token bucket: `burst` submissions at once, refilled at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, burst: int, clock: Callable[[], float] = time.monotonic, max_owners: int = 10000):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_owners = max_owners
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0
+
+    def acquire(self, owner: str) -> float:
+        """Takes a token for `owner`.
+
+        :returns: 0 if a token was available, otherwise the number of seconds until one will be.
+        :rtype: float
+        """
+        if not self.enabled:
+            return 0.0
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(owner, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[owner] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[owner] = (tokens - 1, now)
+            if len(self._buckets) > self.max_owners:
+                self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float) -> None:
+        # Pełny kubełek niczym nie różni się od braku kubełka
+        for owner, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[owner]
+
+
+class FairQueue:
+    """Bounded weighted fair queue of jobs for asyncio workers.
+
+    Must be created inside the event loop its workers run in.
+    """
+
+    def __init__(self, maxsize: int, max_per_owner: int = 0, weights: Optional[Dict[str, float]] = None):
+        self.maxsize = maxsize
+        self.max_per_owner = max_per_owner
+        self.weights = weights or {}
+        self._heap: List[Tuple[float, int, str, Any]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._queued: Dict[str, int] = {}
+        self._items = asyncio.Semaphore(0)
+        # Żetony semafora po zadaniach usuniętych z kolejki (discard)
+        self._stale = 0
+        self._wait_stats: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    def full(self) -> bool:
+        return self.maxsize > 0 and len(self._heap) >= self.maxsize
+
+    def owner_full(self, owner: str) -> bool:
+        return self.max_per_owner > 0 and self._queued.get(owner, 0) >= self.max_per_owner
+
+    def put_nowait(self, item: Any, owner: str, cost: float) -> None:
+        """Queues `item` for `owner`; `cost` is the work it represents (e.g. the flashcard count).
+
+        :raises asyncio.QueueFull: If the queue or the owner's share of it is full.
+        """
+        if self.full() or self.owner_full(owner):
+            raise asyncio.QueueFull
+        start = max(self._virtual_time, self._last_finish.get(owner, 0.0))
+        finish = start + max(cost, 1) / self.weights.get(owner, 1.0)
+        self._last_finish[owner] = finish
+        self._queued[owner] = self._queued.get(owner, 0) + 1
+        heapq.heappush(self._heap, (finish, next(self._sequence), owner, item))
+        self._items.release()
+
+    async def get(self) -> Tuple[str, Any]:
+        """Waits for and removes the job with the earliest virtual finish time; returns `(owner, item)`."""
+        await self._items.acquire()
+        while self._stale:
+            self._stale -= 1
+            await self._items.acquire()
+        finish, _, owner, item = heapq.heappop(self._heap)
+        self._virtual_time = finish
+        self._release_owner(owner)
+        return owner, item
+
+    def discard(self, item: Any) -> bool:
+        """Removes a queued `item` (e.g. a cancelled job) so it no longer counts against the limits.
+
+        :returns: True if the item was queued, False if a worker already took it.
+        :rtype: bool
+        """
+        for index, entry in enumerate(self._heap):
+            if entry[3] is item:
+                break
+        else:
+            return False
+        owner = entry[2]
+        self._heap[index] = self._heap[-1]
+        self._heap.pop()
+        heapq.heapify(self._heap)
+        self._stale += 1
+        # Zegar właściciela cofa się do jego ostatniego zadania, które nadal czeka
+        remaining = [finish for finish, _, queued_owner, _ in self._heap if queued_owner == owner]
+        if remaining:
+            self._last_finish[owner] = max(remaining)
+        else:
+            self._last_finish[owner] = self._virtual_time
+        self._release_owner(owner)
+        return True
+
+    def _release_owner(self, owner: str) -> None:
+        self._queued[owner] -= 1
+        if not self._queued[owner]:
+            del self._queued[owner]
+            # Właściciel bez kolejki i z zegarem w tyle zaczyna od bieżącego czasu wirtualnego
+            if self._last_finish.get(owner, 0.0) <= self._virtual_time:
+                self._last_finish.pop(owner, None)
+
+    def record_wait(self, owner: str, seconds: float) -> None:
+        samples = self._wait_stats.get(owner)
+        if samples is None:
+            samples = self._wait_stats[owner] = deque(maxlen=WAIT_STATS_WINDOW)
+        self._wait_stats.move_to_end(owner)
+        samples.append(seconds)
+        while len(self._wait_stats) > WAIT_STATS_OWNERS:
+            self._wait_stats.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Aggregate queue length and recent queue-wait times.
+
+        Owner IDs (user IDs, client addresses) are not reported; the worst per-owner
+        p95 wait shows whether any single owner is being starved.
+        """
+        def percentile(ordered: List[float], q: float) -> float:
+            return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+        waits = sorted(wait for samples in self._wait_stats.values() for wait in samples)
+        summary = {
+            "queued": len(self._heap),
+            "queued_owners": len(self._queued),
+            "max_owner_queued": max(self._queued.values(), default=0),
+            "jobs": len(waits),
+        }
+        if waits:
+            summary.update({
+                "p50_wait": percentile(waits, 0.5),
+                "p95_wait": percentile(waits, 0.95),
+                "max_wait": waits[-1],
+                "worst_owner_p95_wait": max(percentile(sorted(samples), 0.95) for samples in self._wait_stats.values()),
+            })
+        return summary
@@ -0,0 +1,137 @@
+"""
+This module encodes a user's flashcard library as NDJSON, CSV or a zip of per-set CSV files.
+
+The encoders consume `(set, flashcards)` segments (`app.crud.async_crud.iter_user_set_export`)
+and yield the encoded bytes of each segment as soon as it is ready, so an export can be
+streamed straight into a `StreamingResponse` and memory use does not grow with the
+library size. Sets without flashcards are exported too: as a record without a question in
+NDJSON, a row with empty question and answer in CSV and an empty file in the zip. The CSV
+files use the `question`/`answer` header understood by the import
+(`app.services.flashcard_import`), so an exported set can be imported back.
+"""
+
+import codecs
+import csv
+import io
+import json
+import re
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+Segment = Tuple[Dict[str, Any], List[Dict[str, Any]]]
+
+EXPORT_FORMATS = ("ndjson", "csv", "zip")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8", "zip": "application/zip"}
+
+_UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+def _set_name(flashcard_set: Dict[str, Any]) -> str:
+    return flashcard_set.get("name") or str(flashcard_set["id"])
+
+
+def _csv_line(values: List[Any]) -> str:
+    line = io.StringIO()
+    csv.writer(line).writerow(values)
+    return line.getvalue()
+
+
+def _zip_entry_name(name: str, used: set) -> str:
+    base = _UNSAFE_FILENAME_CHARS.sub("_", name).strip(" .") or "zestaw"
+    entry, suffix = f"{base}.csv", 2
+    while entry in used:
+        entry, suffix = f"{base} ({suffix}).csv", suffix + 1
+    used.add(entry)
+    return entry
+
+
+async def encode_ndjson(segments: AsyncIterator[Segment]) -> AsyncIterator[bytes]:
+    """One JSON object per flashcard: `set_id`, `set_name`, `question`, `answer`.
+
+    A set without flashcards gets one record with `set_id`, `set_name` and `flashcard_count: 0`.
+    """
+    async for flashcard_set, cards in segments:
+        if not cards:
+            yield (json.dumps({
+                "set_id": flashcard_set["id"],
+                "set_name": _set_name(flashcard_set),
+                "flashcard_count": 0,
+            }, ensure_ascii=False) + "\n").encode("utf-8")
+            continue
+        yield "".join(
+            json.dumps({
+                "set_id": flashcard_set["id"],
+                "set_name": _set_name(flashcard_set),
+                "question": row["question"],
+                "answer": row["answer"],
+            }, ensure_ascii=False) + "\n"
+            for row in cards
+        ).encode("utf-8")
+
+
+async def encode_csv(segments: AsyncIterator[Segment]) -> AsyncIterator[bytes]:
+    """A single CSV file with `set_name`, `question` and `answer` columns (UTF-8 with BOM for Excel).
+
+    A set without flashcards gets one row with empty `question` and `answer`.
+    """
+    yield codecs.BOM_UTF8 + _csv_line(["set_name", "question", "answer"]).encode("utf-8")
+    async for flashcard_set, cards in segments:
+        name = _set_name(flashcard_set)
+        rows = [[name, row["question"], row["answer"]] for row in cards] or [[name, "", ""]]
+        yield "".join(_csv_line(row) for row in rows).encode("utf-8")
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink for `zipfile`; the written bytes are taken out with `drain`."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def encode_zip(segments: AsyncIterator[Segment]) -> AsyncIterator[bytes]:
+    """A zip archive with one CSV file (`question`, `answer`) per set; an empty set gets a header-only file.
+
+    The output is not seekable, so `zipfile` writes each entry's sizes in a data descriptor
+    after its contents instead of going back to the header; only one segment is compressed at a time.
+    """
+    buffer = _ChunkBuffer()
+    used_names: set = set()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        entry, current_set = None, None
+        try:
+            async for flashcard_set, cards in segments:
+                # Segmenty jednego zestawu następują po sobie, więc każdy zestaw to jeden ciągły plik
+                if entry is None or flashcard_set["id"] != current_set:
+                    if entry is not None:
+                        entry.close()
+                    current_set = flashcard_set["id"]
+                    entry = archive.open(_zip_entry_name(_set_name(flashcard_set), used_names), "w")
+                    entry.write(codecs.BOM_UTF8 + _csv_line(["question", "answer"]).encode("utf-8"))
+                entry.write("".join(_csv_line([row["question"], row["answer"]]) for row in cards).encode("utf-8"))
+                yield buffer.drain()
+        finally:
+            if entry is not None:
+                entry.close()
+    yield buffer.drain()
+
+
+def encode(segments: AsyncIterator[Segment], fmt: str) -> AsyncIterator[bytes]:
+    """Returns the encoder output for `fmt`, one of `EXPORT_FORMATS`.
+
+    :raises ValueError: If the format is unknown.
+    """
+    encoders = {"ndjson": encode_ndjson, "csv": encode_csv, "zip": encode_zip}
+    if fmt not in encoders:
+        raise ValueError(f"Nieobsługiwany format eksportu. Dostępne formaty: {', '.join(EXPORT_FORMATS)}.")
+    return encoders[fmt](segments)
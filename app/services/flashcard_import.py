@@ -0,0 +1,206 @@
+"""
+This module parses uploaded flashcard decks (CSV, TSV, JSONL and Anki text exports).
+
+Files are read as a stream of rows from the uploaded file object, so memory use does
+not depend on the deck size: callers take rows in fixed-size batches (`iter_batches`)
+and insert each batch before reading the next one. Every row is validated on its own;
+a bad row is reported with its line number and the import carries on.
+"""
+
+import codecs
+import csv
+import html
+import io
+import json
+import re
+from dataclasses import dataclass
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import ValidationError
+
+from app.config import IMPORT_MAX_FIELD_CHARS
+from app.schemas.schemas import FlashcardCreate
+
+IMPORT_FORMATS = ("csv", "tsv", "jsonl", "anki")
+# Tyle bajtów z początku pliku wystarcza do rozpoznania kodowania
+ENCODING_SNIFF_BYTES = 64 * 1024
+# Pliki z Excela w polskiej wersji Windows zwykle nie są w UTF-8
+FALLBACK_ENCODING = "cp1250"
+
+_EXTENSIONS = {".csv": "csv", ".tsv": "tsv", ".tab": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".txt": "anki"}
+_QUESTION_HEADERS = {"question", "pytanie", "front", "przód"}
+_ANSWER_HEADERS = {"answer", "odpowiedź", "odpowiedz", "back", "tył"}
+_ANKI_SEPARATORS = {"tab": "\t", "comma": ",", "semicolon": ";", "space": " ", "pipe": "|", "colon": ":"}
+_ANKI_META_COLUMNS = ("notetype column", "deck column", "tags column", "guid column")
+_BREAK_TAG = re.compile(r"<br\s*/?>|</div>|</p>", re.IGNORECASE)
+_HTML_TAG = re.compile(r"<[^>]+>")
+_SOUND_TAG = re.compile(r"\[sound:[^\]]*\]")
+
+csv.field_size_limit(max(IMPORT_MAX_FIELD_CHARS * 4, csv.field_size_limit()))
+
+
+@dataclass
+class ImportRow:
+    line: int
+    flashcard: Optional[FlashcardCreate] = None
+    error: Optional[str] = None
+
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    """Returns the import format: the requested one, or the one implied by the file extension.
+
+    :raises ValueError: If the format is unknown.
+    """
+    if requested:
+        fmt = requested.strip().lower()
+    else:
+        fmt = next((f for ext, f in _EXTENSIONS.items() if (filename or "").lower().endswith(ext)), "")
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Nieobsługiwany format pliku. Dostępne formaty: {', '.join(IMPORT_FORMATS)}.")
+    return fmt
+
+
+def detect_encoding(stream: BinaryIO) -> str:
+    """Guesses the text encoding from the beginning of the file and rewinds it."""
+    head = stream.read(ENCODING_SNIFF_BYTES)
+    stream.seek(0)
+    try:
+        # Ostatni znak mógł zostać ucięty w połowie - dekoder przyrostowy go nie zgłasza jako błędu
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+def _clean_html(value: str) -> str:
+    value = _SOUND_TAG.sub("", _BREAK_TAG.sub("\n", value))
+    return html.unescape(_HTML_TAG.sub("", value))
+
+
+def _validate(line: int, question: Optional[str], answer: Optional[str]) -> ImportRow:
+    question = (question or "").strip()
+    answer = (answer or "").strip()
+    if not question or not answer:
+        return ImportRow(line, error="Brak pytania lub odpowiedzi.")
+    if len(question) > IMPORT_MAX_FIELD_CHARS or len(answer) > IMPORT_MAX_FIELD_CHARS:
+        return ImportRow(line, error=f"Pytanie lub odpowiedź dłuższe niż {IMPORT_MAX_FIELD_CHARS} znaków.")
+    try:
+        return ImportRow(line, flashcard=FlashcardCreate(question=question, answer=answer))
+    except ValidationError as e:
+        return ImportRow(line, error=str(e.errors()[0]["msg"]))
+
+
+def _header_columns(row: Sequence[str]) -> Optional[Tuple[int, int]]:
+    names = [cell.strip().casefold() for cell in row]
+    question = next((i for i, name in enumerate(names) if name in _QUESTION_HEADERS), None)
+    answer = next((i for i, name in enumerate(names) if name in _ANSWER_HEADERS), None)
+    if question is None or answer is None:
+        return None
+    return question, answer
+
+
+def _iter_delimited(text: Iterator[str], delimiter: str) -> Iterator[ImportRow]:
+    reader = csv.reader(text, delimiter=delimiter)
+    columns = None
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if columns is None:
+            # Pierwszy wiersz może być nagłówkiem wskazującym kolumny pytania i odpowiedzi
+            columns = _header_columns(row)
+            if columns is not None:
+                continue
+            columns = (0, 1)
+        if len(row) <= max(columns):
+            yield ImportRow(reader.line_num, error="Za mało kolumn - oczekiwano pytania i odpowiedzi.")
+            continue
+        yield _validate(reader.line_num, row[columns[0]], row[columns[1]])
+
+
+def _iter_jsonl(text: Iterator[str]) -> Iterator[ImportRow]:
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ImportRow(line_number, error=f"Niepoprawny JSON: {e.msg}.")
+            continue
+        if not isinstance(record, dict):
+            yield ImportRow(line_number, error="Oczekiwano obiektu JSON z polami question i answer.")
+            continue
+        if record.get("flashcard_count") == 0 and "question" not in record:
+            # Rekord pustego zestawu z eksportu NDJSON - nie zawiera fiszki
+            continue
+        yield _validate(line_number, record.get("question", record.get("front")), record.get("answer", record.get("back")))
+
+
+def _iter_anki(text: Iterator[str]) -> Iterator[ImportRow]:
+    """Anki "Notes in Plain Text" export: `#key:value` header lines, then separated fields (HTML allowed)."""
+    options: Dict[str, str] = {}
+    header_lines = 0
+    first_line = ""
+    for first_line in text:
+        if not first_line.startswith("#"):
+            break
+        header_lines += 1
+        key, _, value = first_line[1:].partition(":")
+        options[key.strip().lower()] = value.strip()
+        first_line = ""
+
+    separator = options.get("separator", "tab").lower()
+    delimiter = _ANKI_SEPARATORS.get(separator, separator[:1] or "\t")
+    skipped = {int(options[key]) - 1 for key in _ANKI_META_COLUMNS if options.get(key, "").isdigit()}
+    is_html = options.get("html", "true").lower() == "true"
+
+    def lines() -> Iterator[str]:
+        if first_line:
+            yield first_line
+        yield from text
+
+    reader = csv.reader(lines(), delimiter=delimiter)
+    for row in reader:
+        line_number = header_lines + reader.line_num
+        fields = [cell for index, cell in enumerate(row) if index not in skipped]
+        if not any(cell.strip() for cell in fields):
+            continue
+        if len(fields) < 2:
+            yield ImportRow(line_number, error="Za mało pól - oczekiwano przodu i tyłu notatki.")
+            continue
+        question, answer = fields[0], fields[1]
+        if is_html:
+            question, answer = _clean_html(question), _clean_html(answer)
+        yield _validate(line_number, question, answer)
+
+
+def iter_rows(stream: BinaryIO, fmt: str) -> Iterator[ImportRow]:
+    """Parses an uploaded file row by row.
+
+    :param stream: The uploaded file, opened in binary mode (e.g. `UploadFile.file`).
+    :type stream: BinaryIO
+    :param fmt: One of `IMPORT_FORMATS`.
+    :type fmt: str
+    :returns: An iterator of rows, each with either a validated flashcard or an error message.
+    :rtype: Iterator[ImportRow]
+    """
+    text = io.TextIOWrapper(stream, encoding=detect_encoding(stream), errors="replace", newline="")
+    try:
+        if fmt == "jsonl":
+            yield from _iter_jsonl(text)
+        elif fmt == "anki":
+            yield from _iter_anki(text)
+        else:
+            yield from _iter_delimited(text, "\t" if fmt == "tsv" else ",")
+    finally:
+        # Plik należy do wywołującego - odłączamy wrapper, żeby go nie zamknął
+        text.detach()
+
+
+def iter_batches(rows: Iterator[ImportRow], size: int) -> Iterator[List[ImportRow]]:
+    """Groups parsed rows into batches of at most `size`."""
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,140 @@
+"""
+This module parses flashcards out of model output that arrives as a stream of text chunks.
+
+The model is asked for a JSON array of `{question, answer}` objects. The parser tracks
+brace depth and string state character by character, so every object is returned as
+soon as its closing brace arrives, without waiting for the whole array. Objects that
+are not quite valid JSON (trailing commas, missing quotes, a truncated last object) are
+repaired with `json_repair`, so one malformed item does not cost the whole response.
+"""
+
+import json
+from typing import List, Optional
+
+import json_repair
+
+from app.schemas.schemas import FlashcardCreate
+
+
+class IncrementalFlashcardParser:
+    """Extracts complete flashcard objects from a JSON array fed in arbitrary chunks.
+
+    Text before the opening `[` (e.g. an introduction written by the model) is ignored.
+    Malformed objects are repaired where possible; objects that still cannot be read or
+    lack `question`/`answer` are skipped and counted in `skipped`.
+    """
+
+    def __init__(self):
+        self.skipped = 0
+        self._array_started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._current: List[str] = []
+
+    def feed(self, chunk: str) -> List[FlashcardCreate]:
+        """Consumes the next chunk of text and returns the flashcards completed by it.
+
+        :param chunk: The next piece of model output.
+        :type chunk: str
+        :returns: Flashcards whose closing brace was contained in `chunk`.
+        :rtype: List[FlashcardCreate]
+        """
+        completed = []
+        for char in chunk:
+            if not self._array_started:
+                if char == '[':
+                    self._array_started = True
+                continue
+
+            if self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                    self._current = [char]
+                continue
+
+            self._current.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    card = self._to_flashcard(''.join(self._current))
+                    self._current = []
+                    if card is not None:
+                        completed.append(card)
+                    else:
+                        self.skipped += 1
+        return completed
+
+    def finish(self) -> List[FlashcardCreate]:
+        """Salvages the object left unterminated at the end of the output (e.g. cut off by a token limit).
+
+        :returns: The repaired flashcard, if the partial object contains both fields.
+        :rtype: List[FlashcardCreate]
+        """
+        if self._depth == 0 or not self._current:
+            return []
+        raw = ''.join(self._current)
+        self._current = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        card = self._to_flashcard(raw)
+        if card is None:
+            self.skipped += 1
+            return []
+        return [card]
+
+    @staticmethod
+    def _to_flashcard(raw: str) -> Optional[FlashcardCreate]:
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError:
+            item = json_repair.repair_json(raw, return_objects=True)
+        if not isinstance(item, dict):
+            return None
+        question = item.get("question")
+        answer = item.get("answer")
+        if not isinstance(question, str) or not isinstance(answer, str):
+            return None
+        if not question.strip() or not answer.strip():
+            return None
+        return FlashcardCreate(question=question, answer=answer)
+
+
+def parse_flashcards(content: str) -> List[FlashcardCreate]:
+    """Extracts every readable flashcard from a complete model response.
+
+    :param content: The full text generated by the model.
+    :type content: str
+    :returns: The valid flashcards, in order; malformed items are skipped.
+    :rtype: List[FlashcardCreate]
+    """
+    parser = IncrementalFlashcardParser()
+    flashcards = parser.feed(content) + parser.finish()
+    if flashcards or '[' in content:
+        return flashcards
+
+    # Brak tablicy - model mógł zwrócić pojedynczy obiekt lub obiekt z listą fiszek
+    repaired = json_repair.repair_json(content, return_objects=True)
+    items = repaired if isinstance(repaired, list) else [repaired]
+    if isinstance(repaired, dict):
+        items = next((value for value in repaired.values() if isinstance(value, list)), items)
+    flashcards = []
+    for item in items:
+        card = IncrementalFlashcardParser._to_flashcard(json.dumps(item)) if isinstance(item, dict) else None
+        if card is not None:
+            flashcards.append(card)
+    return flashcards
@@ -4,11 +4,16 @@ and CRUD operations for flashcard sets and individual flashcards.
 It orchestrates interactions between routers, CRUD operations, and external AI models.
 """
 
-from typing import List, Any
-from supabase import Client
-from app.schemas.schemas import FlashcardCreate, FlashcardSetCreate, FlashcardSet
+from typing import List, Any, Optional, Tuple
+from supabase import AClient
+from app.config import DETECT_DUPLICATES
+from app.schemas.schemas import FlashcardBatchItem, FlashcardCreate, FlashcardSetCreate, FlashcardSet
 from app.services.ollama import generate_flashcards_from_text as ollama_generate
-from app.crud import crud
+from app.services.duplicate_detection import (
+    DuplicateMatch, build_index, duplicate_indexes, flag_existing_duplicates, merge_duplicates
+)
+from app.services.metrics import metrics
+from app.crud import async_crud
 from app.exceptions import GenerationFailedError, SaveFailedError
 from fastapi import HTTPException, status
 
@@ -35,14 +40,14 @@ async def generate_flashcards(text: str, count: int) -> List[FlashcardCreate]:
         raise GenerationFailedError(f"Failed to generate flashcards: {e}")
 
 
-def save_flashcard_set(db: Client, set_data: FlashcardSetCreate, user_id: str) -> FlashcardSet:
+async def save_flashcard_set(db: AClient, set_data: FlashcardSetCreate, user_id: str) -> FlashcardSet:
     """Saves a new flashcard set to the database.
 
     This function handles the creation of a new flashcard set, including its associated
-    flashcards, and ensures that set names are unique for a given user.
+    flashcards, in a single atomic database call. Set names are unique for a given user.
 
-    :param db: The Supabase client instance.
-    :type db: Client
+    :param db: The async Supabase client instance.
+    :type db: AClient
     :param set_data: The data for the flashcard set to be created, including its name and flashcards.
     :type set_data: FlashcardSetCreate
     :param user_id: The ID of the user who owns the flashcard set.
@@ -51,28 +56,66 @@ def save_flashcard_set(db: Client, set_data: FlashcardSetCreate, user_id: str) -
     :returns: The created flashcard set object.
     :rtype: FlashcardSet
     :dependencies:
-        - `app.crud.crud`: For database CRUD operations.
+        - `app.crud.async_crud`: For database CRUD operations.
         - `app.exceptions.SaveFailedError`: Custom exception for save failures.
     """
     set_name = set_data.name.strip()
     if not set_name:
         raise SaveFailedError("Set name cannot be empty.")
 
-    existing_set = db.table('flashcard_sets').select('id').eq('user_id', user_id).eq('name', set_name).execute()
-    if existing_set.data:
-        raise SaveFailedError(f"A set with the name '{set_name}' already exists.")
+    if DETECT_DUPLICATES:
+        flashcards, merged = merge_duplicates(set_data.flashcards)
+        if merged:
+            set_data = FlashcardSetCreate(name=set_data.name, flashcards=flashcards)
 
     try:
-        created_set = crud.create_flashcard_set(db, set_data, user_id)
+        created_set = await async_crud.create_flashcard_set(db, set_data, user_id)
+        duplicate_indexes.add_set(user_id, created_set)
         return FlashcardSet(**created_set)
+    except ValueError:
+        # Unikalność nazwy sprawdza ograniczenie (user_id, name) w bazie przy samym zapisie
+        raise SaveFailedError(f"A set with the name '{set_name}' already exists.")
     except Exception as e:
         raise SaveFailedError(f"Failed to save flashcard set: {e}")
 
-def update_flashcard(db: Client, card_id: str, user_id: str, flashcard_data: dict) -> Any:
+async def find_duplicates(
+    db: AClient, flashcards: List[FlashcardCreate], user_id: str
+) -> Tuple[List[FlashcardCreate], int, List[Optional[DuplicateMatch]]]:
+    """Merges near-duplicate flashcards within a batch and flags those repeating the user's stored cards.
+
+    :param db: The async Supabase client instance.
+    :type db: AClient
+    :param flashcards: The flashcards about to be saved.
+    :type flashcards: List[FlashcardCreate]
+    :param user_id: The ID of the user whose existing sets are searched.
+    :type user_id: str
+    :returns: The flashcards without repeats within the batch, the number of merged repeats,
+              and for every remaining flashcard the matching stored card or `None`.
+    :rtype: Tuple[List[FlashcardCreate], int, List[Optional[DuplicateMatch]]]
+    :dependencies:
+        - `app.services.duplicate_detection`: For the similarity search.
+        - `app.crud.async_crud`: For loading the user's stored flashcards.
+    :notes:
+        - With `DETECT_DUPLICATES` disabled the flashcards are returned unchanged and nothing is flagged.
+        - The index of stored cards is reused from `duplicate_indexes` and only rebuilt when it has expired.
+    """
+    if not DETECT_DUPLICATES:
+        return list(flashcards), 0, [None] * len(flashcards)
+    kept, merged = merge_duplicates(flashcards)
+    index = duplicate_indexes.get(user_id)
+    if index is None:
+        index = build_index(await async_crud.get_user_flashcards(db, user_id))
+        duplicate_indexes.put(user_id, index)
+    flags = flag_existing_duplicates([fc.question for fc in kept], index)
+    metrics.increment("duplicates.merged", merged)
+    metrics.increment("duplicates.flagged", sum(flag is not None for flag in flags))
+    return kept, merged, flags
+
+async def update_flashcard(db: AClient, card_id: str, user_id: str, flashcard_data: dict) -> Any:
     """Updates an existing flashcard in the database.
 
-    :param db: The Supabase client instance.
-    :type db: Client
+    :param db: The async Supabase client instance.
+    :type db: AClient
     :param card_id: The ID of the flashcard to update.
     :type card_id: str
     :param user_id: The ID of the user who owns the flashcard. Used for authorization.
@@ -82,18 +125,52 @@ def update_flashcard(db: Client, card_id: str, user_id: str, flashcard_data: dic
     :returns: The updated flashcard data.
     :rtype: Any
     :dependencies:
-        - `app.crud.crud`: For database CRUD operations.
+        - `app.crud.async_crud`: For database CRUD operations.
+    """
+    updated = await async_crud.update_flashcard(db, card_id, user_id, flashcard_data)
+    duplicate_indexes.invalidate(user_id)
+    return updated
+
+async def update_flashcards(db: AClient, set_id: str, user_id: str, flashcards: List[FlashcardBatchItem]) -> List[Any]:
+    """Updates many flashcards of one set with a single batched write.
+
+    :param db: The async Supabase client instance.
+    :type db: AClient
+    :param set_id: The ID of the set all flashcards must belong to.
+    :type set_id: str
+    :param user_id: The ID of the user who owns the set. Used for authorization.
+    :type user_id: str
+    :param flashcards: The new contents of the flashcards, each with its ID.
+    :type flashcards: List[FlashcardBatchItem]
+    :raises ValueError: If a question or answer is empty or a flashcard appears more than once.
+    :raises HTTPException: If any flashcard is not found in the user's set (nothing is then updated).
+    :returns: The updated flashcards.
+    :rtype: List[Any]
+    :dependencies:
+        - `app.crud.async_crud`: For database CRUD operations.
     """
-    return crud.update_flashcard(db, card_id, user_id, flashcard_data)
+    changes = [
+        {'id': str(fc.id), 'question': fc.question.strip(), 'answer': fc.answer.strip()}
+        for fc in flashcards
+    ]
+    if any(not change['question'] or not change['answer'] for change in changes):
+        raise ValueError("Pytanie i odpowiedź nie mogą być puste.")
+    if len({change['id'] for change in changes}) != len(changes):
+        raise ValueError("Każda fiszka może wystąpić w zmianach tylko raz.")
+    updated = await async_crud.update_flashcards(db, user_id, changes, set_id=set_id)
+    # Zmienione pytania muszą trafić do indeksu duplikatów
+    duplicate_indexes.invalidate(user_id)
+    metrics.increment("flashcards.batch_updated", len(updated))
+    return updated
 
-def delete_flashcard_set(db: Client, set_id: str, user_id: str) -> None:
+async def delete_flashcard_set(db: AClient, set_id: str, user_id: str) -> None:
     """Deletes a flashcard set from the database.
 
     This function deletes a flashcard set and all associated flashcards.
     Authorization is performed based on the user ID.
 
-    :param db: The Supabase client instance.
-    :type db: Client
+    :param db: The async Supabase client instance.
+    :type db: AClient
     :param set_id: The ID of the flashcard set to delete.
     :type set_id: str
     :param user_id: The ID of the user who owns the flashcard set. Used for authorization.
@@ -101,6 +178,7 @@ def delete_flashcard_set(db: Client, set_id: str, user_id: str) -> None:
     :returns: None
     :rtype: None
     :dependencies:
-        - `app.crud.crud`: For database CRUD operations.
+        - `app.crud.async_crud`: For database CRUD operations.
     """
-    crud.delete_flashcard_set(db, set_id, user_id)
+    await async_crud.delete_flashcard_set(db, set_id, user_id)
+    duplicate_indexes.invalidate(user_id)
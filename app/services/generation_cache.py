@@ -0,0 +1,212 @@
+"""
+This module provides a content-addressed cache for AI generation results.
+
+Entries are keyed by a hash of the normalized source text, the model name and the
+requested flashcard count, so identical requests (e.g. a whole class pasting the same
+notes) are answered from memory instead of re-running LLM inference. The cache has an
+in-memory LRU tier and an optional on-disk SQLite tier with TTL and size-based eviction.
+Async callers use `aget`/`aset`, which run the SQLite queries and commits in a worker
+thread (`asyncio.to_thread`) so that disk I/O does not block the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.config import (
+    GENERATION_CACHE_SIZE,
+    GENERATION_CACHE_TTL,
+    GENERATION_CACHE_DB,
+    GENERATION_CACHE_DB_MAX_BYTES,
+)
+from app.schemas.schemas import FlashcardCreate
+from app.services.metrics import metrics
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes source text so that trivially different pastes share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, count: int, model: str) -> str:
+    """Builds the cache key for a generation request.
+
+    :param text: The source text.
+    :type text: str
+    :param count: The requested number of flashcards.
+    :type count: int
+    :param model: The name of the model used for generation.
+    :type model: str
+    :returns: A hex SHA-256 digest identifying the request.
+    :rtype: str
+    """
+    material = f"{model}\0{count}\0{normalize_text(text)}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Two-tier (memory + optional SQLite) cache of generated flashcards."""
+
+    def __init__(self, max_entries: int, ttl: float, db_path: Optional[str] = None, db_max_bytes: int = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_max_bytes = db_max_bytes
+        self._memory: "OrderedDict[str, Tuple[List[FlashcardCreate], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Osobna blokada połączenia SQLite - zapytania do dysku nie blokują odczytów z pamięci
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[List[FlashcardCreate]]:
+        now = time.time()
+        flashcards = self._get_from_memory(key, now)
+        if flashcards is None:
+            flashcards = self._load_from_disk(key, now)
+        return self._record_lookup(flashcards)
+
+    async def aget(self, key: str) -> Optional[List[FlashcardCreate]]:
+        """Like `get`, but reads the SQLite tier in a worker thread."""
+        now = time.time()
+        flashcards = self._get_from_memory(key, now)
+        if flashcards is None and self._db is not None:
+            flashcards = await asyncio.to_thread(self._load_from_disk, key, now)
+        return self._record_lookup(flashcards)
+
+    def set(self, key: str, flashcards: List[FlashcardCreate]) -> None:
+        if not flashcards:
+            return
+        now = time.time()
+        with self._lock:
+            self._put_in_memory(key, list(flashcards), now)
+        self._write_to_disk(key, flashcards, now)
+
+    async def aset(self, key: str, flashcards: List[FlashcardCreate]) -> None:
+        """Like `set`, but writes the SQLite tier in a worker thread."""
+        if not flashcards:
+            return
+        now = time.time()
+        with self._lock:
+            self._put_in_memory(key, list(flashcards), now)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_to_disk, key, list(flashcards), now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM generation_cache")
+                self._db.commit()
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _get_from_memory(self, key: str, now: float) -> Optional[List[FlashcardCreate]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            flashcards, stored_at = entry
+            if now - stored_at < self.ttl:
+                self._memory.move_to_end(key)
+                metrics.increment("generation_cache.hits.memory")
+                return list(flashcards)
+            del self._memory[key]
+            return None
+
+    def _load_from_disk(self, key: str, now: float) -> Optional[List[FlashcardCreate]]:
+        with self._db_lock:
+            flashcards = self._get_from_disk(key, now)
+        if flashcards is None:
+            return None
+        with self._lock:
+            self._put_in_memory(key, flashcards, now)
+        metrics.increment("generation_cache.hits.disk")
+        return list(flashcards)
+
+    def _write_to_disk(self, key: str, flashcards: List[FlashcardCreate], now: float) -> None:
+        with self._db_lock:
+            self._put_on_disk(key, flashcards, now)
+
+    @staticmethod
+    def _record_lookup(flashcards: Optional[List[FlashcardCreate]]) -> Optional[List[FlashcardCreate]]:
+        if flashcards is None:
+            metrics.increment("generation_cache.misses")
+        return flashcards
+
+    def _put_in_memory(self, key: str, flashcards: List[FlashcardCreate], now: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (flashcards, now)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_from_disk(self, key: str, now: float) -> Optional[List[FlashcardCreate]]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, created_at FROM generation_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if now - created_at >= self.ttl:
+            self._db.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        self._db.execute("UPDATE generation_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        return [FlashcardCreate(**item) for item in json.loads(value)]
+
+    def _put_on_disk(self, key: str, flashcards: List[FlashcardCreate], now: float) -> None:
+        if self._db is None:
+            return
+        value = json.dumps([fc.model_dump() for fc in flashcards], ensure_ascii=False)
+        self._db.execute(
+            "INSERT OR REPLACE INTO generation_cache (key, value, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value.encode("utf-8")), now, now),
+        )
+        self._db.execute("DELETE FROM generation_cache WHERE created_at <= ?", (now - self.ttl,))
+        self._evict_disk()
+        self._db.commit()
+
+    def _evict_disk(self) -> None:
+        if self.db_max_bytes <= 0:
+            return
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM generation_cache").fetchone()[0]
+        if total <= self.db_max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM generation_cache ORDER BY accessed_at ASC").fetchall()
+        for key, size in rows:
+            if total <= self.db_max_bytes:
+                break
+            self._db.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+            total -= size
+            metrics.increment("generation_cache.evictions.disk")
+
+
+generation_cache = GenerationCache(
+    max_entries=GENERATION_CACHE_SIZE,
+    ttl=GENERATION_CACHE_TTL,
+    db_path=GENERATION_CACHE_DB,
+    db_max_bytes=GENERATION_CACHE_DB_MAX_BYTES,
+)
@@ -0,0 +1,63 @@
+"""
+This module keeps the Ollama `context` of recent generations for "generate more" requests.
+
+Ollama returns the tokens of the evaluated prompt and the answer as `context`; sending
+them back with a follow-up prompt lets the model continue without evaluating the source
+text again. Contexts are tied to a user session and a source text key and evicted in
+LRU order. A context produced by a plain generation is first kept unowned and is
+claimed by the session that requested it.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.config import GENERATION_CONTEXT_SIZE
+
+
+class GenerationContextStore:
+    """LRU store of Ollama contexts keyed by (session, text key)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Optional[str], str], List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, text_key: str, context: List[int]) -> None:
+        """Keeps the context of the latest generation for `text_key` until a session claims it."""
+        self._put((None, text_key), context)
+
+    def claim(self, session_id: str, text_key: str) -> bool:
+        """Moves the unowned context for `text_key` to `session_id`; returns whether there was one."""
+        with self._lock:
+            context = self._entries.pop((None, text_key), None)
+        if context is None:
+            return False
+        self._put((session_id, text_key), context)
+        return True
+
+    def get(self, session_id: str, text_key: str) -> Optional[List[int]]:
+        with self._lock:
+            context = self._entries.get((session_id, text_key))
+            if context is not None:
+                self._entries.move_to_end((session_id, text_key))
+            return context
+
+    def put(self, session_id: str, text_key: str, context: List[int]) -> None:
+        self._put((session_id, text_key), context)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _put(self, key: Tuple[Optional[str], str], context: List[int]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = context
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+generation_contexts = GenerationContextStore(GENERATION_CONTEXT_SIZE)
@@ -0,0 +1,369 @@
+"""
+This module runs flashcard generations as background jobs.
+
+Jobs are put on a bounded queue and processed by a fixed pool of workers, which caps
+how many generations reach Ollama at the same time. When the queue is full, new jobs
+are rejected immediately with HTTP 429 instead of waiting for a timeout. Job state and
+results are stored in SQLite, so a client can poll for the result after a page reload.
+All SQLite queries and commits run, in order, on one dedicated thread, so they never
+block the event loop. Persistence across restarts is opt-in: without `GENERATION_JOBS_DB`
+the database lives in memory and job results are lost when the process exits.
+Streamed generations, which the caller runs itself, take a worker with `slot` and so
+share the same cap, queue and 429s.
+
+The queue is a weighted fair queue (`app.services.fair_scheduler`): workers take jobs
+by each owner's fair share rather than in arrival order, small requests are served
+before bulk ones, and every owner is rate-limited with a token bucket.
+"""
+
+import asyncio
+import json
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.config import (
+    GENERATION_WORKERS,
+    GENERATION_QUEUE_MAX,
+    GENERATION_QUEUE_MAX_PER_USER,
+    GENERATION_USER_WEIGHTS,
+    GENERATION_RATE_PER_MINUTE,
+    GENERATION_RATE_BURST,
+    GENERATION_JOBS_DB,
+    GENERATION_JOB_TTL,
+)
+from app.exceptions import GenerationQueueFullError, GenerationRateLimitedError
+from app.schemas.schemas import FlashcardCreate, GenerationJobStatus
+from app.services.circuit_breaker import ollama_breaker
+from app.services.fair_scheduler import FairQueue, TokenBucket, parse_weights
+from app.services.metrics import metrics
+from app.services.ollama import generate_flashcards_from_text
+
+GenerateFunction = Callable[[str, int], Awaitable[List[FlashcardCreate]]]
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class _Job:
+    id: str
+    user_id: str
+    text: str
+    count: int
+    generate: GenerateFunction
+    future: Optional[asyncio.Future] = None
+    task: Optional[asyncio.Task] = None
+    cancelled: bool = False
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class JobStore:
+    """SQLite-backed storage of job state and results.
+
+    The methods are blocking; `JobManager` calls them only from its storage thread.
+    An empty `db_path` keeps the jobs in memory (nothing survives a restart).
+    """
+
+    def __init__(self, db_path: str):
+        self._db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS generation_jobs ("
+            "id TEXT PRIMARY KEY, user_id TEXT NOT NULL, count INTEGER NOT NULL, status TEXT NOT NULL, "
+            "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def create(self, job_id: str, user_id: str, count: int) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM generation_jobs WHERE updated_at < ?", (now - GENERATION_JOB_TTL,))
+            self._db.execute(
+                "INSERT INTO generation_jobs (id, user_id, count, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, count, STATUS_QUEUED, now, now),
+            )
+            self._db.commit()
+
+    def update(self, job_id: str, status: str, result: Optional[List[FlashcardCreate]] = None, error: Optional[str] = None) -> None:
+        payload = None
+        if result is not None:
+            payload = json.dumps([FlashcardCreate.model_validate(fc).model_dump() for fc in result], ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "UPDATE generation_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, payload, error, time.time(), job_id),
+            )
+            self._db.commit()
+
+    def get(self, job_id: str, user_id: str) -> Optional[GenerationJobStatus]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, count, status, result, error, created_at, updated_at FROM generation_jobs "
+                "WHERE id = ? AND user_id = ?",
+                (job_id, user_id),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, count, status, result, error, created_at, updated_at = row
+        return GenerationJobStatus(
+            job_id=job_id,
+            status=status,
+            count=count,
+            flashcards=[FlashcardCreate(**item) for item in json.loads(result)] if result else None,
+            error=error,
+            created_at=datetime.fromtimestamp(created_at, timezone.utc),
+            updated_at=datetime.fromtimestamp(updated_at, timezone.utc),
+        )
+
+    def fail_unfinished(self, error: str) -> None:
+        """Marks jobs left queued or running (e.g. by a previous process) as failed."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE generation_jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)",
+                (STATUS_FAILED, error, time.time(), STATUS_QUEUED, STATUS_RUNNING),
+            )
+            self._db.commit()
+
+
+class JobManager:
+    """Bounded fair job queue with a fixed pool of generation workers."""
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        db_path: str,
+        max_queue_per_user: int = 0,
+        weights: Optional[Dict[str, float]] = None,
+        rate_per_minute: float = 0,
+        rate_burst: int = 0,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.weights = weights or {}
+        self.rate_limiter = TokenBucket(rate_per_minute, rate_burst)
+        self._db_path = db_path
+        self._store: Optional[JobStore] = None
+        # Jeden wątek dla SQLite: zapisy wykonują się w kolejności zlecenia, a odczyt widzi wcześniejsze zapisy
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generation-jobs-db")
+        self._queue: Optional[FairQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = JobStore(self._db_path)
+            self._store.fail_unfinished("Zadanie przerwane przez restart serwera.")
+        return self._store
+
+    def _store_call(self, method: str, *args: Any, **kwargs: Any) -> Future:
+        """Runs a `JobStore` method on the storage thread."""
+        return self._io.submit(lambda: getattr(self.store, method)(*args, **kwargs))
+
+    def _store_write(self, method: str, *args: Any, **kwargs: Any) -> None:
+        """Queues a `JobStore` write without waiting for the commit."""
+        self._store_call(method, *args, **kwargs).add_done_callback(self._check_write)
+
+    @staticmethod
+    def _check_write(future: Future) -> None:
+        if future.exception() is not None:
+            metrics.increment("generation_jobs.store_errors")
+
+    def start(self) -> None:
+        """Starts the worker pool in the running event loop (no-op if already running there)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._queue = FairQueue(self.max_queue, self.max_queue_per_user, self.weights)
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._loop = loop
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def scheduler_stats(self) -> Dict[str, float]:
+        """Aggregate queue length and queue-wait times (no owner IDs)."""
+        return self._queue.stats() if self._queue is not None else {}
+
+    def check_rate_limit(self, user_id: str) -> None:
+        """Takes a token from the owner's bucket.
+
+        :raises GenerationRateLimitedError: If the owner has used up their submissions for now.
+        """
+        retry_after = self.rate_limiter.acquire(user_id)
+        if retry_after:
+            metrics.increment("generation_jobs.rate_limited")
+            raise GenerationRateLimitedError(retry_after=math.ceil(retry_after))
+
+    def _enqueue(self, user_id: str, text: str, count: int, generate: Optional[GenerateFunction], wait: bool) -> _Job:
+        self.start()
+        # Przy otwartym bezpieczniku odrzucamy od razu, zamiast kolejkować zadanie skazane na porażkę
+        ollama_breaker.check()
+        if self._queue.full() or self._queue.owner_full(user_id):
+            metrics.increment("generation_jobs.rejected")
+            raise GenerationQueueFullError()
+        self.check_rate_limit(user_id)
+        job = _Job(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            text=text,
+            count=count,
+            generate=generate or generate_flashcards_from_text,
+            future=asyncio.get_running_loop().create_future() if wait else None,
+        )
+        self._store_write("create", job.id, user_id, count)
+        self._queue.put_nowait(job, owner=user_id, cost=count)
+        metrics.increment("generation_jobs.submitted")
+        return job
+
+    def submit(self, user_id: str, text: str, count: int, generate: Optional[GenerateFunction] = None) -> str:
+        """Queues a generation job and returns its ID without waiting for the result.
+
+        :param user_id: The ID of the user (or API client) that owns the job.
+        :type user_id: str
+        :param text: The source text.
+        :type text: str
+        :param count: The number of flashcards to generate.
+        :type count: int
+        :param generate: The generation function (defaults to `generate_flashcards_from_text`).
+        :type generate: Optional[GenerateFunction]
+        :raises GenerationQueueFullError: If the queue already holds `max_queue` jobs, or the
+                                          owner already has `max_queue_per_user` jobs queued.
+        :raises GenerationRateLimitedError: If the owner exceeded the submission rate limit.
+        :raises OllamaUnavailableError: If the Ollama circuit breaker is open.
+        :returns: The job ID.
+        :rtype: str
+        """
+        return self._enqueue(user_id, text, count, generate, wait=False).id
+
+    async def run(self, user_id: str, text: str, count: int, generate: Optional[GenerateFunction] = None) -> List[FlashcardCreate]:
+        """Queues a generation job and waits for its result.
+
+        If the caller is cancelled (e.g. its HTTP client disconnected), the job is cancelled
+        too: a queued job is skipped and a running generation is aborted, which closes the
+        connection to Ollama. Use `submit` for jobs that must outlive the caller.
+
+        :raises GenerationQueueFullError: If the queue (or the owner's share of it) is full.
+        :raises GenerationRateLimitedError: If the owner exceeded the submission rate limit.
+        :raises HTTPException: If the generation itself fails.
+        :returns: The generated flashcards.
+        :rtype: List[FlashcardCreate]
+        """
+        job = self._enqueue(user_id, text, count, generate, wait=True)
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            self._cancel(job)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, count: int) -> AsyncIterator[None]:
+        """Holds a worker for a generation the caller runs itself (e.g. a streamed one).
+
+        The slot goes through the same admission and queue as jobs: it counts against
+        `workers`, is rejected when the queue (or the owner's share of it) is full or the
+        owner is rate-limited, and waits its fair turn. The worker is released when the
+        `async with` block exits.
+
+        :raises GenerationQueueFullError: If the queue (or the owner's share of it) is full.
+        :raises GenerationRateLimitedError: If the owner exceeded the submission rate limit.
+        :raises OllamaUnavailableError: If the Ollama circuit breaker is open.
+        """
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        released = asyncio.Event()
+
+        async def hold(text: str, count: int) -> List[FlashcardCreate]:
+            granted.set_result(None)
+            await released.wait()
+            return []
+
+        job = self._enqueue(user_id, "", count, hold, wait=True)
+        try:
+            await asyncio.wait([granted, job.future], return_when=asyncio.FIRST_COMPLETED)
+            if not granted.done():
+                # Worker zakończył się (np. zatrzymanie aplikacji), zanim przydzielił miejsce
+                raise GenerationQueueFullError()
+            yield
+        finally:
+            released.set()
+            if not granted.done():
+                self._cancel(job)
+
+    async def get(self, job_id: str, user_id: str) -> Optional[GenerationJobStatus]:
+        return await asyncio.wrap_future(self._store_call("get", job_id, user_id))
+
+    def _cancel(self, job: _Job) -> None:
+        if job.cancelled or (job.future is not None and job.future.done()):
+            return
+        job.cancelled = True
+        if job.task is not None:
+            job.task.cancel()
+        elif self._queue is not None and self._queue.discard(job):
+            # Zadanie jeszcze czekało - zwalniamy jego miejsce w kolejce od razu
+            self._store_write("update", job.id, STATUS_FAILED, error="Zadanie zostało anulowane.")
+        metrics.increment("generation_jobs.cancelled")
+
+    async def _worker(self) -> None:
+        while True:
+            owner, job = await self._queue.get()
+            if job.cancelled:
+                self._store_write("update", job.id, STATUS_FAILED, error="Zadanie zostało anulowane.")
+                continue
+            waited = time.monotonic() - job.enqueued_at
+            metrics.observe("generation_jobs.queue_wait", waited)
+            self._queue.record_wait(owner, waited)
+            self._store_write("update", job.id, STATUS_RUNNING)
+            try:
+                job.task = asyncio.ensure_future(job.generate(job.text, job.count))
+                flashcards = await job.task
+                self._store_write("update", job.id, STATUS_DONE, result=flashcards)
+                metrics.increment("generation_jobs.done")
+                if job.future is not None and not job.future.done():
+                    job.future.set_result(flashcards)
+            except asyncio.CancelledError:
+                self._store_write("update", job.id, STATUS_FAILED, error="Zadanie zostało anulowane.")
+                if job.future is not None and not job.future.done():
+                    job.future.cancel()
+                # Anulowano samo zadanie (klient odszedł) - worker obsługuje kolejne
+                if not job.cancelled or asyncio.current_task().cancelling():
+                    raise
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                self._store_write("update", job.id, STATUS_FAILED, error=detail)
+                metrics.increment("generation_jobs.failed")
+                if job.future is not None and not job.future.done():
+                    job.future.set_exception(e)
+
+
+job_manager = JobManager(
+    GENERATION_WORKERS,
+    GENERATION_QUEUE_MAX,
+    GENERATION_JOBS_DB,
+    max_queue_per_user=GENERATION_QUEUE_MAX_PER_USER,
+    weights=parse_weights(GENERATION_USER_WEIGHTS),
+    rate_per_minute=GENERATION_RATE_PER_MINUTE,
+    rate_burst=GENERATION_RATE_BURST,
+)
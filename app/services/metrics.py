@@ -0,0 +1,82 @@
+"""
+This module provides a small in-process metrics registry (counters and timings)
+used by the generation pipeline. A snapshot is exposed at `GET /metrics`.
+"""
+
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional
+
+TIMING_WINDOW = 500
+
+
+class Metrics:
+    """Thread-safe counters and timing samples kept in memory.
+
+    Timings keep the last `TIMING_WINDOW` samples per name, which is enough to
+    compute recent percentiles without unbounded memory growth.
+    """
+
+    def __init__(self, window: int = TIMING_WINDOW):
+        self._window = window
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._timings: Dict[str, Deque[float]] = {}
+        self._timing_counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            samples = self._timings.get(name)
+            if samples is None:
+                samples = self._timings[name] = deque(maxlen=self._window)
+            samples.append(value)
+            self._timing_counts[name] += 1
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def sample_count(self, name: str) -> int:
+        """Returns the number of recent samples kept for a timing."""
+        with self._lock:
+            return len(self._timings.get(name, ()))
+
+    def percentile(self, name: str, q: float) -> Optional[float]:
+        """Returns the `q`-th percentile (0-100) of the recent samples, or `None` without samples."""
+        with self._lock:
+            samples = sorted(self._timings.get(name, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, round(q / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: sorted(samples) for name, samples in self._timings.items()}
+            counts = dict(self._timing_counts)
+        summary = {}
+        for name, samples in timings.items():
+            if not samples:
+                continue
+            summary[name] = {
+                "count": counts[name],
+                "avg": sum(samples) / len(samples),
+                "p50": samples[len(samples) // 2],
+                "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                "max": samples[-1],
+            }
+        return {"counters": counters, "timings": summary}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+            self._timing_counts.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,79 @@
+"""
+This module keeps the Ollama model loaded, so users do not pay the model-load cost.
+
+At startup the model (and the draft model, if one is configured) is loaded on every backend with an empty generate request
+(Ollama's documented way to preload a model). Afterwards a background task touches
+it again before `OLLAMA_KEEP_ALIVE` would let Ollama unload it. Load times are
+reported through `record_load_duration` (`ollama.load_duration`, `ollama.cold_starts`).
+"""
+
+import asyncio
+from typing import Optional
+
+import httpx
+
+from app.config import OLLAMA_WARMUP, OLLAMA_WARMUP_TIMEOUT
+from app.services import model_router, ollama
+from app.services.metrics import metrics
+
+# Model jest odświeżany po tej części czasu keep_alive, z zapasem na opóźnienia
+KEEPER_INTERVAL_FACTOR = 0.8
+
+_keeper_task: Optional[asyncio.Task] = None
+
+
+async def warm_up(client: httpx.AsyncClient) -> None:
+    """Loads every routed model on every backend; unreachable backends are skipped."""
+
+    async def load(url: str, model: str) -> None:
+        payload = {"model": model, "keep_alive": ollama.KEEP_ALIVE}
+        try:
+            response = await client.post(f"{url}/api/generate", json=payload, timeout=OLLAMA_WARMUP_TIMEOUT)
+            response.raise_for_status()
+            response_data = response.json()
+        except (httpx.HTTPError, ValueError):
+            # Także odpowiedź 200, której treść nie jest JSON-em (np. strona błędu proxy)
+            metrics.increment("ollama.warmup.failures")
+            return
+        if isinstance(response_data, dict):
+            ollama.record_load_duration(response_data)
+        metrics.increment("ollama.warmup.done")
+
+    await asyncio.gather(*(
+        load(backend.url, model) for backend in ollama.backend_pool.backends for model in model_router.models()
+    ))
+
+
+async def _keeper_loop(interval: Optional[float]) -> None:
+    while True:
+        try:
+            await warm_up(ollama.get_http_client())
+        except Exception:
+            # Nieprzewidziany błąd nie może zatrzymać odświeżania - inaczej model wyładuje się po keep_alive
+            metrics.increment("ollama.warmup.failures")
+        if interval is None:
+            return
+        await asyncio.sleep(interval)
+
+
+def start_model_keeper() -> None:
+    """Starts the warm-up (and, with a finite `keep_alive`, the periodic re-touch) in the background."""
+    global _keeper_task
+    loop = asyncio.get_running_loop()
+    # W trybie OLLAMA_MOCK (testy, praca bez modelu) nie wysyłamy zapytań do prawdziwych backendów
+    if not OLLAMA_WARMUP or ollama._mock_enabled() or (_keeper_task is not None and _keeper_task.get_loop() is loop):
+        return
+    # Ten sam parser co wartość wysyłana do Ollama (`ollama.parse_keep_alive`), sprawdzona już przy imporcie
+    keep_alive = ollama.KEEP_ALIVE_SECONDS
+    interval = keep_alive * KEEPER_INTERVAL_FACTOR if keep_alive is not None else None
+    _keeper_task = loop.create_task(_keeper_loop(interval))
+
+
+async def stop_model_keeper() -> None:
+    global _keeper_task
+    # Zadanie z innej pętli zdarzeń (inna instancja aplikacji, np. w testach) zostawiamy w spokoju
+    if _keeper_task is None or _keeper_task.get_loop() is not asyncio.get_running_loop():
+        return
+    task, _keeper_task = _keeper_task, None
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,73 @@
+"""
+This module picks the Ollama model for a generation request.
+
+Most requests are a few paragraphs for a handful of flashcards, which a smaller, faster
+draft model (`OLLAMA_DRAFT_MODEL_NAME`) answers well; long texts and large counts go to
+the full `OLLAMA_MODEL_NAME`. Calls are counted per model (`ollama.model.<name>.*` in
+`/metrics`), so the thresholds can be tuned against the latency and failure rates
+each model actually shows.
+"""
+
+from typing import Dict, List, Optional
+
+from app.config import OLLAMA_MODEL_NAME, OLLAMA_DRAFT_MODEL_NAME, OLLAMA_DRAFT_MAX_CHARS, OLLAMA_DRAFT_MAX_COUNT
+from app.services.metrics import metrics
+
+
+def draft_enabled() -> bool:
+    return bool(OLLAMA_DRAFT_MODEL_NAME) and OLLAMA_DRAFT_MODEL_NAME != OLLAMA_MODEL_NAME
+
+
+def select_model(text: str, count: int) -> str:
+    """Returns the draft model for requests within both thresholds, otherwise the full model.
+
+    :param text: The (preprocessed) source text.
+    :type text: str
+    :param count: The number of flashcards requested.
+    :type count: int
+    :returns: The name of the Ollama model to use.
+    :rtype: str
+    """
+    if draft_enabled() and len(text) <= OLLAMA_DRAFT_MAX_CHARS and count <= OLLAMA_DRAFT_MAX_COUNT:
+        metrics.increment("generation.routed.draft")
+        return OLLAMA_DRAFT_MODEL_NAME
+    metrics.increment("generation.routed.full")
+    return OLLAMA_MODEL_NAME
+
+
+def fallback_model(model: str) -> Optional[str]:
+    """The model to retry with when `model` fails: the full model for the draft one, otherwise none."""
+    return OLLAMA_MODEL_NAME if model != OLLAMA_MODEL_NAME else None
+
+
+def models() -> List[str]:
+    """All models requests can be routed to, the full model first."""
+    return [OLLAMA_MODEL_NAME, OLLAMA_DRAFT_MODEL_NAME] if draft_enabled() else [OLLAMA_MODEL_NAME]
+
+
+def record_call(model: str, seconds: Optional[float] = None, failed: bool = False) -> None:
+    """Counts a call to `model`, with its latency if it succeeded."""
+    metrics.increment(f"ollama.model.{model}.requests")
+    if failed:
+        metrics.increment(f"ollama.model.{model}.failures")
+    elif seconds is not None:
+        metrics.observe(f"ollama.model.{model}.latency", seconds)
+
+
+def record_empty_output(model: str) -> None:
+    """Counts a reply of `model` that contained no usable flashcards."""
+    metrics.increment(f"ollama.model.{model}.empty_output")
+
+
+def model_stats() -> Dict[str, Dict[str, Optional[float]]]:
+    """Requests, failures and latency percentiles per model."""
+    return {
+        model: {
+            "requests": metrics.counter(f"ollama.model.{model}.requests"),
+            "failures": metrics.counter(f"ollama.model.{model}.failures"),
+            "empty_output": metrics.counter(f"ollama.model.{model}.empty_output"),
+            "p50_latency": metrics.percentile(f"ollama.model.{model}.latency", 50),
+            "p95_latency": metrics.percentile(f"ollama.model.{model}.latency", 95),
+        }
+        for model in models()
+    }
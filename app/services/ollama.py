@@ -5,15 +5,389 @@ to generate flashcards from text.
 It handles API requests, response parsing, and error handling specific to the Ollama API.
 """
 
+import asyncio
+import codecs
+import contextlib
 import httpx
 import json
-from typing import List
+import math
+import re
+import time
+from typing import AsyncIterator, List, Optional, Set, Tuple, Union
 from fastapi import HTTPException, status
-from app.schemas.schemas import FlashcardCreate
+from pydantic import TypeAdapter, ValidationError
+from app.schemas.schemas import AIGenerationResponse, FlashcardCreate
+from app.services.flashcard_parser import IncrementalFlashcardParser, parse_flashcards
+from app.services.metrics import metrics
+from app.services.generation_cache import generation_cache, cache_key
+from app.services.generation_context import generation_contexts
+from app.services.text_chunking import split_text, distribute_count, merge_flashcards, question_fingerprint
+from app.services.ollama_backends import backend_pool, is_backend_failure
+from app.services.circuit_breaker import ollama_breaker
+from app.services.single_flight import SingleFlight
+from app.services import model_router
+from app.config import (
+    OLLAMA_MODEL_NAME,
+    OLLAMA_HEALTH_CHECK_INTERVAL,
+    OLLAMA_POOL_MAX_CONNECTIONS,
+    OLLAMA_POOL_MAX_KEEPALIVE,
+    OLLAMA_POOL_KEEPALIVE_EXPIRY,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_CHUNK_MAX_CHARS,
+    OLLAMA_CHUNK_CONCURRENCY,
+    OLLAMA_TOP_UP_ATTEMPTS,
+    OLLAMA_STRUCTURED_OUTPUT,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_TIMEOUT_PERCENTILE,
+    OLLAMA_TIMEOUT_MULTIPLIER,
+    OLLAMA_TIMEOUT_MIN,
+    OLLAMA_TIMEOUT_MAX,
+)
 import os
 
-OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
-OLLAMA_MODEL_NAME = os.getenv("OLLAMA_MODEL_NAME", "mistral")
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_health_check_task: Optional[asyncio.Task] = None
+# Identyczne generacje uruchomione w tym samym czasie dzielą jedno zapytanie do Ollama
+_in_flight = SingleFlight("generation.single_flight")
+
+# Schemat odpowiedzi przekazywany jako "format" - Ollama ogranicza dekodowanie do poprawnego JSON-a
+RESPONSE_SCHEMA = AIGenerationResponse.model_json_schema()
+_response_adapter = TypeAdapter(AIGenerationResponse)
+# Pary (adres backendu, model), dla których serwer Ollama odrzucił schemat w polu "format" (wersje < 0.5)
+_structured_output_unsupported: Set[Tuple[str, str]] = set()
+
+
+# Czas trwania w formacie Go (np. "30m", "1h30m", "500ms"), który Ollama przyjmuje jako keep_alive
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(h|ms|m|s|us|µs|ns)")
+_DURATION = re.compile(rf"-?(?:{_DURATION_PART.pattern})+")
+_UNIT_SECONDS = {"h": 3600, "m": 60, "s": 1, "ms": 1e-3, "us": 1e-6, "µs": 1e-6, "ns": 1e-9}
+
+# Czas ładowania modelu powyżej tego progu (w sekundach) liczony jest jako zimny start
+COLD_START_THRESHOLD = 1.0
+
+
+# Jednostka pracy dla adaptacyjnego limitu czasu: tyle znaków promptu "kosztuje" tyle co jedna fiszka
+PROMPT_CHARS_PER_UNIT = 1000
+# Minimalna liczba próbek, od której limit czasu jest liczony z obserwacji
+TIMEOUT_MIN_SAMPLES = 10
+
+
+class _StructuredOutputUnsupported(Exception):
+    def __init__(self, backend_url: str, model: str, detail: str):
+        super().__init__(detail)
+        self.backend_url = backend_url
+        self.model = model
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=OLLAMA_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=OLLAMA_POOL_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the app-lifetime HTTP client for Ollama, bound to the running event loop.
+
+    The client is normally opened in the FastAPI lifespan; outside of it (e.g. in tests)
+    it is created lazily. A client created in another event loop is replaced, because
+    pooled connections cannot be shared between loops.
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client_loop is not loop:
+        _http_client = _create_http_client()
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Closes the shared Ollama HTTP client and its pooled connections."""
+    global _http_client, _http_client_loop
+    if _http_client is None:
+        return
+    client, _http_client, _http_client_loop = _http_client, None, None
+    await client.aclose()
+
+
+async def _health_check_loop() -> None:
+    while True:
+        await backend_pool.check(get_http_client())
+        await asyncio.sleep(OLLAMA_HEALTH_CHECK_INTERVAL)
+
+
+def start_health_checks() -> None:
+    """Starts periodic health checks of the Ollama backends (only when more than one is configured)."""
+    global _health_check_task
+    loop = asyncio.get_running_loop()
+    if len(backend_pool.backends) < 2 or (_health_check_task is not None and _health_check_task.get_loop() is loop):
+        return
+    _health_check_task = loop.create_task(_health_check_loop())
+
+
+async def stop_health_checks() -> None:
+    global _health_check_task
+    # Zadanie z innej pętli zdarzeń (inna instancja aplikacji, np. w testach) zostawiamy w spokoju
+    if _health_check_task is None or _health_check_task.get_loop() is not asyncio.get_running_loop():
+        return
+    task, _health_check_task = _health_check_task, None
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def _mock_enabled() -> bool:
+    return os.getenv("OLLAMA_MOCK") == "true"
+
+
+def _mock_flashcards(text: str, count: int) -> List[FlashcardCreate]:
+    return [
+        FlashcardCreate(
+            question=f"Mock question {i + 1} for text: '{text[:20]}...'",
+            answer=f"Mock answer {i + 1}"
+        )
+        for i in range(count)
+    ]
+
+
+def build_prompt(text: str, count: int, exclude: Optional[List[str]] = None) -> str:
+    avoid = ""
+    if exclude:
+        # Dogenerowanie brakujących fiszek - model nie powinien powtarzać już zadanych pytań
+        avoid = "Do not repeat any of these questions:\n" + "".join(f"    - {question}\n" for question in exclude)
+    return f"""
+    Generate {count} flashcards (question and answer) from the following text. You must generate exactly {count} flashcards, no less, no more.
+    Provide the output as a JSON array of objects, where each object has 'question' and 'answer' keys.
+    Example:
+    [
+      {{"question": "What is the capital of France?", "answer": "Paris"}},
+      {{"question": "What is the highest mountain in the world?", "answer": "Mount Everest"}}
+    ]
+    {avoid}
+    Text:
+    {text}
+    """
+
+
+def parse_keep_alive(value: str) -> Tuple[Union[int, str], Optional[float]]:
+    """Parses a `keep_alive` setting.
+
+    :param value: A number of seconds (fractions are sent as milliseconds, e.g. "1.5" -> "1500ms")
+                  or a Go-style duration with a unit such as "30m" or "1h30m".
+    :type value: str
+    :raises ValueError: If the value is neither a finite number nor a duration with a unit.
+    :returns: The value to send to Ollama, and the duration in seconds - `None` if the model
+              is kept loaded forever (negative value) or unloaded immediately (zero).
+    :rtype: Tuple[Union[int, str], Optional[float]]
+    """
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        if not _DURATION.fullmatch(value):
+            raise ValueError(
+                f"Invalid OLLAMA_KEEP_ALIVE {value!r}: use a number of seconds or a duration with a unit, e.g. '30m'."
+            )
+        seconds = sum(float(number) * _UNIT_SECONDS[unit] for number, unit in _DURATION_PART.findall(value))
+        if value.startswith("-"):
+            seconds = -seconds
+        sent: Union[int, str] = value
+    else:
+        if not math.isfinite(seconds):
+            raise ValueError(f"Invalid OLLAMA_KEEP_ALIVE {value!r}: the number of seconds must be finite.")
+        sent = int(seconds) if seconds.is_integer() else f"{round(seconds * 1000)}ms"
+    return sent, (seconds if seconds > 0 else None)
+
+
+def keep_alive_value(value: str = OLLAMA_KEEP_ALIVE) -> Union[int, str]:
+    """Returns `keep_alive` in the form Ollama expects (see `parse_keep_alive`)."""
+    return parse_keep_alive(value)[0]
+
+
+# Sprawdzane przy imporcie modułu, więc błędne OLLAMA_KEEP_ALIVE zatrzymuje start aplikacji
+KEEP_ALIVE, KEEP_ALIVE_SECONDS = parse_keep_alive(OLLAMA_KEEP_ALIVE)
+
+
+def record_load_duration(response_data: dict) -> None:
+    """Records how long Ollama spent loading the model for a request (reported in nanoseconds)."""
+    load_duration = response_data.get("load_duration")
+    if not load_duration:
+        return
+    seconds = load_duration / 1e9
+    metrics.observe("ollama.load_duration", seconds)
+    if seconds >= COLD_START_THRESHOLD:
+        metrics.increment("ollama.cold_starts")
+        metrics.observe("ollama.cold_start_delay", seconds)
+
+
+def _work_units(prompt: str, count: int) -> float:
+    return 1 + len(prompt) / PROMPT_CHARS_PER_UNIT + count
+
+
+def adaptive_timeout(prompt: str, count: int) -> httpx.Timeout:
+    """Computes the read timeout for a generation from recently observed latencies.
+
+    Latencies are recorded per work unit (prompt size plus number of flashcards), so the
+    timeout scales with the request. Until enough samples exist, `OLLAMA_READ_TIMEOUT` is used.
+    """
+    read = OLLAMA_READ_TIMEOUT
+    if metrics.sample_count("ollama.latency_per_unit") >= TIMEOUT_MIN_SAMPLES:
+        per_unit = metrics.percentile("ollama.latency_per_unit", OLLAMA_TIMEOUT_PERCENTILE)
+        read = min(OLLAMA_TIMEOUT_MAX, max(OLLAMA_TIMEOUT_MIN, per_unit * _work_units(prompt, count) * OLLAMA_TIMEOUT_MULTIPLIER))
+    metrics.observe("ollama.timeout", read)
+    return httpx.Timeout(read, connect=OLLAMA_CONNECT_TIMEOUT)
+
+
+def _record_timeout(exc: httpx.RequestError, timeout: httpx.Timeout, prompt: str, count: int) -> None:
+    """Counts a generation that hit its read timeout as a latency sample at the timeout value.
+
+    Without it only successful calls are sampled, so a server that became slow keeps
+    being given the old, too short timeout.
+    """
+    if isinstance(exc, httpx.ReadTimeout):
+        metrics.observe("ollama.latency_per_unit", timeout.read / _work_units(prompt, count))
+
+
+@contextlib.asynccontextmanager
+async def _ollama_call(model: Optional[str] = None) -> AsyncIterator:
+    """Admits a call through the circuit breaker, picks a backend and reports the outcome to both.
+
+    The call is also counted for `model` (see `model_router.record_call`).
+    """
+    model = model or OLLAMA_MODEL_NAME
+    ollama_breaker.before_call()
+    started = time.perf_counter()
+    try:
+        async with backend_pool.acquire() as backend:
+            yield backend
+    except BaseException as e:
+        if is_backend_failure(e):
+            ollama_breaker.record_failure()
+        else:
+            ollama_breaker.release()
+        if isinstance(e, Exception):
+            model_router.record_call(model, failed=True)
+        raise
+    else:
+        ollama_breaker.record_success()
+        model_router.record_call(model, time.perf_counter() - started)
+
+
+def _generate_payload(prompt: str, stream: bool, model: Optional[str] = None) -> dict:
+    payload = {
+        "model": model or OLLAMA_MODEL_NAME,
+        "prompt": prompt,
+        "stream": stream,
+        "keep_alive": KEEP_ALIVE
+    }
+    return payload
+
+
+def _with_structured_output(payload: dict, backend_url: str) -> dict:
+    """Adds the response schema as `format` unless this backend rejected it for the payload's model."""
+    if OLLAMA_STRUCTURED_OUTPUT and (backend_url, payload["model"]) not in _structured_output_unsupported:
+        payload["format"] = RESPONSE_SCHEMA
+    else:
+        payload.pop("format", None)
+    return payload
+
+
+def _raise_for_status(response: httpx.Response, payload: dict, backend_url: str) -> None:
+    # Tylko błąd dotyczący pola "format" oznacza brak obsługi schematu - inne błędy 400 zgłaszamy dalej
+    if response.status_code == 400 and "format" in payload and "format" in response.text:
+        raise _StructuredOutputUnsupported(backend_url, payload["model"], response.text)
+    response.raise_for_status()
+
+
+def _disable_structured_output(error: _StructuredOutputUnsupported) -> None:
+    _structured_output_unsupported.add((error.backend_url, error.model))
+    metrics.increment("generation.structured.unsupported")
+
+
+def _parse_structured(content: str) -> Optional[List[FlashcardCreate]]:
+    """Validates schema-constrained output in one pass; returns `None` if it does not match the schema."""
+    try:
+        response = _response_adapter.validate_json(content)
+    except ValidationError:
+        metrics.increment("generation.structured.fallback")
+        return None
+    return [fc for fc in response.flashcards if fc.question.strip() and fc.answer.strip()]
+
+
+def build_more_prompt(count: int, exclude: List[str]) -> str:
+    """Builds the follow-up prompt sent together with the Ollama `context` of a previous generation."""
+    previous = "".join(f"    - {question}\n" for question in exclude)
+    return f"""
+    Generate {count} more flashcards (question and answer) from the same text. They must be different from all previous flashcards.
+    Provide the output as a JSON array of objects, where each object has 'question' and 'answer' keys.
+    Previous questions:
+{previous}    """
+
+
+def context_key(text: str, model: Optional[str] = None) -> str:
+    """Identifies the source text and model whose Ollama context can be reused."""
+    return cache_key(text, 0, model or OLLAMA_MODEL_NAME)
+
+
+def claim_generation_context(session_id: str, text: str) -> bool:
+    """Ties the context of the latest generation of `text` to a user session (see `generate_more_flashcards`)."""
+    # Kontekst pochodzi od modelu, który wygenerował fiszki (np. po przełączeniu z modelu pomocniczego)
+    claimed = [generation_contexts.claim(session_id, context_key(text, model)) for model in model_router.models()]
+    return any(claimed)
+
+
+async def generate_more_flashcards(text: str, count: int, exclude: List[str], session_id: str) -> List[FlashcardCreate]:
+    """Generates additional flashcards for a text that has already been generated from.
+
+    If the session still holds the Ollama `context` of its previous generation for this text,
+    only a short follow-up prompt is sent with it, so Ollama does not evaluate the source
+    text again. Otherwise the full prompt is sent once and its context is kept for the next
+    follow-up.
+
+    :param text: The source text.
+    :type text: str
+    :param count: The number of new flashcards to generate.
+    :type count: int
+    :param exclude: Questions the user already has; they are not returned again.
+    :type exclude: List[str]
+    :param session_id: Identifies the session that owns the stored context.
+    :type session_id: str
+    :raises HTTPException: If the request to Ollama fails or returns no valid flashcards.
+    :returns: Up to `count` new flashcards.
+    :rtype: List[FlashcardCreate]
+    """
+    if _mock_enabled():
+        return [
+            FlashcardCreate(question=f"Mock question {len(exclude) + i + 1} for text: '{text[:20]}...'", answer=f"Mock answer {len(exclude) + i + 1}")
+            for i in range(count)
+        ]
+
+    # Kontekst da się kontynuować tylko tym modelem, który go wytworzył
+    routed = model_router.select_model(text, count)
+    model, context = routed, None
+    for candidate in [routed] + [m for m in model_router.models() if m != routed]:
+        context = generation_contexts.get(session_id, context_key(text, candidate))
+        if context is not None:
+            model = candidate
+            break
+    if context is not None:
+        metrics.increment("generation.context.reused")
+        prompt = build_more_prompt(count, exclude)
+    else:
+        metrics.increment("generation.context.missing")
+        prompt = build_prompt(text, count, exclude)
+
+    flashcards, new_context = await _generate_batch(prompt, count, context, model=model)
+    if new_context:
+        generation_contexts.put(session_id, context_key(text, model), new_context)
+
+    seen = {question_fingerprint(question) for question in exclude}
+    return merge_flashcards([[fc for fc in flashcards if question_fingerprint(fc.question) not in seen]], count)
 
 
 async def generate_flashcards_from_text(text: str, count: int) -> List[FlashcardCreate]:
@@ -33,95 +407,167 @@ async def generate_flashcards_from_text(text: str, count: int) -> List[Flashcard
     :returns: A list of `FlashcardCreate` objects, each containing a question and an answer.
     :rtype: List[FlashcardCreate]
     :dependencies:
-        - `httpx`: For making asynchronous HTTP requests to the Ollama API.
+        - `httpx`: For making asynchronous HTTP requests to the Ollama API through the shared client (`get_http_client`).
         - `json`: For parsing the JSON response from Ollama.
         - `app.schemas.schemas.FlashcardCreate`: For the return type.
-        - `os`: For reading environment variables (`OLLAMA_API_URL`, `OLLAMA_MODEL_NAME`, `OLLAMA_MOCK`).
+        - `os`: For reading the `OLLAMA_MOCK` environment variable.
+        - `app.services.ollama_backends.backend_pool`: For choosing the Ollama server of each request.
     :notes:
         - If the `OLLAMA_MOCK` environment variable is set to "true", the function will return
           mock flashcards instead of calling the actual Ollama service.
+        - Results are cached in `generation_cache` by normalized text, model and count;
+          a cache hit returns without calling Ollama.
+        - With `OLLAMA_STRUCTURED_OUTPUT` enabled, the `AIGenerationResponse` JSON schema is sent
+          as Ollama's `format` and the reply is validated in one `TypeAdapter` pass; replies that
+          do not match fall back to the tolerant parser. A server that rejects the schema (a 400
+          naming `format`) stops receiving it for that model only.
+        - Concurrent calls with the same cache key share one in-flight generation; it is
+          cancelled only when every caller waiting for it has been cancelled.
+        - With several servers in `OLLAMA_API_URLS`, each request goes to the healthy server
+          with the fewest outstanding requests.
+        - Texts longer than `OLLAMA_CHUNK_MAX_CHARS` are split into chunks that are generated
+          in parallel (at most `OLLAMA_CHUNK_CONCURRENCY` at a time) and merged without duplicates.
+        - The model is chosen by `model_router.select_model`: small requests go to the draft model
+          (if configured) and are retried with the full model if the draft model fails.
         - The function expects the Ollama model to return a JSON array of objects with 'question' and 'answer' keys.
     """
-    if os.getenv("OLLAMA_MOCK") == "true":
+    if _mock_enabled():
         # For testing purposes, return a list of mock flashcards
         # This avoids calling the actual Ollama service when OLLAMA_MOCK is set
-        return [
-            FlashcardCreate(
-                question=f"Mock question {i + 1} for text: '{text[:20]}...'",
-                answer=f"Mock answer {i + 1}"
-            )
-            for i in range(count)
-        ]
-    prompt = f"""
-    Generate {count} flashcards (question and answer) from the following text. You must generate exactly {count} flashcards, no less, no more.
-    Provide the output as a JSON array of objects, where each object has 'question' and 'answer' keys.
-    Example:
-    [
-      {{"question": "What is the capital of France?", "answer": "Paris"}},
-      {{"question": "What is the highest mountain in the world?", "answer": "Mount Everest"}}
-    ]
+        return _mock_flashcards(text, count)
 
-    Text:
-    {text}
+    model = model_router.select_model(text, count)
+    key = cache_key(text, count, model)
+    cached = await generation_cache.aget(key)
+    if cached is not None:
+        return cached
+
+    return list(await _in_flight.do(key, lambda: _generate_uncached(key, text, count, model)))
+
+
+async def _generate_uncached(key: str, text: str, count: int, model: str) -> List[FlashcardCreate]:
+    chunks = split_text(text, OLLAMA_CHUNK_MAX_CHARS)
+    try:
+        if len(chunks) > 1:
+            flashcards = await _generate_chunked(chunks, count, model)
+        else:
+            flashcards = await _request_flashcards(text, count, model)
+    except HTTPException as e:
+        fallback = model_router.fallback_model(model)
+        # Niedostępność Ollama (503) dotyczy każdego modelu - ponawiamy tylko błędy samego modelu
+        if fallback is None or e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            raise
+        metrics.increment("generation.routed.fallback")
+        flashcards = await _generate_uncached(cache_key(text, count, fallback), text, count, fallback)
+
+    if len(flashcards) >= count:
+        await generation_cache.aset(key, flashcards)
+    return flashcards
+
+
+async def _generate_chunked(chunks: List[str], count: int, model: Optional[str] = None) -> List[FlashcardCreate]:
+    """Generates flashcards for each chunk with bounded concurrency and merges the results.
+
+    Chunks that fail are skipped as long as at least one chunk succeeds.
     """
+    semaphore = asyncio.Semaphore(OLLAMA_CHUNK_CONCURRENCY)
+
+    async def generate_chunk(chunk: str, chunk_count: int) -> List[FlashcardCreate]:
+        async with semaphore:
+            return await _request_flashcards(chunk, chunk_count, model)
+
+    results = await asyncio.gather(
+        *(generate_chunk(chunk, chunk_count) for chunk, chunk_count in zip(chunks, distribute_count(count, chunks)) if chunk_count > 0),
+        return_exceptions=True
+    )
+    batches = [result for result in results if not isinstance(result, BaseException)]
+    if not batches:
+        raise results[0]
+    return merge_flashcards(batches, count)
+
+
+async def _request_flashcards(text: str, count: int, model: Optional[str] = None) -> List[FlashcardCreate]:
+    """Generates flashcards for one prompt, requesting only the missing ones if the model returns too few."""
+    flashcards = await _request_batch(text, count, model=model)
+    attempts = 0
+    while len(flashcards) < count and attempts < OLLAMA_TOP_UP_ATTEMPTS:
+        attempts += 1
+        metrics.increment("generation.top_up")
+        try:
+            extra = await _request_batch(text, count - len(flashcards), exclude=[fc.question for fc in flashcards], model=model)
+        except HTTPException:
+            break
+        flashcards = merge_flashcards([flashcards, extra], count)
+    return flashcards
 
-    payload = {
-        "model": OLLAMA_MODEL_NAME,
-        "prompt": prompt,
-        "stream": False
-        #"format": "json"
-    }
 
+async def _request_batch(
+    text: str, count: int, exclude: Optional[List[str]] = None, model: Optional[str] = None
+) -> List[FlashcardCreate]:
+    """Sends a single generation request for `text` and keeps the returned Ollama context for "generate more"."""
+    flashcards, context = await _generate_batch(build_prompt(text, count, exclude), count, model=model)
+    if context:
+        generation_contexts.remember(context_key(text, model), context)
+    return flashcards
+
+
+async def _generate_batch(
+    prompt: str, count: int, context: Optional[List[int]] = None, model: Optional[str] = None
+) -> Tuple[List[FlashcardCreate], Optional[List[int]]]:
+    """Sends a single generation request to Ollama and salvages every valid flashcard from the reply.
+
+    Returns the flashcards together with the Ollama `context` of the exchange.
+    """
+    payload = _generate_payload(prompt, stream=False, model=model)
+    if context:
+        payload["context"] = context
+
+    timeout = adaptive_timeout(prompt, count)
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{OLLAMA_API_URL}/api/generate", json=payload, timeout=60.0)
-            response.raise_for_status() # Raise an exception for 4xx or 5xx responses
-
-            response_data = response.json()
-            # Ollama's /api/generate returns a JSON object with a 'response' field
-            # which contains the actual JSON string generated by the model.
-            generated_content = response_data.get("response")
-
-            if not generated_content:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Ollama did not return any generated content."
-                )
-            
-            # The model might return extra text around the JSON, so we need to extract it.
-            try:
-                # Find the start of the JSON array and the end of it.
-                start_index = generated_content.find('[')
-                end_index = generated_content.rfind(']')
-                if start_index == -1 or end_index == -1:
-                    # Raise JSONDecodeError to be caught by the outer exception handler
-                    raise json.JSONDecodeError("No JSON array found in response.", generated_content, 0)
-                
-                json_str = generated_content[start_index:end_index+1]
-                flashcards_data = json.loads(json_str)
-            except json.JSONDecodeError:
-                # Re-raise to be caught by the outer exception handler
-                raise
+        client = get_http_client()
+        started = time.perf_counter()
+        async with _ollama_call(payload["model"]) as backend:
+            response = await client.post(
+                f"{backend.url}/api/generate",
+                json=_with_structured_output(payload, backend.url),
+                timeout=timeout
+            )
+            _raise_for_status(response, payload, backend.url) # Raise an exception for 4xx or 5xx responses
+        metrics.observe("ollama.latency_per_unit", (time.perf_counter() - started) / _work_units(prompt, count))
 
-            # Validate the structure of the parsed data
-            if not isinstance(flashcards_data, list):
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Ollama returned an invalid flashcard format (not a list)."
-                )
-            
-            flashcards = []
-            for item in flashcards_data:
-                if not isinstance(item, dict) or "question" not in item or "answer" not in item:
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail="Ollama returned an invalid flashcard format (missing question/answer)."
-                    )
-                flashcards.append(FlashcardCreate(question=item["question"], answer=item["answer"]))
-            
-            return flashcards
+        response_data = response.json()
+        record_load_duration(response_data)
+        # Ollama's /api/generate returns a JSON object with a 'response' field
+        # which contains the actual JSON string generated by the model.
+        generated_content = response_data.get("response")
+
+        if not generated_content:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Ollama did not return any generated content."
+            )
+
+        # With structured output the reply should match the schema exactly. Otherwise (or if it
+        # does not) the model might return extra text around the JSON or malformed items;
+        # every readable flashcard is kept and the rest is skipped.
+        flashcards = _parse_structured(generated_content) if "format" in payload else None
+        if not flashcards:
+            flashcards = parse_flashcards(generated_content)
+        if not flashcards:
+            model_router.record_empty_output(payload["model"])
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Ollama returned no valid flashcards."
+            )
+        return flashcards, response_data.get("context")
 
+    except _StructuredOutputUnsupported as e:
+        _disable_structured_output(e)
+        return await _generate_batch(prompt, count, context, model)
+    except HTTPException:
+        raise
     except httpx.RequestError as exc:
+        _record_timeout(exc, timeout, prompt, count)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Could not connect to Ollama service: {exc}"
@@ -141,3 +587,221 @@ async def generate_flashcards_from_text(text: str, count: int) -> List[Flashcard
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred: {e}"
         )
+
+
+async def stream_flashcards_from_text(text: str, count: int) -> AsyncIterator[FlashcardCreate]:
+    """Streams flashcards from Ollama, yielding each one as soon as it has been generated.
+
+    The request is sent with `"stream": true`; the token stream is fed into an
+    `IncrementalFlashcardParser`, so the first flashcard is available after a few seconds
+    instead of after the whole batch. Once `count` flashcards have been yielded (or the
+    consumer stops iterating), the upstream response is closed, which makes Ollama stop
+    generating. Long texts are split into chunks like in `generate_flashcards_from_text`;
+    flashcards of each chunk are yielded as soon as that chunk is done.
+
+    :param text: The input text from which flashcards are to be generated.
+    :type text: str
+    :param count: The number of flashcards to generate.
+    :type count: int
+    :raises HTTPException: If Ollama cannot be reached, returns an error status or an
+                           unreadable stream, or produces no valid flashcards.
+    :returns: An async iterator of `FlashcardCreate` objects.
+    :rtype: AsyncIterator[FlashcardCreate]
+    """
+    if _mock_enabled():
+        for flashcard in _mock_flashcards(text, count):
+            yield flashcard
+        return
+
+    model = model_router.select_model(text, count)
+    key = cache_key(text, count, model)
+    cached = await generation_cache.aget(key)
+    if cached is not None:
+        for flashcard in cached:
+            yield flashcard
+        return
+
+    chunks = split_text(text, OLLAMA_CHUNK_MAX_CHARS)
+    generated: List[FlashcardCreate] = []
+    while True:
+        source = _stream_chunked(chunks, count, model) if len(chunks) > 1 else _stream_single(text, count, model)
+        try:
+            async with contextlib.aclosing(source) as stream:
+                async for flashcard in stream:
+                    # Źródło samo kończy po `count` fiszkach; nie przerywamy go wcześniej,
+                    # żeby mogło odczytać z Ollama kontekst do "Generuj więcej"
+                    if len(generated) >= count:
+                        continue
+                    generated.append(flashcard)
+                    yield flashcard
+            break
+        except HTTPException as e:
+            fallback = model_router.fallback_model(model)
+            # Przełączamy model tylko, zanim klient dostał pierwszą fiszkę
+            if generated or fallback is None or e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+                raise
+            metrics.increment("generation.routed.fallback")
+            model, key = fallback, cache_key(text, count, fallback)
+
+    if len(generated) >= count:
+        await generation_cache.aset(key, generated)
+
+
+async def _stream_chunked(chunks: List[str], count: int, model: Optional[str] = None) -> AsyncIterator[FlashcardCreate]:
+    """Runs chunk generations concurrently and yields each chunk's new flashcards as it completes."""
+    semaphore = asyncio.Semaphore(OLLAMA_CHUNK_CONCURRENCY)
+
+    async def generate_chunk(chunk: str, chunk_count: int) -> List[FlashcardCreate]:
+        async with semaphore:
+            return await _request_flashcards(chunk, chunk_count, model)
+
+    tasks = [
+        asyncio.ensure_future(generate_chunk(chunk, chunk_count))
+        for chunk, chunk_count in zip(chunks, distribute_count(count, chunks)) if chunk_count > 0
+    ]
+    seen = set()
+    errors = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                batch = await next_done
+            except HTTPException as e:
+                errors.append(e)
+                continue
+            for flashcard in batch:
+                fingerprint = question_fingerprint(flashcard.question)
+                if fingerprint and fingerprint not in seen:
+                    seen.add(fingerprint)
+                    yield flashcard
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not seen and errors:
+        raise errors[0]
+
+
+async def _iter_stream_lines(response: httpx.Response) -> AsyncIterator[str]:
+    """Splits a streamed NDJSON reply into lines.
+
+    Unlike `Response.aiter_lines`, closing this iterator early also closes the underlying
+    byte iterator, so stopping mid-stream leaves no iterator to be finalized later.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    async with contextlib.aclosing(response.aiter_bytes()) as chunks:
+        async for data in chunks:
+            buffer += decoder.decode(data)
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def _stream_single(text: str, count: int, model: Optional[str] = None) -> AsyncIterator[FlashcardCreate]:
+    """Streams a single prompt from Ollama through the incremental parser."""
+    prompt = build_prompt(text, count)
+    payload = _generate_payload(prompt, stream=True, model=model)
+    timeout = adaptive_timeout(prompt, count)
+    parser = IncrementalFlashcardParser()
+    emitted: List[FlashcardCreate] = []
+    context = None
+    overshoot = False
+
+    try:
+        client = get_http_client()
+        async with _ollama_call(payload["model"]) as backend, \
+                client.stream(
+                    "POST", f"{backend.url}/api/generate", json=_with_structured_output(payload, backend.url),
+                    timeout=timeout
+                ) as response, \
+                contextlib.aclosing(_iter_stream_lines(response)) as lines:
+            if response.is_error:
+                await response.aread()
+                _raise_for_status(response, payload, backend.url)
+
+            async for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail="Ollama returned a malformed stream."
+                    )
+                if chunk.get("error"):
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"Error from Ollama service: {chunk['error']}"
+                    )
+                for flashcard in parser.feed(chunk.get("response", "")):
+                    if len(emitted) >= count:
+                        # Model generuje ponad zamówioną liczbę - przerywamy, rezygnując z kontekstu
+                        overshoot = True
+                        break
+                    yield flashcard
+                    emitted.append(flashcard)
+                if overshoot:
+                    break
+                if chunk.get("done"):
+                    # Po ostatniej fiszce czytamy strumień do końca, bo dopiero ostatni obiekt
+                    # niesie `context` potrzebny do "Generuj więcej"
+                    record_load_duration(chunk)
+                    context = chunk.get("context")
+                    break
+        if overshoot:
+            return
+
+        # Ostatni obiekt mógł zostać ucięty (np. limit tokenów) - próbujemy go naprawić
+        for flashcard in parser.finish():
+            if len(emitted) >= count:
+                break
+            yield flashcard
+            emitted.append(flashcard)
+
+    except httpx.RequestError as exc:
+        _record_timeout(exc, timeout, prompt, count)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not connect to Ollama service: {exc}"
+        )
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error from Ollama service: {exc.response.status_code} - {exc.response.text}"
+        )
+    except _StructuredOutputUnsupported as e:
+        _disable_structured_output(e)
+        async with contextlib.aclosing(_stream_single(text, count, model)) as retry:
+            async for flashcard in retry:
+                yield flashcard
+        return
+
+    if not emitted:
+        model_router.record_empty_output(payload["model"])
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ollama did not return any valid flashcards."
+        )
+    if context:
+        generation_contexts.remember(context_key(text, payload["model"]), context)
+
+    attempts = 0
+    while len(emitted) < count and attempts < OLLAMA_TOP_UP_ATTEMPTS:
+        attempts += 1
+        metrics.increment("generation.top_up")
+        try:
+            extra = await _request_batch(text, count - len(emitted), exclude=[fc.question for fc in emitted], model=model)
+        except HTTPException:
+            return
+        seen = {question_fingerprint(fc.question) for fc in emitted}
+        for flashcard in extra:
+            fingerprint = question_fingerprint(flashcard.question)
+            if len(emitted) >= count or not fingerprint or fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            yield flashcard
+            emitted.append(flashcard)
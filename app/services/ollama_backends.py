@@ -0,0 +1,172 @@
+"""
+This module spreads generation requests across several Ollama servers.
+
+Each request goes to the available backend with the fewest outstanding requests
+(ties are broken round-robin). Backends that fail repeatedly, or fail an active
+health check against `/api/tags`, are ejected from rotation for a while and come
+back once they pass a health check or the ejection expires. Per-backend latency
+and failure stats are exposed at `GET /metrics`.
+"""
+
+import asyncio
+import contextlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from app.config import (
+    OLLAMA_API_URL,
+    OLLAMA_API_URLS,
+    OLLAMA_EJECT_AFTER_FAILURES,
+    OLLAMA_EJECT_SECONDS,
+)
+from app.services.metrics import metrics
+
+# Waga najnowszej próbki w średniej kroczącej opóźnienia
+LATENCY_EWMA_ALPHA = 0.2
+
+
+@dataclass
+class OllamaBackend:
+    url: str
+    outstanding: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    latency_ewma: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+def is_backend_failure(exc: BaseException) -> bool:
+    """Tells whether an exception means the backend itself is unhealthy.
+
+    Connection errors, timeouts and 5xx responses count; client errors, parsing
+    problems and cancellations do not.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class BackendPool:
+    """Least-outstanding-requests balancer with passive and active health tracking."""
+
+    def __init__(
+        self,
+        urls: List[str],
+        eject_after: int = OLLAMA_EJECT_AFTER_FAILURES,
+        eject_seconds: float = OLLAMA_EJECT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not urls:
+            raise ValueError("At least one Ollama backend URL is required.")
+        self.backends = [OllamaBackend(url=url.rstrip("/")) for url in urls]
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self._clock = clock
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def pick(self) -> OllamaBackend:
+        """Returns the available backend with the fewest outstanding requests.
+
+        If every backend is ejected, the one whose ejection ends first is returned,
+        so generation degrades to retrying a node instead of failing outright.
+        """
+        now = self._clock()
+        with self._lock:
+            count = len(self.backends)
+            rotation = [self.backends[(self._next + i) % count] for i in range(count)]
+            self._next = (self._next + 1) % count
+            available = [backend for backend in rotation if backend.is_available(now)]
+            if not available:
+                return min(rotation, key=lambda backend: backend.ejected_until)
+            return min(available, key=lambda backend: backend.outstanding)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[OllamaBackend]:
+        """Picks a backend and tracks the request made to it inside the `async with` block."""
+        backend = self.pick()
+        with self._lock:
+            backend.outstanding += 1
+            backend.requests += 1
+        started = time.perf_counter()
+        try:
+            yield backend
+        except BaseException as e:
+            if is_backend_failure(e):
+                self.record_failure(backend, str(e) or type(e).__name__)
+            raise
+        else:
+            self.record_success(backend, time.perf_counter() - started)
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def record_success(self, backend: OllamaBackend, latency: float) -> None:
+        with self._lock:
+            backend.consecutive_failures = 0
+            backend.ejected_until = 0.0
+            if backend.latency_ewma is None:
+                backend.latency_ewma = latency
+            else:
+                backend.latency_ewma += LATENCY_EWMA_ALPHA * (latency - backend.latency_ewma)
+        metrics.observe(f"ollama.backend.{backend.url}.latency", latency)
+
+    def record_failure(self, backend: OllamaBackend, error: str) -> None:
+        with self._lock:
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            backend.last_error = error
+            if backend.consecutive_failures >= self.eject_after:
+                self._eject(backend)
+        metrics.increment(f"ollama.backend.{backend.url}.failures")
+
+    def _eject(self, backend: OllamaBackend) -> None:
+        if backend.is_available(self._clock()):
+            metrics.increment("ollama.backend.ejections")
+        backend.ejected_until = self._clock() + self.eject_seconds
+
+    async def check(self, client: httpx.AsyncClient, timeout: float = 5.0) -> None:
+        """Probes every backend's `/api/tags` once; failing ones are ejected, passing ones re-admitted."""
+
+        async def probe(backend: OllamaBackend) -> None:
+            try:
+                response = await client.get(f"{backend.url}/api/tags", timeout=timeout)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                with self._lock:
+                    backend.last_error = str(e) or type(e).__name__
+                    self._eject(backend)
+                return
+            with self._lock:
+                backend.consecutive_failures = 0
+                backend.ejected_until = 0.0
+
+        await asyncio.gather(*(probe(backend) for backend in self.backends))
+
+    def stats(self) -> List[Dict]:
+        now = self._clock()
+        with self._lock:
+            return [
+                {
+                    "url": backend.url,
+                    "available": backend.is_available(now),
+                    "outstanding": backend.outstanding,
+                    "requests": backend.requests,
+                    "failures": backend.failures,
+                    "latency_ewma": backend.latency_ewma,
+                    "last_error": backend.last_error,
+                }
+                for backend in self.backends
+            ]
+
+
+backend_pool = BackendPool(OLLAMA_API_URLS or [OLLAMA_API_URL])
@@ -0,0 +1,65 @@
+"""
+This module coalesces concurrent identical calls into a single in-flight task.
+
+When several callers ask for the same key at the same time (e.g. a class submitting
+the same assignment text), only the first one starts the work; the others wait for
+its result. Cancellation is reference-counted: a caller that goes away only stops
+waiting, and the shared task is cancelled once the last waiter has gone.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.services.metrics import metrics
+
+
+@dataclass
+class _Call:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Shares one task between concurrent callers using the same key."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs `func` for `key`, or joins the call already running for it.
+
+        :param key: Identifies identical calls.
+        :type key: Hashable
+        :param func: Starts the work; called only when no call for `key` is in flight.
+        :type func: Callable[[], Awaitable[Any]]
+        :returns: The result of the shared call (its exception is raised to every waiter).
+        :rtype: Any
+        """
+        loop = asyncio.get_running_loop()
+        call = self._calls.get(key)
+        if call is None or call.task.done() or call.task.get_loop() is not loop:
+            call = _Call(task=loop.create_task(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            metrics.increment(f"{self.name}.started")
+        else:
+            metrics.increment(f"{self.name}.coalesced")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                self._forget(key, call)
+                metrics.increment(f"{self.name}.cancelled")
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
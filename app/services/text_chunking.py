@@ -0,0 +1,116 @@
+"""
+This module splits long source texts into prompt-sized chunks and merges the
+flashcards generated for each chunk back into a single, deduplicated list.
+"""
+
+import re
+from typing import Iterable, List
+
+from app.schemas.schemas import FlashcardCreate
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def _pack(pieces: Iterable[str], max_chars: int, separator: str) -> List[str]:
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(separator) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_long_paragraph(paragraph: str, max_chars: int) -> List[str]:
+    sentences = []
+    for sentence in _SENTENCE_END.split(paragraph):
+        if len(sentence) <= max_chars:
+            sentences.append(sentence)
+        else:
+            # Zdanie dłuższe niż limit - tniemy po słowach
+            sentences.extend(_pack(sentence.split(), max_chars, " "))
+    return _pack(sentences, max_chars, " ")
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Splits text into chunks of at most `max_chars`, preferring paragraph and sentence boundaries.
+
+    :param text: The source text.
+    :type text: str
+    :param max_chars: The maximum length of a single chunk.
+    :type max_chars: int
+    :returns: The list of chunks (a single element if the text already fits).
+    :rtype: List[str]
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(_split_long_paragraph(paragraph, max_chars))
+    return _pack(pieces, max_chars, "\n\n")
+
+
+def distribute_count(count: int, chunks: List[str]) -> List[int]:
+    """Spreads `count` flashcards across chunks in proportion to their length.
+
+    Uses the largest remainder method, so the result always sums to `count`. When there are
+    more chunks than flashcards, the shortest chunks get 0 and are not sent to the model.
+
+    :param count: The total number of flashcards requested.
+    :type count: int
+    :param chunks: The text chunks.
+    :type chunks: List[str]
+    :returns: The number of flashcards to request for each chunk.
+    :rtype: List[int]
+    """
+    total_length = sum(len(chunk) for chunk in chunks)
+    if not chunks or total_length == 0:
+        return [0] * len(chunks)
+    shares = [count * len(chunk) / total_length for chunk in chunks]
+    allocation = [int(share) for share in shares]
+    by_remainder = sorted(range(len(chunks)), key=lambda i: shares[i] - allocation[i], reverse=True)
+    for i in by_remainder[:count - sum(allocation)]:
+        allocation[i] += 1
+    return allocation
+
+
+def question_fingerprint(question: str) -> str:
+    """Normalizes a question for exact duplicate detection (case, punctuation, whitespace)."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.casefold()).split())
+
+
+def merge_flashcards(batches: Iterable[List[FlashcardCreate]], limit: int) -> List[FlashcardCreate]:
+    """Concatenates flashcard batches, dropping repeated questions, up to `limit` items.
+
+    :param batches: Flashcards generated for each chunk, in chunk order.
+    :type batches: Iterable[List[FlashcardCreate]]
+    :param limit: The maximum number of flashcards to return.
+    :type limit: int
+    :returns: The merged, deduplicated flashcards.
+    :rtype: List[FlashcardCreate]
+    """
+    seen = set()
+    merged = []
+    for batch in batches:
+        for flashcard in batch:
+            fingerprint = question_fingerprint(flashcard.question)
+            if not fingerprint or fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            merged.append(flashcard)
+            if len(merged) >= limit:
+                return merged
+    return merged
@@ -0,0 +1,186 @@
+"""
+This module cleans up pasted source text before it is put into a generation prompt.
+
+Prompt size drives inference time, so the pipeline removes what carries no content:
+redundant whitespace, page headers/footers and other lines repeated throughout the
+text, common web/PDF boilerplate, and exact or near-duplicate paragraphs. Each stage
+is timed, and the result comes with a report of how much was trimmed.
+"""
+
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import PREPROCESS_TEXT
+from app.services.metrics import metrics
+
+# Przybliżona liczba znaków na token (dla tekstu w językach europejskich)
+CHARS_PER_TOKEN = 4
+# Krótka linia powtórzona co najmniej tyle razy to najpewniej nagłówek lub stopka strony
+REPEATED_LINE_MIN_COUNT = 3
+REPEATED_LINE_MAX_CHARS = 80
+# Próg podobieństwa (Jaccard na trójkach słów), od którego akapit uznajemy za duplikat
+NEAR_DUPLICATE_THRESHOLD = 0.85
+
+_INVISIBLE = re.compile(r"[\u200b\u200c\u200d\u2060\ufeff\u00ad]")
+_INLINE_SPACE = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = (".", "!", "?", "…")
+_BOILERPLATE = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"^(page|strona|str\.)\s*\d+(\s*(of|z|/)\s*\d+)?$",
+        r"^[-–—]?\s*\d{1,4}\s*[-–—]?$",
+        r"^(copyright|©|\(c\)).{0,80}$",
+        r"^(all rights reserved|wszelkie prawa zastrzeżone)\.?$",
+        r"^(skip to (main )?content|przejdź do (treści|zawartości)|menu|home|strona główna|back to top|do góry)$",
+        r"^(share|udostępnij|tweet|print|drukuj|(za)?loguj( się)?|log ?in|sign in|sign up|zarejestruj( się)?)$",
+        r"^(this (site|website) uses cookies|ta strona (używa|wykorzystuje) (plików )?cookies).{0,200}$",
+        r"^(accept|akceptuj(ę)?)( all| wszystkie)?( cookies)?$",
+    )
+]
+
+
+@dataclass
+class PreprocessReport:
+    original_chars: int
+    cleaned_chars: int = 0
+    original_tokens: int = 0
+    cleaned_tokens: int = 0
+    removed_lines: int = 0
+    removed_paragraphs: int = 0
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def trimmed_chars(self) -> int:
+        return self.original_chars - self.cleaned_chars
+
+    @property
+    def trimmed_percent(self) -> float:
+        return 100 * self.trimmed_chars / self.original_chars if self.original_chars else 0.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of prompt tokens for `text` (no tokenizer needed)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def normalize_whitespace(text: str) -> str:
+    """Removes invisible characters, collapses spaces within lines and runs of blank lines."""
+    text = _INVISIBLE.sub("", unicodedata.normalize("NFC", text)).replace("\r\n", "\n").replace("\r", "\n")
+    lines = [_INLINE_SPACE.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _is_boilerplate(line: str) -> bool:
+    return any(pattern.match(line) for pattern in _BOILERPLATE)
+
+
+def drop_repeated_lines(text: str) -> Tuple[str, int]:
+    """Drops boilerplate lines and short lines repeated throughout the text (page headers/footers).
+
+    A repeated line that reads as a sentence is content pasted several times, so its first
+    occurrence is kept.
+
+    :returns: The text without those lines and the number of lines removed.
+    :rtype: Tuple[str, int]
+    """
+    lines = text.split("\n")
+    counts = Counter(line.casefold() for line in lines if line and len(line) <= REPEATED_LINE_MAX_CHARS)
+    kept = []
+    kept_sentences = set()
+    removed = 0
+    for line in lines:
+        key = line.casefold()
+        if line and (_is_boilerplate(line) or counts[key] >= REPEATED_LINE_MIN_COUNT):
+            # Powtórzone zdanie to treść (wklejona kilka razy) - zostawiamy jego pierwsze wystąpienie
+            if not _is_boilerplate(line) and line.endswith(_SENTENCE_END) and key not in kept_sentences:
+                kept_sentences.add(key)
+                kept.append(line)
+                continue
+            removed += 1
+            continue
+        kept.append(line)
+    return _BLANK_LINES.sub("\n\n", "\n".join(kept)).strip(), removed
+
+
+def _shingles(paragraph: str) -> Set[Tuple[str, ...]]:
+    words = re.sub(r"[^\w\s]", " ", paragraph.casefold()).split()
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def remove_duplicate_paragraphs(text: str, threshold: float = NEAR_DUPLICATE_THRESHOLD) -> Tuple[str, int]:
+    """Removes paragraphs that repeat an earlier one exactly or almost exactly.
+
+    Near-duplicates are detected with Jaccard similarity of word trigrams, so a paragraph
+    pasted twice with small edits (a changed word, different punctuation) counts as a repeat.
+
+    :returns: The text without repeated paragraphs and the number of paragraphs removed.
+    :rtype: Tuple[str, int]
+    """
+    kept: List[str] = []
+    kept_shingles: List[Set[Tuple[str, ...]]] = []
+    seen_exact = set()
+    removed = 0
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        exact = " ".join(re.sub(r"[^\w\s]", " ", paragraph.casefold()).split())
+        shingles = _shingles(paragraph)
+        duplicate = exact in seen_exact or any(
+            len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles if shingles and other
+        )
+        if duplicate:
+            removed += 1
+            continue
+        seen_exact.add(exact)
+        kept.append(paragraph)
+        kept_shingles.append(shingles)
+    return "\n\n".join(kept), removed
+
+
+def _timed(report: PreprocessReport, stage: str, func: Callable, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    report.stage_timings[stage] = elapsed
+    metrics.observe(f"preprocess.{stage}", elapsed)
+    return result
+
+
+def preprocess_text(text: str) -> Tuple[str, PreprocessReport]:
+    """Runs the whole preprocessing pipeline on a source text.
+
+    :param text: The text pasted by the user.
+    :type text: str
+    :returns: The cleaned text and a report of what was trimmed, with per-stage timings.
+    :rtype: Tuple[str, PreprocessReport]
+    :notes:
+        - If cleaning would remove everything (e.g. the text is a single repeated line),
+          the whitespace-normalized text is returned instead.
+    """
+    report = PreprocessReport(original_chars=len(text), original_tokens=estimate_tokens(text))
+    normalized = _timed(report, "whitespace", normalize_whitespace, text)
+    cleaned, report.removed_lines = _timed(report, "repeated_lines", drop_repeated_lines, normalized)
+    cleaned, report.removed_paragraphs = _timed(report, "duplicate_paragraphs", remove_duplicate_paragraphs, cleaned)
+    if not cleaned:
+        cleaned = normalized
+    report.cleaned_chars = len(cleaned)
+    report.cleaned_tokens = _timed(report, "token_estimate", estimate_tokens, cleaned)
+    metrics.increment("preprocess.trimmed_chars", report.trimmed_chars)
+    return cleaned, report
+
+
+def prepare_source_text(text: str) -> Tuple[str, Optional[PreprocessReport]]:
+    """Preprocesses `text` when `PREPROCESS_TEXT` is enabled; otherwise returns it unchanged without a report."""
+    if not PREPROCESS_TEXT:
+        return text, None
+    return preprocess_text(text)
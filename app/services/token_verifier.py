@@ -0,0 +1,224 @@
+"""
+This module verifies Supabase access tokens locally and keeps a bounded cache
+of verified tokens, so that authenticated requests do not need a remote
+`auth.get_user` round trip each time.
+
+Tokens signed with HS256 are checked with `SUPABASE_JWT_SECRET`; asymmetric
+tokens (RS256/ES256) are checked against the project's JWKS, fetched once and
+cached. Cached tokens are re-checked against Supabase every
+`AUTH_REVOCATION_CHECK_INTERVAL` seconds so that revoked sessions stop working;
+a revoked token stays on a deny list until it expires, so it cannot be verified
+locally and cached again. With `AUTH_TOKEN_CACHE_SIZE=0` nothing is cached and
+every request is checked against Supabase.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import jwt, JWTError
+from supabase import Client
+
+from app.config import (
+    SUPABASE_JWT_SECRET,
+    SUPABASE_JWKS_URL,
+    SUPABASE_JWT_AUDIENCE,
+    SUPABASE_TIMEOUT,
+    JWKS_CACHE_TTL,
+    AUTH_TOKEN_CACHE_SIZE,
+    AUTH_TOKEN_CACHE_TTL,
+    AUTH_REVOCATION_CHECK_INTERVAL,
+)
+from app.schemas.schemas import TokenUser
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+
+class TokenVerificationError(Exception):
+    """Raised when an access token cannot be verified."""
+
+
+@dataclass
+class _CacheEntry:
+    user: Any
+    expires_at: float
+    checked_at: float
+    token_exp: float
+
+
+class TokenCache:
+    """Thread-safe LRU cache of verified tokens with a per-entry expiry time."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # Unieważnione tokeny -> ich exp; nie podlegają wypieraniu LRU, znikają dopiero po wygaśnięciu
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str, now: float) -> Optional[_CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry
+
+    def put(self, token: str, user: Any, token_exp: float, now: float) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[token] = _CacheEntry(
+                user=user,
+                expires_at=min(token_exp, now + self.ttl),
+                checked_at=now,
+                token_exp=token_exp,
+            )
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def revoke(self, token: str, token_exp: float, now: float) -> None:
+        """Drops the token from the cache and rejects it until `token_exp`."""
+        with self._lock:
+            self._entries.pop(token, None)
+            self._revoked = {t: exp for t, exp in self._revoked.items() if exp > now}
+            if token_exp > now:
+                self._revoked[token] = token_exp
+
+    def is_revoked(self, token: str, now: float) -> bool:
+        with self._lock:
+            exp = self._revoked.get(token)
+            if exp is None:
+                return False
+            if exp <= now:
+                del self._revoked[token]
+                return False
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = TokenCache(AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL)
+
+_jwks: Optional[Dict[str, Any]] = None
+_jwks_fetched_at = 0.0
+_jwks_lock = threading.Lock()
+
+
+def _get_jwks(force_refresh: bool = False) -> Dict[str, Any]:
+    global _jwks, _jwks_fetched_at
+    with _jwks_lock:
+        if force_refresh or _jwks is None or time.time() - _jwks_fetched_at > JWKS_CACHE_TTL:
+            response = httpx.get(SUPABASE_JWKS_URL, timeout=SUPABASE_TIMEOUT)
+            response.raise_for_status()
+            _jwks = response.json()
+            _jwks_fetched_at = time.time()
+        return _jwks
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Verifies the signature, expiry and audience of a Supabase access token.
+
+    :param token: The raw JWT access token (without the "Bearer " prefix).
+    :type token: str
+    :raises TokenVerificationError: If the token is malformed, expired, signed with an
+                                    unsupported algorithm or has an invalid signature.
+    :returns: The verified token claims.
+    :rtype: Dict[str, Any]
+    """
+    try:
+        algorithm = jwt.get_unverified_header(token).get("alg")
+        if algorithm == "HS256":
+            if not SUPABASE_JWT_SECRET:
+                raise TokenVerificationError("SUPABASE_JWT_SECRET is not configured")
+            return jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], audience=SUPABASE_JWT_AUDIENCE)
+        if algorithm in ASYMMETRIC_ALGORITHMS:
+            try:
+                return jwt.decode(token, _get_jwks(), algorithms=[algorithm], audience=SUPABASE_JWT_AUDIENCE)
+            except JWTError:
+                # Klucze mogły zostać zrotowane - pobieramy JWKS ponownie (jeden raz)
+                return jwt.decode(token, _get_jwks(force_refresh=True), algorithms=[algorithm], audience=SUPABASE_JWT_AUDIENCE)
+        raise TokenVerificationError(f"Unsupported token algorithm: {algorithm}")
+    except (JWTError, httpx.HTTPError) as e:
+        raise TokenVerificationError(str(e))
+
+
+def user_from_claims(claims: Dict[str, Any]) -> TokenUser:
+    return TokenUser(
+        id=claims["sub"],
+        email=claims.get("email"),
+        role=claims.get("role"),
+        aud=claims.get("aud"),
+        app_metadata=claims.get("app_metadata") or {},
+        user_metadata=claims.get("user_metadata") or {},
+    )
+
+
+def _check_revocation(token: str, token_exp: float, supabase: Client, now: float) -> None:
+    try:
+        user_response = supabase.auth.get_user(token)
+    except Exception as e:
+        # Błąd połączenia to nie unieważnienie - wpis zostaje, kolejne żądanie sprawdzi token ponownie
+        raise TokenVerificationError(f"Token revocation check failed: {e}")
+    if user_response is None or user_response.user is None:
+        token_cache.revoke(token, token_exp, now)
+        raise TokenVerificationError("Token has been revoked")
+
+
+def get_user(token: str, supabase: Client) -> Any:
+    """Returns the user for a token, verifying it locally and caching the result.
+
+    A token seen for the first time is verified locally without contacting Supabase.
+    A cached token is re-checked with `supabase.auth.get_user` once its last check is
+    older than `AUTH_REVOCATION_CHECK_INTERVAL`, so revoked sessions are rejected.
+    A revoked token is remembered until it expires. With caching disabled
+    (`AUTH_TOKEN_CACHE_SIZE=0`) every request is checked with Supabase.
+
+    :param token: The raw JWT access token.
+    :type token: str
+    :param supabase: The Supabase client used for the periodic revocation check.
+    :type supabase: Client
+    :raises TokenVerificationError: If the token is invalid or has been revoked.
+    :returns: The authenticated user.
+    :rtype: Any
+    """
+    now = time.time()
+    if token_cache.is_revoked(token, now):
+        raise TokenVerificationError("Token has been revoked")
+
+    entry = token_cache.get(token, now)
+    if entry is None:
+        claims = decode_token(token)
+        if "sub" not in claims:
+            raise TokenVerificationError("Token has no subject")
+        user = user_from_claims(claims)
+        token_exp = float(claims.get("exp", now))
+        if token_cache.max_size <= 0:
+            # Bez cache nie byłoby kiedy sprawdzić unieważnienia - sprawdzamy przy każdym żądaniu
+            _check_revocation(token, token_exp, supabase, now)
+            return user
+        token_cache.put(token, user, token_exp, now)
+        return user
+
+    if now - entry.checked_at >= AUTH_REVOCATION_CHECK_INTERVAL:
+        _check_revocation(token, entry.token_exp, supabase, now)
+        entry.checked_at = now
+    return entry.user
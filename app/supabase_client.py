@@ -0,0 +1,234 @@
+"""
+This module manages the process-wide Supabase clients shared by all requests.
+
+The clients are built once (normally in the FastAPI lifespan) and reuse a single
+HTTP connection pool for PostgREST and Auth calls, instead of opening new sessions
+and TLS handshakes on every request. The sync client serves auth checks running in
+the threadpool; the async client serves the data layer (`app.crud.async_crud`)
+so that route handlers do not block the event loop.
+"""
+
+import asyncio
+from typing import Optional, Union
+
+import httpx
+from gotrue import AsyncMemoryStorage
+from gotrue.http_clients import SyncClient as AuthHttpClient
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+from postgrest.utils import AsyncClient as AsyncPostgrestHttpClient
+from postgrest.utils import SyncClient as PostgrestHttpClient
+from supabase import AClient, Client, ClientOptions, SupabaseAuthClient
+
+from app.config import (
+    SUPABASE_URL,
+    SUPABASE_SERVICE_KEY,
+    SUPABASE_POOL_MAX_CONNECTIONS,
+    SUPABASE_POOL_MAX_KEEPALIVE,
+    SUPABASE_POOL_KEEPALIVE_EXPIRY,
+    SUPABASE_TIMEOUT,
+)
+
+_client: Optional[Client] = None
+_async_client: Optional[AClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=SUPABASE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=SUPABASE_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=SUPABASE_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+class _PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose HTTP session uses the configured pool limits."""
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: dict,
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+    ) -> PostgrestHttpClient:
+        return PostgrestHttpClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            follow_redirects=True,
+            http2=True,
+            limits=_pool_limits(),
+        )
+
+
+class _PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client whose HTTP session uses the configured pool limits."""
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: dict,
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+    ) -> AsyncPostgrestHttpClient:
+        return AsyncPostgrestHttpClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            follow_redirects=True,
+            http2=True,
+            limits=_pool_limits(),
+        )
+
+
+class PooledSupabaseClient(Client):
+    """Supabase client with pooled, keep-alive HTTP sessions for PostgREST and Auth.
+
+    Only stateless calls (table queries, `auth.get_user(jwt)`, `auth.admin.*`) may go
+    through this client. Calls that store a user session on the client
+    (`sign_in_with_password`, `sign_out`) must use a per-request client instead,
+    see `app.dependencies.get_auth_client`.
+    """
+
+    @staticmethod
+    def _init_supabase_auth_client(auth_url: str, client_options: ClientOptions) -> SupabaseAuthClient:
+        return SupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=client_options.auto_refresh_token,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            flow_type=client_options.flow_type,
+            http_client=AuthHttpClient(
+                follow_redirects=True,
+                http2=True,
+                timeout=SUPABASE_TIMEOUT,
+                limits=_pool_limits(),
+            ),
+        )
+
+    @staticmethod
+    def _init_postgrest_client(
+        rest_url: str,
+        headers: dict,
+        schema: str,
+        timeout: Union[int, float, httpx.Timeout] = DEFAULT_POSTGREST_CLIENT_TIMEOUT,
+        verify: bool = True,
+    ) -> SyncPostgrestClient:
+        return _PooledPostgrestClient(
+            rest_url,
+            headers=headers,
+            schema=schema,
+            timeout=timeout,
+            verify=verify,
+        )
+
+
+class PooledAsyncSupabaseClient(AClient):
+    """Async Supabase client with a pooled, keep-alive HTTP session for PostgREST.
+
+    Used only for table queries and RPC calls with the service key.
+    """
+
+    @staticmethod
+    def _init_postgrest_client(
+        rest_url: str,
+        headers: dict,
+        schema: str,
+        timeout: Union[int, float, httpx.Timeout] = DEFAULT_POSTGREST_CLIENT_TIMEOUT,
+        verify: bool = True,
+    ) -> AsyncPostgrestClient:
+        return _PooledAsyncPostgrestClient(
+            rest_url,
+            headers=headers,
+            schema=schema,
+            timeout=timeout,
+            verify=verify,
+        )
+
+
+def create_pooled_client() -> Client:
+    """Builds a new Supabase client backed by a pooled HTTP connection.
+
+    :raises Exception: If the Supabase URL or service key is not configured.
+    :returns: A Supabase client authenticated with the service key.
+    :rtype: Client
+    """
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        raise Exception("Supabase configuration missing")
+    options = ClientOptions(
+        auto_refresh_token=False,
+        persist_session=False,
+        postgrest_client_timeout=SUPABASE_TIMEOUT,
+    )
+    return PooledSupabaseClient(SUPABASE_URL, SUPABASE_SERVICE_KEY, options)
+
+
+def create_pooled_async_client() -> AClient:
+    """Builds a new async Supabase client backed by a pooled HTTP connection.
+
+    :raises Exception: If the Supabase URL or service key is not configured.
+    :returns: An async Supabase client authenticated with the service key.
+    :rtype: AClient
+    """
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        raise Exception("Supabase configuration missing")
+    options = ClientOptions(
+        auto_refresh_token=False,
+        persist_session=False,
+        storage=AsyncMemoryStorage(),
+        postgrest_client_timeout=SUPABASE_TIMEOUT,
+    )
+    return PooledAsyncSupabaseClient(SUPABASE_URL, SUPABASE_SERVICE_KEY, options)
+
+
+def open_pool() -> Client:
+    """Creates the shared client if it does not exist yet and returns it."""
+    global _client
+    if _client is None:
+        _client = create_pooled_client()
+    return _client
+
+
+def get_pooled_client() -> Client:
+    """Returns the shared client, creating it lazily when used outside the app lifespan."""
+    return _client if _client is not None else open_pool()
+
+
+def close_pool() -> None:
+    """Closes the HTTP sessions of the shared client and forgets it."""
+    global _client
+    if _client is None:
+        return
+    client, _client = _client, None
+    if client._postgrest is not None:
+        client._postgrest.session.close()
+    client.auth.close()
+
+
+def get_pooled_async_client() -> AClient:
+    """Returns the shared async client bound to the running event loop.
+
+    Connections of an async pool cannot be reused across event loops, so a client
+    created in another loop (e.g. by a previous test client) is replaced.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = create_pooled_async_client()
+        _async_client_loop = loop
+    return _async_client
+
+
+async def close_async_pool() -> None:
+    """Closes the HTTP sessions of the shared async client and forgets it."""
+    global _async_client, _async_client_loop
+    if _async_client is None:
+        return
+    client, _async_client, _async_client_loop = _async_client, None, None
+    if client._postgrest is not None:
+        await client._postgrest.session.aclose()
+    await client.auth.close()
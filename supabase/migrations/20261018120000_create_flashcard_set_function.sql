@@ -0,0 +1,63 @@
+-- Atomowe tworzenie zestawu fiszek: zestaw i wszystkie fiszki w jednej transakcji, jednym wywołaniem RPC.
+-- Unikalność nazwy zestawu w obrębie użytkownika pilnuje ograniczenie w bazie zamiast osobnego zapytania.
+--
+-- UWAGA - ZMIANA DANYCH: ograniczenie unique (user_id, name) nie da się dodać, dopóki użytkownik ma kilka
+-- zestawów o tej samej nazwie. Migracja ZMIENIA NAZWY takich zestawów: najstarszy zestaw (created_at, id)
+-- zachowuje nazwę, a każdy kolejny dostaje sufiks z początkiem swojego identyfikatora, np.
+-- "Biologia" -> "Biologia (3f2a9c1e)". Fiszki i identyfikatory zestawów się nie zmieniają.
+-- Liczba przemianowanych zestawów jest wypisywana jako NOTICE. Żeby obsłużyć duplikaty ręcznie, przed
+-- migracją wykonaj:
+--   select user_id, name, count(*) from public.flashcard_sets group by user_id, name having count(*) > 1;
+
+do $$
+declare
+    renamed integer;
+begin
+    update public.flashcard_sets s
+    set name = s.name || ' (' || left(s.id::text, 8) || ')'
+    where exists (
+        select 1 from public.flashcard_sets other
+        where other.user_id = s.user_id
+          and other.name = s.name
+          and (other.created_at, other.id::text) < (s.created_at, s.id::text)
+    );
+    get diagnostics renamed = row_count;
+    if renamed > 0 then
+        raise notice 'Renamed % flashcard sets with duplicate names (suffix: first 8 characters of the set id).', renamed;
+    end if;
+end;
+$$;
+
+alter table public.flashcard_sets
+    add constraint flashcard_sets_user_id_name_key unique (user_id, name);
+
+create or replace function public.create_flashcard_set(p_user_id uuid, p_name text, p_flashcards jsonb)
+returns jsonb
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+    new_set public.flashcard_sets;
+    inserted jsonb;
+begin
+    insert into public.flashcard_sets (name, user_id)
+    values (btrim(p_name), p_user_id)
+    returning * into new_set;
+
+    with new_cards as (
+        insert into public.flashcards (set_id, question, answer)
+        select new_set.id, btrim(card ->> 'question'), btrim(card ->> 'answer')
+        from jsonb_array_elements(coalesce(p_flashcards, '[]'::jsonb)) with ordinality as items(card, position)
+        where btrim(coalesce(card ->> 'question', '')) <> ''
+          and btrim(coalesce(card ->> 'answer', '')) <> ''
+        order by position
+        returning *
+    )
+    select coalesce(jsonb_agg(to_jsonb(new_cards)), '[]'::jsonb) into inserted from new_cards;
+
+    return to_jsonb(new_set) || jsonb_build_object('flashcards', inserted);
+end;
+$$;
+
+grant execute on function public.create_flashcard_set(uuid, text, jsonb) to authenticated, service_role;
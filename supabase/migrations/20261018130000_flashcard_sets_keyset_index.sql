@@ -0,0 +1,8 @@
+-- Stronicowanie listy zestawów po kluczu (created_at, id) od najnowszych: każda strona to krótki
+-- odczyt indeksu zamiast sortowania wszystkich zestawów użytkownika.
+create index if not exists flashcard_sets_user_id_created_at_id_idx
+    on public.flashcard_sets (user_id, created_at desc, id desc);
+
+-- Liczba fiszek w zestawie (agregat flashcards(count)) i eksport po (set_id, id) korzystają z indeksu po set_id
+create index if not exists flashcards_set_id_id_idx
+    on public.flashcards (set_id, id);
@@ -0,0 +1,43 @@
+-- Edycja fiszek jednym poleceniem: sprawdzenie właściciela i zmiana treści w jednym UPDATE,
+-- dla jednej fiszki albo wielu fiszek zestawu naraz (jedno wywołanie RPC zamiast odczytu i zapisu na fiszkę).
+-- Zmiana jest atomowa: jeśli któraś fiszka nie istnieje, nie należy do użytkownika lub do wskazanego
+-- zestawu, cała operacja jest wycofywana (błąd P0002). Pominięte pole (question/answer) zostaje bez zmian.
+
+create or replace function public.update_flashcards(p_user_id uuid, p_flashcards jsonb, p_set_id text default null)
+returns jsonb
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+    requested integer;
+    updated jsonb;
+begin
+    select count(distinct card ->> 'id') into requested
+    from jsonb_array_elements(coalesce(p_flashcards, '[]'::jsonb)) as items(card);
+
+    with changes as (
+        select distinct on (id) id, question, answer
+        from jsonb_to_recordset(coalesce(p_flashcards, '[]'::jsonb)) as c(id uuid, question text, answer text)
+    ), updated_cards as (
+        update public.flashcards f
+        set question = coalesce(btrim(changes.question), f.question),
+            answer = coalesce(btrim(changes.answer), f.answer)
+        from changes, public.flashcard_sets s
+        where f.id = changes.id
+          and s.id = f.set_id
+          and s.user_id = p_user_id
+          and (p_set_id is null or f.set_id::text = p_set_id)
+        returning f.*
+    )
+    select coalesce(jsonb_agg(to_jsonb(updated_cards)), '[]'::jsonb) into updated from updated_cards;
+
+    if jsonb_array_length(updated) <> requested then
+        raise exception 'flashcards not found' using errcode = 'P0002';
+    end if;
+
+    return updated;
+end;
+$$;
+
+grant execute on function public.update_flashcards(uuid, jsonb, text) to authenticated, service_role;
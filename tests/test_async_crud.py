@@ -0,0 +1,161 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+from app.crud import async_crud
+from app.dependencies import get_async_supabase_client, get_current_user
+from app.main import app
+from app.schemas.schemas import FlashcardSetCreate, FlashcardCreate
+
+
+def make_query(data):
+    """Buduje mock łańcucha zapytań PostgREST, którego execute() zwraca `data`."""
+    query = MagicMock()
+    for method in ("select", "insert", "update", "delete", "eq", "or_", "order", "limit"):
+        getattr(query, method).return_value = query
+    query.execute = AsyncMock(return_value=MagicMock(data=data))
+    return query
+
+
+@pytest.mark.asyncio
+async def test_get_flashcard_set_returns_first_row():
+    supabase = MagicMock()
+    supabase.table.return_value = make_query([{"id": 1, "name": "Set", "flashcards": []}])
+    result = await async_crud.get_flashcard_set(supabase, 1, "user-1")
+    assert result["name"] == "Set"
+
+
+@pytest.mark.asyncio
+async def test_get_flashcard_set_not_found():
+    supabase = MagicMock()
+    supabase.table.return_value = make_query([])
+    assert await async_crud.get_flashcard_set(supabase, 1, "user-1") is None
+
+
+@pytest.mark.asyncio
+async def test_create_flashcard_set_rejects_duplicate_name():
+    # Duplikat nazwy zgłasza baza (ograniczenie unikalności) w odpowiedzi na wywołanie funkcji RPC
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute = AsyncMock(side_effect=APIError({
+        "code": "23505",
+        "message": 'duplicate key value violates unique constraint "flashcard_sets_user_id_name_key"'
+    }))
+    set_data = FlashcardSetCreate(name="Set", flashcards=[FlashcardCreate(question="Q", answer="A")])
+    with pytest.raises(ValueError):
+        await async_crud.create_flashcard_set(supabase, set_data, "user-1")
+    supabase.table.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_flashcard_set_is_single_rpc_call():
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data={
+        "id": "set-1", "name": "Set", "user_id": "user-1", "created_at": "2024-01-01T00:00:00Z",
+        "flashcards": [{"id": "card-1", "question": "Q", "answer": "A", "set_id": "set-1"}]
+    }))
+    set_data = FlashcardSetCreate(name=" Set ", flashcards=[
+        FlashcardCreate(question=" Q ", answer="A"),
+        FlashcardCreate(question="", answer="pusta fiszka jest pomijana"),
+    ])
+
+    created = await async_crud.create_flashcard_set(supabase, set_data, "user-1")
+
+    supabase.rpc.assert_called_once_with("create_flashcard_set", {
+        "p_user_id": "user-1",
+        "p_name": "Set",
+        "p_flashcards": [{"question": "Q", "answer": "A"}]
+    })
+    supabase.table.assert_not_called()
+    assert created["id"] == "set-1" and created["flashcards"][0]["id"] == "card-1"
+
+
+@pytest.mark.asyncio
+async def test_update_flashcard_not_owned():
+    # Właściciela sprawdza to samo polecenie UPDATE - brak dopasowania zgłasza baza kodem P0002
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute = AsyncMock(side_effect=APIError({"code": "P0002", "message": "flashcards not found"}))
+    with pytest.raises(HTTPException) as exc:
+        await async_crud.update_flashcard(supabase, 1, "user-1", {"question": "Q"})
+    assert exc.value.status_code == 404
+    supabase.table.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_update_flashcards_is_single_rpc_call():
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=[
+        {"id": "card-1", "set_id": "set-1", "question": "Q1", "answer": "A1"},
+        {"id": "card-2", "set_id": "set-1", "question": "Q2", "answer": "A2"},
+    ]))
+    changes = [{"id": "card-1", "question": "Q1", "answer": "A1"}, {"id": "card-2", "question": "Q2", "answer": "A2"}]
+
+    updated = await async_crud.update_flashcards(supabase, "user-1", changes, set_id="set-1")
+
+    assert [card["id"] for card in updated] == ["card-1", "card-2"]
+    supabase.rpc.assert_called_once_with("update_flashcards", {
+        "p_user_id": "user-1", "p_flashcards": changes, "p_set_id": "set-1"
+    })
+    supabase.table.assert_not_called()
+
+
+def test_dashboard_uses_async_crud():
+    user = MagicMock(id="user-1", email="user@example.com")
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    try:
+        with patch("app.main.get_flashcard_sets_page", new_callable=AsyncMock) as mock_get_sets:
+            mock_get_sets.return_value = (
+                [{"id": 1, "name": "Zestaw testowy", "created_at": "2025-01-01", "card_count": 7}], "next-page"
+            )
+            response = TestClient(app).get("/dashboard")
+        assert response.status_code == 200
+        assert "Zestaw testowy" in response.text
+        assert "7 fiszek" in response.text
+        assert 'data-cursor="next-page"' in response.text
+        mock_get_sets.assert_awaited_once()
+    finally:
+        app.dependency_overrides = {}
+
+
+def set_row(set_id, created_at, count):
+    return {"id": set_id, "name": f"Set {set_id}", "created_at": created_at, "flashcards": [{"count": count}]}
+
+
+@pytest.mark.asyncio
+async def test_flashcard_sets_page_is_one_query_with_counts():
+    query = make_query([
+        set_row(3, "2025-01-03T00:00:00+00:00", 5),
+        set_row(2, "2025-01-02T00:00:00+00:00", 0),
+        set_row(1, "2025-01-01T00:00:00+00:00", 2),
+    ])
+    supabase = MagicMock()
+    supabase.table.return_value = query
+
+    sets, cursor = await async_crud.get_flashcard_sets_page(supabase, "user-1", 2)
+
+    assert [(s["id"], s["card_count"]) for s in sets] == [(3, 5), (2, 0)]
+    assert cursor is not None
+    query.select.assert_called_once_with("id, name, created_at, flashcards(count)")
+    query.limit.assert_called_once_with(3)
+    query.or_.assert_not_called()
+
+    query.limit.reset_mock()
+    query.execute = AsyncMock(return_value=MagicMock(data=[set_row(1, "2025-01-01T00:00:00+00:00", 2)]))
+    sets, next_cursor = await async_crud.get_flashcard_sets_page(supabase, "user-1", 2, cursor)
+    assert [s["id"] for s in sets] == [1]
+    assert next_cursor is None
+    query.or_.assert_called_once_with(
+        'created_at.lt."2025-01-02T00:00:00+00:00",and(created_at.eq."2025-01-02T00:00:00+00:00",id.lt.2)'
+    )
+
+
+def test_dashboard_sets_rejects_malformed_cursor():
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user-1")
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    try:
+        response = TestClient(app).get("/dashboard/sets", params={"cursor": "eyJpZCI6ICIxKSxvcigifQ"})
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 400
@@ -0,0 +1,77 @@
+import pytest
+
+from app.exceptions import OllamaUnavailableError
+from app.services.circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture()
+def breaker(clock):
+    return CircuitBreaker("test.breaker", failure_threshold=3, cooldown=30, clock=clock)
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures_and_fails_fast(breaker):
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+    trip(breaker)
+    assert breaker.state == "open"
+    with pytest.raises(OllamaUnavailableError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "30"
+    with pytest.raises(OllamaUnavailableError):
+        breaker.check()
+
+
+def test_half_open_admits_single_probe_and_closes_on_success(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    assert breaker.state == "half_open"
+
+    breaker.before_call()
+    with pytest.raises(OllamaUnavailableError):
+        breaker.before_call()
+    breaker.check()  # sprawdzenie przed kolejkowaniem nie zajmuje miejsca próby
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_circuit(breaker, clock):
+    trip(breaker)
+    clock.now += 31
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_released_probe_frees_the_slot(breaker, clock):
+    trip(breaker)
+    clock.now += 31
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == "half_open"
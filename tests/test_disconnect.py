@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+
+from app.exceptions import ClientDisconnectedError
+from app.services.disconnect import cancel_on_disconnect
+from app.services.metrics import metrics
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after):
+        self.checks = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks >= self.disconnect_after
+
+
+async def test_result_is_returned_while_client_is_connected():
+    async def work():
+        await asyncio.sleep(0.03)
+        return "cards"
+
+    assert await cancel_on_disconnect(FakeRequest(disconnect_after=100), work(), poll_interval=0.01) == "cards"
+
+
+async def test_work_is_cancelled_when_client_disconnects():
+    cancelled = asyncio.Event()
+    before = metrics.counter("generation.cancelled.disconnect")
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(ClientDisconnectedError):
+        await cancel_on_disconnect(FakeRequest(disconnect_after=2), work(), poll_interval=0.01)
+
+    assert cancelled.is_set()
+    assert metrics.counter("generation.cancelled.disconnect") == before + 1
@@ -0,0 +1,173 @@
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_async_supabase_client, get_current_user
+from app.main import app
+from app.schemas.schemas import FlashcardCreate
+from app.services import flashcard_service
+from app.crud import async_crud
+from app.services.duplicate_detection import (
+    DuplicateIndex,
+    duplicate_indexes,
+    find_duplicate_pairs,
+    flag_existing_duplicates,
+    merge_duplicates,
+    similarity_matrix,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_duplicate_indexes():
+    duplicate_indexes.clear()
+    yield
+    duplicate_indexes.clear()
+
+
+def test_similarity_matrix_is_cosine_of_ngram_vectors():
+    matrix = similarity_matrix(["Co to jest fotosynteza?", "Co to jest fotosynteza?", "Kiedy była bitwa pod Grunwaldem?"])
+    assert matrix.shape == (3, 3)
+    assert np.allclose(np.diag(matrix), 1.0)
+    assert matrix[0, 1] == pytest.approx(1.0)
+    assert matrix[0, 2] < 0.5
+
+
+def test_find_duplicate_pairs_ignores_case_and_punctuation():
+    pairs = find_duplicate_pairs([
+        "Co to jest fotosynteza?",
+        "Kiedy była bitwa pod Grunwaldem?",
+        "co to jest FOTOSYNTEZA",
+    ])
+    assert [(i, j) for i, j, _ in pairs] == [(0, 2)]
+
+
+def test_merge_duplicates_keeps_first_occurrence():
+    cards = [
+        FlashcardCreate(question="Czym jest mitochondrium?", answer="Centrum energetyczne komórki"),
+        FlashcardCreate(question="Czym jest mitochondrium komórki?", answer="Organellum"),
+        FlashcardCreate(question="Czym jest rybosom?", answer="Miejsce syntezy białek"),
+        FlashcardCreate(question="Czym jest mitochondrium ?", answer="Inna odpowiedź"),
+    ]
+    kept, merged = merge_duplicates(cards)
+    assert merged == 2
+    assert [fc.question for fc in kept] == ["Czym jest mitochondrium?", "Czym jest rybosom?"]
+
+
+def test_lsh_index_finds_near_duplicate_among_stored_cards():
+    stored = [{"id": i, "question": f"Jaka jest stolica państwa numer {i} w Europie?"} for i in range(200)]
+    stored.append({"id": "ph", "question": "Jakie jest pH czystej wody w temperaturze pokojowej?"})
+    index = DuplicateIndex()
+    for card in stored:
+        index.add(card)
+
+    match = index.query("Jakie jest pH czystej wody w temperaturze pokojowej")
+    assert match is not None and match.card["id"] == "ph"
+    # Kandydatami są tylko pytania ze wspólnego kubełka, a nie cały zbiór
+    assert len(index.candidates("Jakie jest pH czystej wody w temperaturze pokojowej")) < len(stored)
+    assert index.query("Kto napisał Pana Tadeusza?") is None
+
+
+def test_flag_existing_duplicates_without_stored_cards():
+    assert flag_existing_duplicates(["Pytanie?", "Inne pytanie?"], []) == [None, None]
+
+
+async def test_find_duplicates_merges_batch_and_flags_stored():
+    cards = [
+        FlashcardCreate(question="Czym jest DNA?", answer="Kwas deoksyrybonukleinowy"),
+        FlashcardCreate(question="Czym jest DNA", answer="Nośnik informacji genetycznej"),
+        FlashcardCreate(question="Ile chromosomów ma człowiek?", answer="46"),
+    ]
+    stored = [{"id": 7, "question": "Ile chromosomów ma człowiek?", "set_id": 3, "flashcard_sets": {"name": "Biologia"}}]
+    with patch("app.crud.async_crud.get_user_flashcards", new=AsyncMock(return_value=stored)):
+        kept, merged, flags = await flashcard_service.find_duplicates(MagicMock(), cards, "user-1")
+
+    assert merged == 1
+    assert [fc.question for fc in kept] == ["Czym jest DNA?", "Ile chromosomów ma człowiek?"]
+    assert flags[0] is None
+    assert flags[1].card["id"] == 7
+
+
+async def test_find_duplicates_reuses_index_and_adds_saved_sets():
+    stored = [{"id": 7, "question": "Ile chromosomów ma człowiek?", "set_id": 3, "flashcard_sets": {"name": "Biologia"}}]
+    cards = [FlashcardCreate(question="Czym jest DNA?", answer="Kwas deoksyrybonukleinowy")]
+    with patch("app.crud.async_crud.get_user_flashcards", new=AsyncMock(return_value=stored)) as mock_fetch:
+        _, _, flags = await flashcard_service.find_duplicates(MagicMock(), cards, "user-1")
+        assert flags == [None]
+        duplicate_indexes.add_set("user-1", {
+            "id": 4, "name": "Genetyka", "flashcards": [{"id": 9, "question": "Czym jest DNA?"}]
+        })
+        _, _, flags = await flashcard_service.find_duplicates(MagicMock(), cards, "user-1")
+
+    # Indeks jest budowany raz, a nowo zapisany zestaw trafia do niego bez ponownego pobierania biblioteki
+    mock_fetch.assert_awaited_once()
+    assert flags[0].card["id"] == 9
+    assert flags[0].card["flashcard_sets"]["name"] == "Genetyka"
+
+
+async def test_get_user_flashcards_reads_every_page():
+    pages = [[{"id": i, "set_id": 1, "question": f"Q{i}"} for i in range(start, start + 2)] for start in (0, 2)] + [[]]
+    query = MagicMock()
+    for method in ("select", "eq", "or_", "order", "limit"):
+        getattr(query, method).return_value = query
+    query.execute = AsyncMock(side_effect=[MagicMock(data=page) for page in pages])
+    supabase = MagicMock()
+    supabase.table.return_value = query
+
+    cards = await async_crud.get_user_flashcards(supabase, "user-1", page_size=2)
+
+    assert [card["id"] for card in cards] == [0, 1, 2, 3]
+    assert query.execute.await_count == 3
+
+
+def test_save_flags_cards_repeating_existing_sets():
+    """Zapis zestawu z fiszką powtarzającą istniejącą najpierw pokazuje ostrzeżenie zamiast zapisywać"""
+    stored = [{"id": 7, "question": "Ile chromosomów ma człowiek?", "set_id": 3, "flashcard_sets": {"name": "Biologia"}}]
+    data = {
+        "action": "save",
+        "name": "Nowy zestaw",
+        "questions": ["Ile chromosomów ma człowiek?", "Czym jest DNA?"],
+        "answers": ["46", "Kwas deoksyrybonukleinowy"],
+    }
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="test-user-id")
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    try:
+        with patch("app.crud.async_crud.get_user_flashcards", new=AsyncMock(return_value=stored)), \
+             patch("app.routers.flashcards.create_flashcard_set", new=AsyncMock(return_value={"id": 1})) as mock_create:
+            client = TestClient(app)
+            response = client.post("/generate", data=data, follow_redirects=False)
+            assert response.status_code == 200
+            assert "Biologia" in response.text and 'name="duplicates_reviewed"' in response.text
+            mock_create.assert_not_called()
+
+            response = client.post(
+                "/generate", data={**data, "duplicates_reviewed": "1", "skip_duplicates": ["0"]}, follow_redirects=False
+            )
+            assert response.status_code == 303
+            saved = mock_create.call_args.kwargs["set_data"].flashcards
+            assert [fc.question for fc in saved] == ["Czym jest DNA?"]
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_skipped_duplicates_refer_to_form_positions_before_blank_cards_are_dropped():
+    """Pusta fiszka przed duplikatem nie przesuwa indeksów zaznaczonych do pominięcia"""
+    data = {
+        "action": "save",
+        "name": "Nowy zestaw",
+        "questions": ["", "Ile chromosomów ma człowiek?", "Czym jest DNA?"],
+        "answers": ["", "46", "Kwas deoksyrybonukleinowy"],
+        "duplicates_reviewed": "1",
+        "skip_duplicates": ["1"],
+    }
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="test-user-id")
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    try:
+        with patch("app.crud.async_crud.get_user_flashcards", new=AsyncMock(return_value=[])), \
+             patch("app.routers.flashcards.create_flashcard_set", new=AsyncMock(return_value={"id": 1})) as mock_create:
+            response = TestClient(app).post("/generate", data=data, follow_redirects=False)
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 303
+    saved = mock_create.call_args.kwargs["set_data"].flashcards
+    assert [fc.question for fc in saved] == ["Czym jest DNA?"]
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import pytest
+
+from app.exceptions import GenerationQueueFullError, GenerationRateLimitedError
+from app.schemas.schemas import FlashcardCreate
+from app.services.fair_scheduler import FairQueue, TokenBucket, parse_weights
+from app.services.generation_jobs import JobManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+async def drain(queue):
+    return [(await queue.get())[1] for _ in range(queue.qsize())]
+
+
+async def test_owners_are_served_in_turn():
+    queue = FairQueue(maxsize=20)
+    for i in range(4):
+        queue.put_nowait(f"heavy-{i}", owner="heavy", cost=10)
+    queue.put_nowait("light-0", owner="light", cost=10)
+    queue.put_nowait("light-1", owner="light", cost=10)
+
+    assert await drain(queue) == ["heavy-0", "light-0", "heavy-1", "light-1", "heavy-2", "heavy-3"]
+
+
+async def test_small_request_overtakes_bulk_backlog():
+    queue = FairQueue(maxsize=20)
+    for i in range(3):
+        queue.put_nowait(f"bulk-{i}", owner="heavy", cost=15)
+    queue.put_nowait("small", owner="light", cost=5)
+
+    assert (await queue.get())[1] == "small"
+
+
+async def test_weights_give_larger_share():
+    queue = FairQueue(maxsize=20, weights={"vip": 2})
+    for i in range(4):
+        queue.put_nowait(f"vip-{i}", owner="vip", cost=10)
+        queue.put_nowait(f"std-{i}", owner="std", cost=10)
+
+    first_six = (await drain(queue))[:6]
+    assert sum(item.startswith("vip") for item in first_six) == 4
+
+
+async def test_owner_share_of_queue_is_capped():
+    queue = FairQueue(maxsize=10, max_per_owner=2)
+    queue.put_nowait("a", owner="heavy", cost=1)
+    queue.put_nowait("b", owner="heavy", cost=1)
+    with pytest.raises(asyncio.QueueFull):
+        queue.put_nowait("c", owner="heavy", cost=1)
+    queue.put_nowait("d", owner="light", cost=1)
+
+
+
+async def test_discarded_item_frees_its_place():
+    queue = FairQueue(maxsize=2, max_per_owner=2)
+    queue.put_nowait("a", owner="heavy", cost=1)
+    queue.put_nowait("b", owner="heavy", cost=1)
+    assert queue.discard("a") and not queue.discard("a")
+
+    assert queue.qsize() == 1 and not queue.full() and not queue.owner_full("heavy")
+    queue.put_nowait("c", owner="light", cost=1)
+    assert sorted(await drain(queue)) == ["b", "c"]
+    assert queue.stats()["queued"] == 0
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_minute=60, burst=2, clock=clock)
+    assert bucket.acquire("user") == 0
+    assert bucket.acquire("user") == 0
+    assert bucket.acquire("user") == pytest.approx(1.0)
+    assert bucket.acquire("other") == 0
+
+    clock.now += 1
+    assert bucket.acquire("user") == 0
+
+
+def test_parse_weights_skips_malformed_entries():
+    assert parse_weights("mcp:127.0.0.1:2, user-1:0.5, broken, zero:0") == {"mcp:127.0.0.1": 2.0, "user-1": 0.5}
+
+
+async def test_light_user_is_not_stuck_behind_heavy_user():
+    manager = JobManager(workers=1, max_queue=20, db_path="")
+    order = []
+    release = asyncio.Event()
+
+    async def generate(text, count):
+        await release.wait()
+        order.append(text)
+        return [FlashcardCreate(question="Q", answer="A")]
+
+    heavy = [manager.submit("heavy", f"heavy-{i}", 15, generate=generate) for i in range(5)]
+    await asyncio.sleep(0.01)
+    light = asyncio.create_task(manager.run("light", "light", 5, generate=generate))
+    await asyncio.sleep(0.01)
+    release.set()
+    await light
+
+    # Pierwsze zadanie ciężkiego użytkownika już trwało; zaraz po nim obsłużono lekkie
+    assert order[:2] == ["heavy-0", "light"]
+    stats = manager.scheduler_stats()
+    assert stats["jobs"] >= 2 and "p95_wait" in stats
+    # /metrics nie ujawnia identyfikatorów użytkowników
+    assert not any(owner in json.dumps(stats) for owner in ("heavy", "light"))
+    await manager.stop()
+
+
+async def test_manager_enforces_rate_limit_and_owner_cap():
+    manager = JobManager(workers=1, max_queue=20, db_path="", max_queue_per_user=2, rate_per_minute=1, rate_burst=3)
+    blocker = asyncio.Event()
+
+    async def generate(text, count):
+        await blocker.wait()
+        return []
+
+    manager.submit("user-1", "running", 1, generate=generate)
+    await asyncio.sleep(0.01)
+    manager.submit("user-1", "queued-1", 1, generate=generate)
+    manager.submit("user-1", "queued-2", 1, generate=generate)
+    with pytest.raises(GenerationQueueFullError):
+        manager.submit("user-1", "over-cap", 1, generate=generate)
+
+    manager.submit("user-2", "a", 1, generate=generate)
+    manager.submit("user-2", "b", 1, generate=generate)
+    blocker.set()
+    await asyncio.sleep(0.01)
+    manager.submit("user-2", "c", 1, generate=generate)
+    with pytest.raises(GenerationRateLimitedError) as error:
+        manager.submit("user-2", "d", 1, generate=generate)
+    assert int(error.value.headers["Retry-After"]) > 0
+    await manager.stop()
+
+
+
+async def test_cancelled_queued_jobs_leave_the_owner_cap():
+    manager = JobManager(workers=1, max_queue=20, db_path="", max_queue_per_user=1)
+    blocker = asyncio.Event()
+
+    async def generate(text, count):
+        await blocker.wait()
+        return [FlashcardCreate(question=text, answer="A")]
+
+    manager.submit("other", "running", 1, generate=generate)
+    await asyncio.sleep(0.01)
+    waiting = asyncio.create_task(manager.run("user-1", "abandoned", 1, generate=generate))
+    await asyncio.sleep(0.01)
+    assert manager.queue_depth() == 1
+    waiting.cancel()
+    await asyncio.sleep(0.01)
+
+    # Anulowane zadanie nie zajmuje już miejsca w kolejce ani w limicie użytkownika
+    assert manager.queue_depth() == 0
+    retried = asyncio.create_task(manager.run("user-1", "retried", 1, generate=generate))
+    blocker.set()
+    assert [card.question for card in await retried] == ["retried"]
+    await manager.stop()
+
+
+async def test_streaming_slot_is_ordered_by_the_fair_queue():
+    manager = JobManager(workers=1, max_queue=20, db_path="")
+    order = []
+    release = asyncio.Event()
+
+    async def generate(text, count):
+        await release.wait()
+        order.append(text)
+        return [FlashcardCreate(question="Q", answer="A")]
+
+    heavy = [manager.submit("heavy", f"heavy-{i}", 15, generate=generate) for i in range(3)]
+    await asyncio.sleep(0.01)
+
+    async def stream():
+        async with manager.slot("light", 5):
+            order.append("stream")
+
+    light = asyncio.create_task(stream())
+    await asyncio.sleep(0.01)
+    release.set()
+    await light
+
+    # Strumień lekkiego użytkownika wyprzedza kolejne zadania ciężkiego, jak zwykłe zadanie
+    assert order[:2] == ["heavy-0", "stream"]
+    await manager.stop()
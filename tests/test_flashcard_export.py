@@ -0,0 +1,124 @@
+import io
+import json
+import zipfile
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+
+from app.crud import async_crud
+from app.dependencies import get_async_supabase_client, get_current_user
+from app.main import app
+from app.services.flashcard_export import encode
+from app.services.flashcard_import import iter_rows
+
+
+def card(card_id, set_id, set_name, question="Q", answer="A"):
+    return {"id": card_id, "set_id": set_id, "question": question, "answer": answer, "flashcard_sets": {"name": set_name}}
+
+
+def segment(set_id, set_name, *cards):
+    return {"id": set_id, "name": set_name}, list(cards)
+
+
+async def as_segments(*segments):
+    for item in segments:
+        yield item
+
+
+async def collect(fmt, *segments):
+    return b"".join([chunk async for chunk in encode(as_segments(*segments), fmt)])
+
+
+def make_paged_client(pages):
+    """Mock klienta, którego kolejne zapytania (o zestawy lub fiszki) zwracają kolejne strony."""
+    query = MagicMock()
+    for method in ("select", "eq", "gt", "in_", "or_", "order", "limit"):
+        getattr(query, method).return_value = query
+    query.execute = AsyncMock(side_effect=[MagicMock(data=page) for page in pages])
+    supabase = MagicMock()
+    supabase.table.return_value = query
+    return supabase, query
+
+
+@pytest.mark.asyncio
+async def test_pages_continue_after_last_row():
+    supabase, query = make_paged_client([[card(1, 10, "A"), card(2, 10, "A")], [card(3, 11, "B")]])
+    pages = [page async for page in async_crud.iter_user_flashcard_pages(supabase, "user-1", 2)]
+    assert [[row["id"] for row in page] for page in pages] == [[1, 2], [3]]
+    # Krótsza strona kończy eksport bez dodatkowego zapytania
+    assert query.execute.await_count == 2
+    query.or_.assert_called_once_with("set_id.gt.10,and(set_id.eq.10,id.gt.2)")
+
+
+@pytest.mark.asyncio
+async def test_set_export_includes_empty_sets_in_order():
+    supabase, query = make_paged_client([
+        [{"id": 10, "name": "Pusty"}, {"id": 11, "name": "B"}, {"id": 12, "name": "Też pusty"}],
+        [card(1, 11, "B"), card(2, 11, "B"), card(3, 11, "B")],
+        [],
+        [{"id": 13, "name": "D"}],
+        [card(4, 13, "D")],
+    ])
+    segments = [item async for item in async_crud.iter_user_set_export(supabase, "user-1", 3)]
+    assert [(s["id"], [c["id"] for c in cards]) for s, cards in segments] == [
+        (10, []), (11, [1, 2, 3]), (12, []), (13, [4]),
+    ]
+    assert query.execute.await_count == 5
+    query.gt.assert_called_once_with("id", 12)
+    query.or_.assert_called_once_with("set_id.gt.11,and(set_id.eq.11,id.gt.3)")
+
+
+@pytest.mark.asyncio
+async def test_ndjson_has_one_line_per_card():
+    data = await collect("ndjson", segment(10, "Biologia", card(1, 10, "Biologia", "Co to DNA?", "Kwas")))
+    assert json.loads(data) == {"set_id": 10, "set_name": "Biologia", "question": "Co to DNA?", "answer": "Kwas"}
+
+
+@pytest.mark.asyncio
+async def test_empty_set_is_exported_and_skipped_on_import():
+    ndjson = await collect("ndjson", segment(10, "Pusty"), segment(11, "B", card(1, 11, "B")))
+    assert json.loads(ndjson.splitlines()[0]) == {"set_id": 10, "set_name": "Pusty", "flashcard_count": 0}
+    assert [row.flashcard.question for row in iter_rows(io.BytesIO(ndjson), "jsonl")] == ["Q"]
+
+    csv_data = await collect("csv", segment(10, "Pusty"))
+    assert csv_data.decode("utf-8-sig").splitlines() == ["set_name,question,answer", "Pusty,,"]
+
+    archive = zipfile.ZipFile(io.BytesIO(await collect("zip", segment(10, "Pusty"))))
+    assert archive.read("Pusty.csv").decode("utf-8-sig").splitlines() == ["question,answer"]
+
+
+@pytest.mark.asyncio
+async def test_csv_export_can_be_imported_back():
+    data = await collect("csv", segment(10, "A", card(1, 10, "A", "Stolica\nPolski?", "Warszawa, miasto")))
+    rows = list(iter_rows(io.BytesIO(data), "csv"))
+    assert rows[0].flashcard.question == "Stolica\nPolski?"
+    assert rows[0].flashcard.answer == "Warszawa, miasto"
+
+
+@pytest.mark.asyncio
+async def test_zip_has_one_file_per_set():
+    data = await collect(
+        "zip",
+        segment(10, "Bio/logia", card(1, 10, "Bio/logia", "Q1")),
+        segment(11, "Chemia", card(2, 11, "Chemia", "Q2")),
+        segment(11, "Chemia", card(3, 11, "Chemia", "Q3")),
+        segment(12, "Bio:logia", card(4, 12, "Bio:logia", "Q4")),
+    )
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.namelist() == ["Bio_logia.csv", "Chemia.csv", "Bio_logia (2).csv"]
+    assert archive.read("Chemia.csv").decode("utf-8-sig").splitlines() == ["question,answer", "Q2,A", "Q3,A"]
+
+
+def test_export_endpoint_streams_attachment():
+    supabase, _ = make_paged_client([[{"id": 10, "name": "Biologia"}], [card(1, 10, "Biologia")]])
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user-1")
+    app.dependency_overrides[get_async_supabase_client] = lambda: supabase
+    try:
+        response = TestClient(app).get("/export", params={"format": "csv"})
+        bad_format = TestClient(app).get("/export", params={"format": "xlsx"})
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].startswith("attachment;")
+    assert response.content.decode("utf-8-sig").splitlines() == ["set_name,question,answer", "Biologia,Q,A"]
+    assert bad_format.status_code == 400
@@ -0,0 +1,127 @@
+import io
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_async_supabase_client, get_current_user
+from app.main import app
+from app.services.flashcard_import import detect_format, iter_batches, iter_rows
+
+
+def parse(content, fmt, encoding="utf-8"):
+    return list(iter_rows(io.BytesIO(content.encode(encoding)), fmt))
+
+
+def test_csv_with_header_and_multiline_field():
+    rows = parse('answer,question\n"Warszawa","Stolica\nPolski?"\n,Bez odpowiedzi\n', "csv")
+    assert rows[0].flashcard.question == "Stolica\nPolski?"
+    assert rows[0].flashcard.answer == "Warszawa"
+    assert rows[1].error and rows[1].line == 4
+
+
+def test_tsv_without_header_uses_first_two_columns():
+    rows = parse("Q1\tA1\textra\nQ2\n", "tsv")
+    assert rows[0].flashcard.question == "Q1" and rows[0].flashcard.answer == "A1"
+    assert rows[1].error.startswith("Za mało kolumn")
+
+
+def test_jsonl_reports_bad_lines_and_keeps_going():
+    content = '{"question": "Q1", "answer": "A1"}\nnot json\n\n[1, 2]\n{"front": "Q2", "back": "A2"}\n'
+    rows = parse(content, "jsonl")
+    assert [(row.line, bool(row.flashcard)) for row in rows] == [(1, True), (2, False), (4, False), (5, True)]
+
+
+def test_anki_export_headers_html_and_meta_columns():
+    content = (
+        "#separator:tab\n#html:true\n#notetype column:1\n"
+        "Basic\tCo to jest <b>H<sub>2</sub>O</b>?\tWoda<br>[sound:woda.mp3]\n"
+        "Basic\tPuste&nbsp;\t\n"
+    )
+    rows = parse(content, "anki")
+    assert rows[0].flashcard.question == "Co to jest H2O?"
+    assert rows[0].flashcard.answer == "Woda"
+    assert rows[0].line == 4
+    assert rows[1].error
+
+
+def test_windows_1250_file_is_decoded():
+    rows = parse("Źdźbło;x\nŻółw,Gad\n", "csv", encoding="cp1250")
+    assert rows[1].flashcard.question == "Żółw"
+
+
+def test_detect_format():
+    assert detect_format("talia.TSV") == "tsv"
+    assert detect_format("deck.txt", "jsonl") == "jsonl"
+    with pytest.raises(ValueError):
+        detect_format("deck.xlsx")
+
+
+def test_batches_are_lazy():
+    consumed = []
+
+    def rows():
+        for i in range(5):
+            consumed.append(i)
+            yield i
+
+    batches = iter_batches(rows(), 2)
+    assert next(batches) == [0, 1]
+    assert consumed == [0, 1]
+    assert list(batches) == [[2, 3], [4]]
+
+
+def test_import_endpoint_inserts_in_chunks_and_reports_progress(monkeypatch):
+    monkeypatch.setattr("app.routers.imports.IMPORT_CHUNK_SIZE", 2)
+    content = "question,answer\nQ1,A1\nQ2,A2\nQ3,\nQ4,A4\nQ5,A5\n"
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user-1")
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    try:
+        with patch("app.routers.imports.create_flashcard_set", new=AsyncMock(return_value={"id": "set-1"})) as mock_create, \
+             patch("app.routers.imports.add_flashcards", new=AsyncMock(side_effect=lambda db, set_id, cards: len(cards))) as mock_add:
+            response = TestClient(app).post("/import", files={"file": ("biologia.csv", content.encode(), "text/csv")})
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["progress", "progress", "progress", "done"]
+    assert events[1]["errors"] == [{"line": 4, "error": "Brak pytania lub odpowiedzi."}]
+    assert events[-1] == {"event": "done", "set_id": "set-1", "name": "biologia", "rows": 5, "imported": 4, "failed": 1}
+
+    set_data = mock_create.call_args.args[1]
+    assert set_data.name == "biologia" and [fc.question for fc in set_data.flashcards] == ["Q1", "Q2"]
+    assert [[fc.question for fc in call.args[2]] for call in mock_add.call_args_list] == [["Q4"], ["Q5"]]
+
+
+def test_import_failure_after_first_batch_reports_partial_set(monkeypatch):
+    monkeypatch.setattr("app.routers.imports.IMPORT_CHUNK_SIZE", 2)
+    content = "question,answer\nQ1,A1\nQ2,A2\nQ3,A3\n"
+    invalidate = MagicMock()
+    monkeypatch.setattr("app.routers.imports.duplicate_indexes.invalidate", invalidate)
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user-1")
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    try:
+        with patch("app.routers.imports.create_flashcard_set", new=AsyncMock(return_value={"id": "set-1"})), \
+             patch("app.routers.imports.add_flashcards", new=AsyncMock(side_effect=HTTPException(status_code=500, detail="Błąd bazy."))):
+            response = TestClient(app).post("/import", files={"file": ("biologia.csv", content.encode(), "text/csv")})
+    finally:
+        app.dependency_overrides = {}
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["progress", "error"]
+    assert events[-1]["partial"] is True and events[-1]["set_id"] == "set-1" and events[-1]["imported"] == 2
+    assert "zawiera 2" in events[-1]["message"]
+    # Indeks duplikatów jest unieważniany już po pierwszej zapisanej partii
+    invalidate.assert_called_once_with("user-1")
+
+
+def test_import_endpoint_rejects_unknown_format():
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user-1")
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    try:
+        response = TestClient(app).post("/import", files={"file": ("deck.xlsx", b"data", "application/octet-stream")})
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 400
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.flashcard_parser import IncrementalFlashcardParser, parse_flashcards
+
+RAW = 'Here are your cards:\n[{"question": "What is {x}?", "answer": "A \\"quoted\\" }"}, {"question": "Q2", "answer": "A2"}]'
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, len(RAW)])
+def test_parser_yields_cards_regardless_of_chunking(chunk_size):
+    parser = IncrementalFlashcardParser()
+    cards = []
+    for i in range(0, len(RAW), chunk_size):
+        cards.extend(parser.feed(RAW[i:i + chunk_size]))
+    assert [c.question for c in cards] == ["What is {x}?", "Q2"]
+    assert cards[0].answer == 'A "quoted" }'
+
+
+def test_parser_emits_card_as_soon_as_it_closes():
+    parser = IncrementalFlashcardParser()
+    assert parser.feed('[{"question": "Q1", "answer": "A1"') == []
+    assert [c.question for c in parser.feed('}, {"question"')] == ["Q1"]
+
+
+def test_parser_skips_invalid_objects():
+    parser = IncrementalFlashcardParser()
+    cards = parser.feed('[{"question": "Q1"}, {"question": "Q2", "answer": "A2"}, {"question": 1, "answer": "x"}]')
+    assert [c.question for c in cards] == ["Q2"]
+    assert parser.skipped == 2
+
+
+def test_parser_repairs_malformed_objects():
+    parser = IncrementalFlashcardParser()
+    cards = parser.feed('[{"question": "Q1", "answer": "A1",}, {"question": "Q2" "answer": "A2"}]')
+    assert [c.answer for c in cards] == ["A1", "A2"]
+
+
+def test_finish_salvages_truncated_last_object():
+    parser = IncrementalFlashcardParser()
+    assert [c.question for c in parser.feed('[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2')] == ["Q1"]
+    assert [c.answer for c in parser.finish()] == ["A2"]
+    assert parser.finish() == []
+
+
+def test_parse_flashcards_keeps_valid_cards_around_broken_ones():
+    content = 'Here you go:\n[{"question": "Q1", "answer": "A1"}, {"question": "Q2"}, {"question": "Q3", "answer": "A3"}]'
+    assert [c.question for c in parse_flashcards(content)] == ["Q1", "Q3"]
+
+
+def test_parse_flashcards_accepts_wrapped_list_without_array_brackets_first():
+    assert parse_flashcards('{"question": "Q1", "answer": "A1"}')[0].answer == "A1"
@@ -6,7 +6,7 @@ from app.main import app
 client = TestClient(app)
 
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -53,3 +53,124 @@ def test_update_flashcard():
         assert response.status_code in [200, 303, 401], f"Status: {response.status_code}"
         
         print(f"✅ Test flashcard przeszedł - status: {response.status_code}")
+
+
+def test_generate_stream_sends_cards_as_sse(monkeypatch):
+    """Strumieniowe generowanie zwraca każdą fiszkę jako osobne zdarzenie SSE"""
+    from app.dependencies import get_current_user
+
+    monkeypatch.setenv("OLLAMA_MOCK", "true")
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="test-user-id")
+    try:
+        response = client.post("/generate/stream", data={"text": "Some source text", "count": "3"})
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.count("event: card") == 3
+    assert "event: done" in response.text
+    # Formularz wyników strumienia dostaje tekst źródłowy dla "Generuj więcej"
+    assert '"original_text": "Some source text"' in response.text
+
+
+def test_generate_more_appends_new_cards(monkeypatch):
+    """Akcja "Generuj więcej" dokłada nowe fiszki do już wygenerowanych"""
+    from app.dependencies import get_current_user
+
+    monkeypatch.setenv("OLLAMA_MOCK", "true")
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="test-user-id")
+    try:
+        response = client.post("/generate", data={
+            "action": "more",
+            "original_text": "Some source text",
+            "original_count": "2",
+            "questions": ["Existing question"],
+            "answers": ["Existing answer"],
+        })
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert "Existing question" in response.text
+    assert "Mock question 2" in response.text and "Mock question 3" in response.text
+    assert 'value="more"' in response.text
+
+
+def test_generate_reports_trimmed_source_text(monkeypatch):
+    """Strona wyników pokazuje, ile tekstu źródłowego usunięto przed generowaniem"""
+    from app.dependencies import get_current_user
+
+    monkeypatch.setenv("OLLAMA_MOCK", "true")
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="test-user-id")
+    paragraph = "Fotosynteza zachodzi w chloroplastach komórek roślinnych przy udziale światła.\nDruga linia akapitu."
+    try:
+        response = client.post("/generate", data={"action": "generate", "text": "\n\n".join([paragraph] * 3), "count": "2"})
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert "Tekst źródłowy został oczyszczony" in response.text
+
+
+def test_edit_flashcard_post_is_single_update():
+    """Zapis fiszki to jedno wywołanie update_flashcard, bez wcześniejszego odczytu fiszki"""
+    from app.dependencies import get_current_user, get_async_supabase_client
+
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user-1")
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    card_id = "3f2b6f0e-1c9a-4b2e-9a4e-0c2d7e5e6a11"
+    try:
+        with patch("app.routers.flashcards.get_flashcard_for_editing", new=AsyncMock()) as mock_get, \
+             patch("app.services.flashcard_service.async_crud.update_flashcard", new=AsyncMock(
+                 return_value={"id": card_id, "set_id": "set-1", "question": "Q", "answer": "A"}
+             )) as mock_update:
+            response = client.post(f"/cards/{card_id}/edit", data={"question": " Q ", "answer": "A"}, follow_redirects=False)
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 303
+    assert response.headers["location"] == "/sets/set-1"
+    mock_get.assert_not_awaited()
+    mock_update.assert_awaited_once()
+    assert mock_update.await_args.args[3] == {"question": "Q", "answer": "A"}
+
+
+def test_batch_edit_updates_set_in_one_call():
+    """Zbiorcza edycja zestawu przekazuje wszystkie zmiany jednym wywołaniem"""
+    from app.dependencies import get_current_user, get_async_supabase_client
+
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user-1")
+    app.dependency_overrides[get_async_supabase_client] = lambda: MagicMock()
+    ids = ["3f2b6f0e-1c9a-4b2e-9a4e-0c2d7e5e6a11", "9d1c2b3a-4e5f-4a6b-8c7d-0e1f2a3b4c5d"]
+    set_id = "5a4b3c2d-1e0f-4a9b-8c7d-6e5f4a3b2c1d"
+    try:
+        with patch("app.services.flashcard_service.async_crud.update_flashcards", new=AsyncMock(
+            side_effect=lambda db, user_id, changes, set_id: changes
+        )) as mock_update, \
+             patch("app.services.flashcard_service.duplicate_indexes.invalidate") as mock_invalidate:
+            response = client.post(f"/sets/{set_id}/cards", json={"flashcards": [
+                {"id": ids[0], "question": " Nowe pytanie ", "answer": "A1"},
+                {"id": ids[1], "question": "Q2", "answer": "A2"},
+            ]})
+            duplicate = client.post(f"/sets/{set_id}/cards", json={"flashcards": [
+                {"id": ids[0], "question": "Q", "answer": "A"},
+                {"id": ids[0], "question": "Q", "answer": "B"},
+            ]})
+            malformed = client.post("/sets/set-1/cards", json={"flashcards": [
+                {"id": ids[0], "question": "Q", "answer": "A"},
+            ]})
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert response.json()["updated"] == 2
+    mock_update.assert_awaited_once()
+    db, user_id, changes = mock_update.await_args.args
+    assert user_id == "user-1" and mock_update.await_args.kwargs == {"set_id": set_id}
+    assert changes[0] == {"id": ids[0], "question": "Nowe pytanie", "answer": "A1"}
+    # Zmienione pytania unieważniają indeks duplikatów użytkownika
+    mock_invalidate.assert_called_once_with("user-1")
+    assert duplicate.status_code == 422
+    # Niepoprawny identyfikator zestawu odrzuca walidacja, zanim zapytanie trafi do bazy
+    assert malformed.status_code == 422
@@ -0,0 +1,79 @@
+import threading
+import time
+import pytest
+
+from app.schemas.schemas import FlashcardCreate
+from app.services.generation_cache import GenerationCache, cache_key
+from app.services.metrics import metrics
+
+CARDS = [FlashcardCreate(question="Q1", answer="A1"), FlashcardCreate(question="Q2", answer="A2")]
+
+
+def test_cache_key_normalizes_whitespace_and_includes_model_and_count():
+    assert cache_key("Ala  ma\n kota ", 5, "mistral") == cache_key("Ala ma kota", 5, "mistral")
+    assert cache_key("Ala ma kota", 5, "mistral") != cache_key("Ala ma kota", 6, "mistral")
+    assert cache_key("Ala ma kota", 5, "mistral") != cache_key("Ala ma kota", 5, "llama3")
+
+
+def test_memory_tier_lru_and_counters():
+    metrics.reset()
+    cache = GenerationCache(max_entries=1, ttl=60)
+    cache.set("a", CARDS)
+    cache.set("b", CARDS)
+    assert cache.get("a") is None
+    assert [c.question for c in cache.get("b")] == ["Q1", "Q2"]
+    assert metrics.counter("generation_cache.hits.memory") == 1
+    assert metrics.counter("generation_cache.misses") == 1
+
+
+def test_disk_tier_survives_new_instance_and_expires(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    GenerationCache(max_entries=10, ttl=60, db_path=db_path).set("a", CARDS)
+
+    reopened = GenerationCache(max_entries=10, ttl=60, db_path=db_path)
+    assert [c.answer for c in reopened.get("a")] == ["A1", "A2"]
+
+    expired = GenerationCache(max_entries=10, ttl=0, db_path=db_path)
+    assert expired.get("a") is None
+
+
+def test_disk_tier_evicts_least_recently_used_over_size_limit(tmp_path):
+    cache = GenerationCache(max_entries=0, ttl=60, db_path=str(tmp_path / "cache.db"), db_max_bytes=100)
+    cache.set("a", CARDS)
+    time.sleep(0.01)
+    cache.set("b", CARDS)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+
+async def test_async_access_runs_disk_tier_off_the_event_loop(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "cache.db")
+    await GenerationCache(max_entries=10, ttl=60, db_path=db_path).aset("a", CARDS)
+
+    reopened = GenerationCache(max_entries=10, ttl=60, db_path=db_path)
+    threads = []
+    read_disk = reopened._get_from_disk
+    monkeypatch.setattr(reopened, "_get_from_disk", lambda *args: threads.append(threading.get_ident()) or read_disk(*args))
+
+    assert [c.question for c in await reopened.aget("a")] == ["Q1", "Q2"]
+    assert threads and threading.get_ident() not in threads
+    # Drugi odczyt trafia już do pamięci, bez zapytania do SQLite
+    assert await reopened.aget("a") is not None
+    assert len(threads) == 1
+
+
+def test_metrics_endpoint_requires_token(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import dependencies
+    from app.main import app
+
+    client = TestClient(app)
+    monkeypatch.setattr(dependencies, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(dependencies, "METRICS_TOKEN", "secret-token")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret-token"})
+    assert response.status_code == 200
+    assert "counters" in response.json()
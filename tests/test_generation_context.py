@@ -0,0 +1,23 @@
+from app.services.generation_context import GenerationContextStore
+
+
+def test_claimed_context_belongs_to_session():
+    store = GenerationContextStore(max_entries=4)
+    store.remember("text-key", [1, 2, 3])
+
+    assert store.claim("user-1", "text-key")
+    assert store.get("user-1", "text-key") == [1, 2, 3]
+    assert store.get("user-2", "text-key") is None
+    assert not store.claim("user-2", "text-key")
+
+
+def test_least_recently_used_context_is_evicted():
+    store = GenerationContextStore(max_entries=2)
+    store.put("user", "a", [1])
+    store.put("user", "b", [2])
+    store.get("user", "a")
+    store.put("user", "c", [3])
+
+    assert store.get("user", "a") == [1]
+    assert store.get("user", "b") is None
+    assert store.get("user", "c") == [3]
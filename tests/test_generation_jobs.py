@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_current_user
+from app.exceptions import GenerationQueueFullError
+from app.main import app
+from app.schemas.schemas import FlashcardCreate
+from app.services import generation_jobs
+from app.services.generation_jobs import JobManager
+
+
+@pytest.fixture()
+def manager():
+    return JobManager(workers=2, max_queue=2, db_path="")
+
+
+async def test_run_returns_result_and_persists_job(manager):
+    async def generate(text, count):
+        return [FlashcardCreate(question=f"Q{i}", answer="A") for i in range(count)]
+
+    flashcards = await manager.run("user-1", "text", 2, generate=generate)
+    assert [fc.question for fc in flashcards] == ["Q0", "Q1"]
+    await manager.stop()
+
+
+async def test_job_store_runs_off_the_event_loop_and_persists_to_file(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "jobs.db")
+    manager = JobManager(workers=1, max_queue=5, db_path=db_path)
+    threads = []
+    update = generation_jobs.JobStore.update
+    monkeypatch.setattr(
+        generation_jobs.JobStore, "update", lambda self, *args, **kwargs: threads.append(threading.get_ident()) or update(self, *args, **kwargs)
+    )
+
+    async def generate(text, count):
+        return [FlashcardCreate(question="Q", answer="A")]
+
+    job_id = manager.submit("user-1", "text", 1, generate=generate)
+    while (await manager.get(job_id, "user-1")).status != "done":
+        await asyncio.sleep(0.01)
+    await manager.stop()
+
+    assert threads and threading.get_ident() not in threads
+    # Zadanie zapisane w pliku jest widoczne dla nowego procesu (tu: nowego menedżera)
+    reopened = JobManager(workers=1, max_queue=5, db_path=db_path)
+    assert (await reopened.get(job_id, "user-1")).flashcards[0].question == "Q"
+
+
+async def test_workers_cap_concurrency_and_full_queue_is_rejected(manager):
+    running = 0
+    peak = 0
+    release = asyncio.Event()
+
+    async def generate(text, count):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+        return [FlashcardCreate(question="Q", answer="A")]
+
+    job_ids = [manager.submit("user-1", "text", 1, generate=generate) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    job_ids += [manager.submit("user-1", "text", 1, generate=generate) for _ in range(2)]
+    with pytest.raises(GenerationQueueFullError):
+        manager.submit("user-1", "text", 1, generate=generate)
+
+    release.set()
+    while (await manager.get(job_ids[-1], "user-1")).status != "done":
+        await asyncio.sleep(0.01)
+    assert peak == 2
+    assert await manager.get(job_ids[0], "someone-else") is None
+    await manager.stop()
+
+
+async def test_failed_generation_is_recorded(manager):
+    async def generate(text, count):
+        raise ValueError("model exploded")
+
+    with pytest.raises(ValueError):
+        await manager.run("user-1", "text", 1, generate=generate)
+    await manager.stop()
+
+
+def test_job_endpoints_submit_and_poll(monkeypatch):
+    monkeypatch.setenv("OLLAMA_MOCK", "true")
+    monkeypatch.setattr(generation_jobs, "job_manager", JobManager(workers=1, max_queue=5, db_path=""))
+    monkeypatch.setattr("app.routers.jobs.job_manager", generation_jobs.job_manager)
+    app.dependency_overrides[get_current_user] = lambda: MagicMock(id="user-1")
+    try:
+        with TestClient(app) as client:
+            response = client.post("/jobs/generate", json={"text": "Some text", "count": 3})
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+
+            for _ in range(100):
+                job = client.get(f"/jobs/{job_id}").json()
+                if job["status"] == "done":
+                    break
+            assert job["status"] == "done"
+            assert len(job["flashcards"]) == 3
+            assert client.get("/jobs/unknown").status_code == 404
+    finally:
+        app.dependency_overrides = {}
+
+
+async def test_cancelled_caller_aborts_running_and_queued_jobs():
+    manager = JobManager(workers=1, max_queue=5, db_path="")
+    started = []
+    aborted = asyncio.Event()
+
+    async def generate(text, count):
+        started.append(text)
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            aborted.set()
+            raise
+
+    running = asyncio.create_task(manager.run("user-1", "first", 1, generate=generate))
+    queued = asyncio.create_task(manager.run("user-1", "second", 1, generate=generate))
+    await asyncio.sleep(0.01)
+
+    queued.cancel()
+    running.cancel()
+    await asyncio.wait_for(aborted.wait(), 1)
+    await asyncio.sleep(0.01)
+
+    # Worker przeżył anulowanie i obsługuje kolejne zadania
+    async def quick(text, count):
+        return [FlashcardCreate(question="Q", answer="A")]
+
+    assert (await manager.run("user-1", "third", 1, generate=quick))[0].question == "Q"
+    assert started == ["first"]
+    await manager.stop()
+
+
+async def test_streaming_slot_shares_workers_and_queue():
+    manager = JobManager(workers=1, max_queue=1, db_path="")
+    order = []
+
+    async def generate(text, count):
+        order.append(text)
+        return [FlashcardCreate(question="Q", answer="A")]
+
+    async with manager.slot("user-1", 3):
+        # Strumień zajmuje jedynego workera - zadanie czeka w kolejce, kolejne jest odrzucane
+        queued = asyncio.create_task(manager.run("user-2", "job", 1, generate=generate))
+        await asyncio.sleep(0.01)
+        assert order == []
+        with pytest.raises(GenerationQueueFullError):
+            async with manager.slot("user-3", 1):
+                pass
+    await queued
+    assert order == ["job"]
+    await manager.stop()
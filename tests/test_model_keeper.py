@@ -0,0 +1,88 @@
+import json
+import httpx
+import pytest
+
+from app.services import model_keeper, ollama
+from app.services.metrics import metrics
+from app.services.ollama_backends import BackendPool
+
+
+@pytest.fixture(autouse=True)
+async def reset_http_client():
+    await ollama.close_http_client()
+    metrics.reset()
+    yield
+    await ollama.close_http_client()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("30m", 1800), ("1h30m", 5400), ("300", 300), ("45s", 45), ("-1", None), ("0", None), ("-5m", None),
+])
+def test_keep_alive_seconds(value, expected):
+    assert ollama.parse_keep_alive(value)[1] == expected
+
+
+def test_keep_alive_value_and_seconds_come_from_one_parser():
+    # Jednostki akceptowane przez Ollama dają też czas odświeżania modelu
+    assert ollama.parse_keep_alive("300us") == ("300us", pytest.approx(0.0003))
+    assert ollama.parse_keep_alive("1.5") == ("1500ms", 1.5)
+
+
+async def test_warm_up_loads_model_on_every_backend(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.host == "ollama-b":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"done": True, "load_duration": 4_500_000_000})
+
+    monkeypatch.setattr(ollama, "_create_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(ollama, "backend_pool", BackendPool(["http://ollama-a:11434", "http://ollama-b:11434"]))
+
+    await model_keeper.warm_up(ollama.get_http_client())
+
+    assert {r.url.host for r in requests} == {"ollama-a", "ollama-b"}
+    payload = json.loads(requests[0].content)
+    assert payload["model"] == ollama.OLLAMA_MODEL_NAME and "prompt" not in payload
+    assert payload["keep_alive"] == ollama.keep_alive_value()
+    assert metrics.counter("ollama.cold_starts") == 1
+    assert metrics.counter("ollama.warmup.failures") == 1
+    assert metrics.percentile("ollama.cold_start_delay", 50) == pytest.approx(4.5)
+
+
+def test_generation_payload_carries_keep_alive():
+    assert ollama._generate_payload("prompt", stream=False)["keep_alive"] == ollama.keep_alive_value()
+    assert ollama.keep_alive_value("600") == 600
+
+
+def test_keep_alive_value_sends_fractions_with_a_unit_and_rejects_bare_words():
+    assert ollama.keep_alive_value("-1") == -1
+    assert ollama.keep_alive_value("1.5") == "1500ms"
+    assert ollama.keep_alive_value("1h30m") == "1h30m"
+    for invalid in ("30 minutes", "forever", "inf"):
+        with pytest.raises(ValueError):
+            ollama.keep_alive_value(invalid)
+
+
+async def test_warm_up_counts_non_json_reply_as_failure(monkeypatch):
+    monkeypatch.setattr(
+        ollama, "_create_http_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text="<html>proxy</html>")))
+    )
+    monkeypatch.setattr(ollama, "backend_pool", BackendPool(["http://ollama-a:11434"]))
+
+    await model_keeper.warm_up(ollama.get_http_client())
+
+    assert metrics.counter("ollama.warmup.failures") == len(ollama.model_router.models())
+    assert metrics.counter("ollama.warmup.done") == 0
+
+
+async def test_model_keeper_is_not_started_in_mock_mode(monkeypatch):
+    monkeypatch.setenv("OLLAMA_MOCK", "true")
+    monkeypatch.setattr(model_keeper, "OLLAMA_WARMUP", True)
+    monkeypatch.setattr(model_keeper, "_keeper_task", None)
+
+    model_keeper.start_model_keeper()
+
+    assert model_keeper._keeper_task is None
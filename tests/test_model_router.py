@@ -0,0 +1,84 @@
+import json
+import httpx
+import pytest
+
+from app.services import model_router, ollama
+from app.services.generation_cache import generation_cache
+from app.services.metrics import metrics
+
+
+@pytest.fixture()
+def draft(monkeypatch):
+    monkeypatch.setattr(model_router, "OLLAMA_DRAFT_MODEL_NAME", "tiny")
+    monkeypatch.setattr(model_router, "OLLAMA_DRAFT_MAX_CHARS", 100)
+    monkeypatch.setattr(model_router, "OLLAMA_DRAFT_MAX_COUNT", 5)
+
+
+@pytest.fixture()
+def models_seen(monkeypatch):
+    """Atrapa Ollama zapisująca, do którego modelu trafiło zapytanie; model "tiny-broken" zwraca błąd."""
+    seen = []
+
+    def dispatch(request):
+        model = json.loads(request.content)["model"]
+        seen.append(model)
+        if model == "tiny-broken":
+            return httpx.Response(404, json={"error": f"model '{model}' not found"})
+        cards = [{"question": f"Q{i} ({model})", "answer": "A"} for i in range(5)]
+        return httpx.Response(200, json={"response": json.dumps(cards), "done": True})
+
+    monkeypatch.setattr(ollama, "_create_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(dispatch)))
+    monkeypatch.setattr(ollama, "OLLAMA_STRUCTURED_OUTPUT", False)
+    monkeypatch.delenv("OLLAMA_MOCK", raising=False)
+    yield seen
+
+
+@pytest.fixture(autouse=True)
+async def reset_state():
+    await ollama.close_http_client()
+    ollama.ollama_breaker.reset()
+    generation_cache.clear()
+    yield
+    await ollama.close_http_client()
+    ollama.ollama_breaker.reset()
+    generation_cache.clear()
+
+
+def test_without_draft_model_everything_goes_to_full_model():
+    assert model_router.select_model("short", 1) == ollama.OLLAMA_MODEL_NAME
+    assert model_router.models() == [ollama.OLLAMA_MODEL_NAME]
+
+
+def test_thresholds_decide_the_model(draft):
+    assert model_router.select_model("x" * 100, 5) == "tiny"
+    assert model_router.select_model("x" * 101, 5) == ollama.OLLAMA_MODEL_NAME
+    assert model_router.select_model("x" * 10, 6) == ollama.OLLAMA_MODEL_NAME
+
+
+async def test_small_request_uses_draft_model_and_is_counted(draft, models_seen):
+    requests_before = metrics.counter("ollama.model.tiny.requests")
+    cards = await ollama.generate_flashcards_from_text("Short note", 3)
+
+    assert models_seen == ["tiny"]
+    assert cards[0].question == "Q0 (tiny)"
+    assert metrics.counter("ollama.model.tiny.requests") == requests_before + 1
+    assert model_router.model_stats()["tiny"]["p50_latency"] is not None
+
+
+async def test_failing_draft_model_falls_back_to_full_model(monkeypatch, draft, models_seen):
+    monkeypatch.setattr(model_router, "OLLAMA_DRAFT_MODEL_NAME", "tiny-broken")
+    failures_before = metrics.counter("ollama.model.tiny-broken.failures")
+
+    cards = await ollama.generate_flashcards_from_text("Short note", 3)
+
+    assert models_seen == ["tiny-broken", ollama.OLLAMA_MODEL_NAME]
+    assert cards[0].question.endswith(f"({ollama.OLLAMA_MODEL_NAME})")
+    assert metrics.counter("ollama.model.tiny-broken.failures") == failures_before + 1
+
+
+async def test_stream_falls_back_before_first_card(monkeypatch, draft, models_seen):
+    monkeypatch.setattr(model_router, "OLLAMA_DRAFT_MODEL_NAME", "tiny-broken")
+    cards = [card async for card in ollama.stream_flashcards_from_text("Short note", 2)]
+
+    assert models_seen == ["tiny-broken", ollama.OLLAMA_MODEL_NAME]
+    assert len(cards) == 2
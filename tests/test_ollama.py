@@ -0,0 +1,322 @@
+import asyncio
+import json
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services import ollama
+from app.services.generation_cache import generation_cache
+
+
+def ollama_reply(cards):
+    return httpx.Response(200, json={"response": json.dumps(cards), "done": True})
+
+
+@pytest.fixture()
+def ollama_transport(monkeypatch):
+    """Podmienia transport współdzielonego klienta Ollama na lokalny handler."""
+    state = {"handler": None, "requests": []}
+
+    def dispatch(request):
+        state["requests"].append(request)
+        return state["handler"](request)
+
+    monkeypatch.setattr(ollama, "_create_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(dispatch)))
+    monkeypatch.delenv("OLLAMA_MOCK", raising=False)
+    yield state
+
+
+@pytest.fixture(autouse=True)
+async def reset_http_client():
+    await ollama.close_http_client()
+    ollama.ollama_breaker.reset()
+    generation_cache.clear()
+    ollama.generation_contexts.clear()
+    ollama._structured_output_unsupported.clear()
+    yield
+    await ollama.close_http_client()
+    ollama.ollama_breaker.reset()
+    generation_cache.clear()
+    ollama.generation_contexts.clear()
+    ollama._structured_output_unsupported.clear()
+
+
+async def test_generation_reuses_shared_client(ollama_transport):
+    ollama_transport["handler"] = lambda request: ollama_reply([{"question": "Q1", "answer": "A1"}])
+
+    first = await ollama.generate_flashcards_from_text("Some text", 1)
+    client = ollama.get_http_client()
+    second = await ollama.generate_flashcards_from_text("Other text", 1)
+
+    assert first[0].question == "Q1" and second[0].answer == "A1"
+    assert ollama.get_http_client() is client
+    assert len(ollama_transport["requests"]) == 2
+
+
+async def test_close_http_client_closes_pool(ollama_transport):
+    client = ollama.get_http_client()
+    await ollama.close_http_client()
+    assert client.is_closed
+    assert ollama.get_http_client() is not client
+
+
+def test_client_uses_configured_timeouts():
+    client = ollama._create_http_client()
+    assert client.timeout.connect == ollama.OLLAMA_CONNECT_TIMEOUT
+    assert client.timeout.read == ollama.OLLAMA_READ_TIMEOUT
+
+
+def streamed_reply(text, pieces=4, context=None):
+    """Buduje odpowiedź /api/generate w trybie stream (NDJSON z kolejnymi fragmentami tekstu)."""
+    size = max(1, len(text) // pieces)
+    lines = [json.dumps({"response": text[i:i + size], "done": False}) for i in range(0, len(text), size)]
+    final = {"response": "", "done": True}
+    if context is not None:
+        final["context"] = context
+    lines.append(json.dumps(final))
+    return httpx.Response(200, content="\n".join(lines).encode())
+
+
+async def test_stream_yields_cards_incrementally(ollama_transport):
+    cards = [{"question": f"Q{i}", "answer": f"A{i}"} for i in range(3)]
+    ollama_transport["handler"] = lambda request: streamed_reply(json.dumps(cards))
+
+    result = [card async for card in ollama.stream_flashcards_from_text("Some text", 3)]
+
+    assert [c.question for c in result] == ["Q0", "Q1", "Q2"]
+    assert json.loads(ollama_transport["requests"][0].content)["stream"] is True
+
+
+async def test_stream_stops_after_requested_count(ollama_transport):
+    cards = [{"question": f"Q{i}", "answer": f"A{i}"} for i in range(5)]
+    ollama_transport["handler"] = lambda request: streamed_reply(json.dumps(cards))
+
+    result = [card async for card in ollama.stream_flashcards_from_text("Some text", 2)]
+    assert len(result) == 2
+
+
+async def test_malformed_stream_line_raises_http_exception(ollama_transport):
+    ollama_transport["handler"] = lambda request: httpx.Response(200, text='{"response": "[", "done": false}\nnot json\n')
+    with pytest.raises(HTTPException) as exc_info:
+        [card async for card in ollama.stream_flashcards_from_text("Some text", 2)]
+    assert exc_info.value.detail == "Ollama returned a malformed stream."
+
+
+async def test_stream_without_cards_raises(ollama_transport):
+    ollama_transport["handler"] = lambda request: streamed_reply("I cannot do that.")
+    with pytest.raises(HTTPException):
+        [card async for card in ollama.stream_flashcards_from_text("Some text", 2)]
+
+
+async def test_identical_request_is_served_from_cache(ollama_transport):
+    ollama_transport["handler"] = lambda request: ollama_reply([{"question": "Q1", "answer": "A1"}])
+
+    await ollama.generate_flashcards_from_text("Some   text\n", 1)
+    cached = await ollama.generate_flashcards_from_text("Some text", 1)
+
+    assert cached[0].question == "Q1"
+    assert len(ollama_transport["requests"]) == 1
+
+
+async def test_long_text_is_generated_in_parallel_chunks(ollama_transport, monkeypatch):
+    monkeypatch.setattr(ollama, "OLLAMA_CHUNK_MAX_CHARS", 200)
+
+    def handler(request):
+        prompt = json.loads(request.content)["prompt"]
+        label = "alpha" if "alpha" in prompt else "beta"
+        return ollama_reply([
+            {"question": f"{label} question {i}", "answer": "A"} for i in range(3)
+        ] + [{"question": "Shared question", "answer": "A"}])
+
+    ollama_transport["handler"] = handler
+    text = ("alpha " * 25).strip() + "\n\n" + ("beta " * 25).strip()
+
+    flashcards = await ollama.generate_flashcards_from_text(text, 6)
+
+    assert len(ollama_transport["requests"]) == 2
+    questions = [fc.question for fc in flashcards]
+    assert len(questions) == len(set(questions)) == 6
+
+
+async def test_identical_concurrent_generations_share_one_request(ollama_transport):
+    ollama_transport["handler"] = lambda request: ollama_reply([{"question": "Q1", "answer": "A1"}])
+
+    results = await asyncio.gather(*(ollama.generate_flashcards_from_text("Same text", 1) for _ in range(3)))
+
+    assert all(r[0].question == "Q1" for r in results)
+    assert len(ollama_transport["requests"]) == 1
+
+
+async def test_malformed_item_does_not_fail_generation(ollama_transport):
+    content = '[{"question": "Q1", "answer": "A1"}, {"question": "Q2"}, {"question": "Q3", "answer": "A3",}]'
+    replies = iter([
+        httpx.Response(200, json={"response": content, "done": True}),
+        ollama_reply([{"question": "Q4", "answer": "A4"}]),
+    ])
+    ollama_transport["handler"] = lambda request: next(replies)
+
+    flashcards = await ollama.generate_flashcards_from_text("Some text", 3)
+
+    assert [fc.question for fc in flashcards] == ["Q1", "Q3", "Q4"]
+    top_up = json.loads(ollama_transport["requests"][1].content)["prompt"]
+    assert "Generate 1 flashcards" in top_up and "- Q1" in top_up
+
+
+async def test_failed_top_up_returns_salvaged_cards(ollama_transport):
+    replies = iter([
+        ollama_reply([{"question": "Q1", "answer": "A1"}]),
+        httpx.Response(500, text="boom"),
+    ])
+    ollama_transport["handler"] = lambda request: next(replies)
+
+    flashcards = await ollama.generate_flashcards_from_text("Some text", 2)
+
+    assert [fc.question for fc in flashcards] == ["Q1"]
+    # Niepełny wynik nie trafia do cache
+    assert ollama.generation_cache.get(ollama.cache_key("Some text", 2, ollama.OLLAMA_MODEL_NAME)) is None
+
+
+async def test_stream_tops_up_missing_cards(ollama_transport):
+    replies = iter([
+        streamed_reply('[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A'),
+        ollama_reply([{"question": "Q1", "answer": "A1"}, {"question": "Q3", "answer": "A3"}]),
+    ])
+    ollama_transport["handler"] = lambda request: next(replies)
+
+    result = [card async for card in ollama.stream_flashcards_from_text("Some text", 3)]
+
+    assert [c.question for c in result] == ["Q1", "Q2", "Q3"]
+
+
+async def test_structured_output_sends_schema_and_validates(ollama_transport):
+    content = json.dumps({"flashcards": [{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2"}]})
+    ollama_transport["handler"] = lambda request: httpx.Response(200, json={"response": content, "done": True})
+
+    flashcards = await ollama.generate_flashcards_from_text("Some text", 2)
+
+    assert [fc.question for fc in flashcards] == ["Q1", "Q2"]
+    assert json.loads(ollama_transport["requests"][0].content)["format"] == ollama.RESPONSE_SCHEMA
+
+
+async def test_server_without_schema_support_falls_back_to_plain_prompt(ollama_transport):
+    def handler(request):
+        if "format" in json.loads(request.content):
+            return httpx.Response(400, json={"error": "json: cannot unmarshal object into Go struct field GenerateRequest.format of type string"})
+        return ollama_reply([{"question": "Q1", "answer": "A1"}])
+
+    ollama_transport["handler"] = handler
+
+    flashcards = await ollama.generate_flashcards_from_text("Some text", 1)
+
+    assert flashcards[0].question == "Q1"
+    assert "format" not in json.loads(ollama_transport["requests"][-1].content)
+    # Schemat jest wyłączany tylko dla tego backendu i modelu
+    assert ollama._structured_output_unsupported == {(ollama.backend_pool.backends[0].url, ollama.OLLAMA_MODEL_NAME)}
+    assert "format" in ollama._with_structured_output({"model": "other-model"}, ollama.backend_pool.backends[0].url)
+
+
+async def test_other_bad_request_does_not_disable_structured_output(ollama_transport):
+    ollama_transport["handler"] = lambda request: httpx.Response(400, json={"error": "prompt is too long"})
+
+    with pytest.raises(HTTPException):
+        await ollama.generate_flashcards_from_text("Some text", 1)
+
+    assert not ollama._structured_output_unsupported
+    assert all("format" in json.loads(request.content) for request in ollama_transport["requests"])
+
+
+async def test_generate_more_reuses_context_of_previous_generation(ollama_transport):
+    replies = iter([
+        httpx.Response(200, json={"response": json.dumps([{"question": "Q1", "answer": "A1"}]), "context": [1, 2, 3]}),
+        httpx.Response(200, json={"response": json.dumps([{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2"}]), "context": [1, 2, 3, 4]}),
+    ])
+    ollama_transport["handler"] = lambda request: next(replies)
+
+    await ollama.generate_flashcards_from_text("Long source notes", 1)
+    assert ollama.claim_generation_context("session-1", "Long source notes")
+    more = await ollama.generate_more_flashcards("Long source notes", 2, ["Q1"], "session-1")
+
+    assert [fc.question for fc in more] == ["Q2"]
+    payload = json.loads(ollama_transport["requests"][1].content)
+    assert payload["context"] == [1, 2, 3]
+    assert "Long source notes" not in payload["prompt"]
+    assert ollama.generation_contexts.get("session-1", ollama.context_key("Long source notes")) == [1, 2, 3, 4]
+
+
+async def test_stream_remembers_context_for_generate_more(ollama_transport):
+    cards = [{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2"}]
+    ollama_transport["handler"] = lambda request: streamed_reply(json.dumps(cards), context=[7, 8, 9])
+
+    result = [card async for card in ollama.stream_flashcards_from_text("Streamed notes", 2)]
+
+    assert len(result) == 2
+    assert ollama.claim_generation_context("session-3", "Streamed notes")
+    assert ollama.generation_contexts.get("session-3", ollama.context_key("Streamed notes")) == [7, 8, 9]
+
+
+async def test_generate_more_without_context_sends_full_prompt(ollama_transport):
+    ollama_transport["handler"] = lambda request: ollama_reply([{"question": "Q2", "answer": "A2"}])
+
+    await ollama.generate_more_flashcards("Other notes", 1, ["Q1"], "session-2")
+
+    payload = json.loads(ollama_transport["requests"][0].content)
+    assert "context" not in payload
+    assert "Other notes" in payload["prompt"] and "- Q1" in payload["prompt"]
+
+
+def test_adaptive_timeout_scales_with_observed_latency_and_request_size(monkeypatch):
+    from app.services.metrics import Metrics
+
+    monkeypatch.setattr(ollama, "metrics", Metrics())
+    assert ollama.adaptive_timeout("x" * 1000, 5).read == ollama.OLLAMA_READ_TIMEOUT
+
+    for _ in range(20):
+        ollama.metrics.observe("ollama.latency_per_unit", 2.0)
+    small = ollama.adaptive_timeout("x" * 1000, 5).read
+    large = ollama.adaptive_timeout("x" * 4000, 15).read
+
+    assert small == pytest.approx(2.0 * (1 + 1 + 5) * ollama.OLLAMA_TIMEOUT_MULTIPLIER)
+    assert large > small
+    assert ollama.adaptive_timeout("x" * 100000, 20).read == ollama.OLLAMA_TIMEOUT_MAX
+
+
+
+async def test_stream_uses_adaptive_timeout_and_timeouts_are_sampled(ollama_transport, monkeypatch):
+    from app.services.metrics import Metrics
+
+    monkeypatch.setattr(ollama, "metrics", Metrics())
+    for _ in range(20):
+        ollama.metrics.observe("ollama.latency_per_unit", 2.0)
+    cards = [{"question": "Q0", "answer": "A0"}]
+    ollama_transport["handler"] = lambda request: streamed_reply(json.dumps(cards))
+
+    [card async for card in ollama.stream_flashcards_from_text("Some text", 1)]
+    expected = ollama.adaptive_timeout(ollama.build_prompt("Some text", 1), 1).read
+    assert ollama_transport["requests"][0].extensions["timeout"]["read"] == expected
+
+    def time_out(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    ollama_transport["handler"] = time_out
+    with pytest.raises(HTTPException):
+        [card async for card in ollama.stream_flashcards_from_text("Other text", 1)]
+    with pytest.raises(HTTPException):
+        await ollama.generate_flashcards_from_text("Third text", 1)
+
+    # Przekroczenia limitu czasu trafiają do próbek jako opóźnienie równe limitowi
+    assert ollama.metrics.sample_count("ollama.latency_per_unit") == 22
+
+
+async def test_open_circuit_fails_fast_without_calling_ollama(ollama_transport):
+    ollama_transport["handler"] = lambda request: httpx.Response(503, text="overloaded")
+
+    for i in range(ollama.ollama_breaker.failure_threshold):
+        with pytest.raises(HTTPException):
+            await ollama.generate_flashcards_from_text(f"Text {i}", 1)
+    calls = len(ollama_transport["requests"])
+
+    with pytest.raises(HTTPException) as exc_info:
+        await ollama.generate_flashcards_from_text("Another text", 1)
+
+    assert exc_info.value.status_code == 503
+    assert len(ollama_transport["requests"]) == calls
@@ -0,0 +1,125 @@
+import json
+import httpx
+import pytest
+
+from app.services import ollama
+from app.services.generation_cache import generation_cache
+from app.services.ollama_backends import BackendPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture()
+def pool(clock):
+    return BackendPool(["http://ollama-a:11434", "http://ollama-b:11434/"], eject_after=2, eject_seconds=30, clock=clock)
+
+
+@pytest.fixture()
+def backends(monkeypatch, pool):
+    """Lokalne atrapy serwerów Ollama - odpowiedź zależy od hosta w żądaniu."""
+    state = {"down": set(), "hits": []}
+
+    def dispatch(request):
+        host = request.url.host
+        state["hits"].append((host, request.url.path))
+        if host in state["down"]:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": []})
+        cards = [{"question": f"Q from {host}", "answer": "A"}]
+        return httpx.Response(200, json={"response": json.dumps(cards), "done": True})
+
+    monkeypatch.setattr(ollama, "_create_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(dispatch)))
+    monkeypatch.setattr(ollama, "backend_pool", pool)
+    monkeypatch.delenv("OLLAMA_MOCK", raising=False)
+    yield state
+
+
+@pytest.fixture(autouse=True)
+async def reset_http_client():
+    await ollama.close_http_client()
+    ollama.ollama_breaker.reset()
+    generation_cache.clear()
+    yield
+    await ollama.close_http_client()
+    ollama.ollama_breaker.reset()
+    generation_cache.clear()
+
+
+def test_pick_prefers_fewest_outstanding(pool):
+    a, b = pool.backends
+    a.outstanding = 3
+    assert pool.pick() is b
+    b.outstanding = 5
+    assert pool.pick() is a
+
+
+def test_pick_round_robins_between_idle_backends(pool):
+    picked = {pool.pick().url for _ in range(4)}
+    assert picked == {"http://ollama-a:11434", "http://ollama-b:11434"}
+
+
+def test_failing_backend_is_ejected_until_timeout(pool, clock):
+    a, b = pool.backends
+    pool.record_failure(a, "boom")
+    assert a.is_available(clock.now)
+    pool.record_failure(a, "boom")
+    assert not a.is_available(clock.now)
+    assert all(pool.pick() is b for _ in range(4))
+
+    clock.now += 31
+    assert a.is_available(clock.now)
+
+
+def test_all_ejected_falls_back_to_earliest_recovery(pool, clock):
+    a, b = pool.backends
+    pool._eject(a)
+    clock.now += 5
+    pool._eject(b)
+    assert pool.pick() is a
+
+
+async def test_generation_is_spread_across_backends(backends):
+    questions = set()
+    for i in range(4):
+        cards = await ollama.generate_flashcards_from_text(f"Text {i}", 1)
+        questions.add(cards[0].question)
+    assert questions == {"Q from ollama-a", "Q from ollama-b"}
+
+
+async def test_connection_errors_eject_backend(backends, pool):
+    backends["down"].add("ollama-a")
+    for i in range(6):
+        try:
+            await ollama.generate_flashcards_from_text(f"Text {i}", 1)
+        except Exception:
+            pass
+
+    a, b = pool.backends
+    assert a.failures == 2
+    assert not a.is_available(pool._clock())
+    assert b.latency_ewma is not None
+    assert pool.stats()[0]["last_error"]
+
+
+async def test_health_check_ejects_and_readmits(backends, pool):
+    a, b = pool.backends
+    backends["down"].add("ollama-b")
+    await pool.check(ollama.get_http_client())
+    assert a.is_available(pool._clock()) and not b.is_available(pool._clock())
+
+    backends["down"].clear()
+    await pool.check(ollama.get_http_client())
+    assert b.is_available(pool._clock())
+    assert ("ollama-b", "/api/tags") in backends["hits"]
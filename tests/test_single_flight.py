@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_task():
+    flight = SingleFlight("test")
+    started = []
+
+    async def work():
+        started.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+
+    assert results == ["result"] * 3
+    assert len(started) == 1
+    assert flight.in_flight() == 0
+
+
+async def test_errors_are_raised_to_every_waiter():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(flight.do("key", work), flight.do("key", work), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+async def test_task_survives_until_last_waiter_cancels():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await release.wait()
+            return "done"
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(flight.do("key", work))
+    second = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+
+    # Pierwszy czekający odchodzi - zadanie musi dalej działać dla drugiego
+    first.cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cancelled.is_set()
+    assert flight.in_flight() == 0
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+async def test_new_call_after_completion_starts_fresh():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    assert await flight.do("key", work) == 1
+    assert await flight.do("key", work) == 2
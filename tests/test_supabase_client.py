@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import supabase_client
+from app.dependencies import get_supabase_client
+from app.main import app
+
+
+@pytest.fixture()
+def fresh_pool(monkeypatch):
+    # Izolujemy test od klienta współdzielonego przez inne testy (np. fixture supabase_client)
+    monkeypatch.setattr(supabase_client, "_client", None)
+    yield
+    supabase_client.close_pool()
+
+
+def test_get_supabase_client_returns_shared_instance(fresh_pool):
+    first = get_supabase_client()
+    second = get_supabase_client()
+    assert first is second
+    assert isinstance(first, supabase_client.PooledSupabaseClient)
+
+
+def test_pool_limits_applied_to_postgrest_session(fresh_pool):
+    client = get_supabase_client()
+    pool = client.postgrest.session._transport._pool
+    assert pool._max_connections == supabase_client.SUPABASE_POOL_MAX_CONNECTIONS
+    assert pool._max_keepalive_connections == supabase_client.SUPABASE_POOL_MAX_KEEPALIVE
+
+
+def test_lifespan_opens_and_closes_pool(fresh_pool):
+    with TestClient(app):
+        client = supabase_client.get_pooled_client()
+        session = client.postgrest.session
+        assert supabase_client._client is client
+    assert supabase_client._client is None
+    assert session.is_closed
@@ -0,0 +1,40 @@
+import pytest
+
+from app.schemas.schemas import FlashcardCreate
+from app.services.text_chunking import split_text, distribute_count, merge_flashcards
+
+
+def test_short_text_is_single_chunk():
+    assert split_text("  Krótki tekst.  ", 100) == ["Krótki tekst."]
+
+
+def test_split_prefers_paragraph_boundaries():
+    text = "A" * 40 + "\n\n" + "B" * 40 + "\n\n" + "C" * 40
+    assert split_text(text, 90) == ["A" * 40 + "\n\n" + "B" * 40, "C" * 40]
+
+
+def test_long_paragraph_is_split_on_sentences():
+    paragraph = " ".join(f"Sentence number {i}." for i in range(20))
+    chunks = split_text(paragraph, 60)
+    assert all(len(chunk) <= 60 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == paragraph
+
+
+@pytest.mark.parametrize("count, lengths, expected", [
+    (10, [100, 100], [5, 5]),
+    (5, [300, 100, 100], [3, 1, 1]),
+    (1, [10, 30, 20], [0, 1, 0]),
+])
+def test_distribute_count(count, lengths, expected):
+    chunks = ["x" * n for n in lengths]
+    allocation = distribute_count(count, chunks)
+    assert allocation == expected
+    assert sum(allocation) == count
+
+
+def test_merge_flashcards_deduplicates_and_limits():
+    first = [FlashcardCreate(question="What is DNA?", answer="A"), FlashcardCreate(question="Q2", answer="B")]
+    second = [FlashcardCreate(question="what is dna", answer="C"), FlashcardCreate(question="Q3", answer="D")]
+    merged = merge_flashcards([first, second], limit=3)
+    assert [fc.question for fc in merged] == ["What is DNA?", "Q2", "Q3"]
@@ -0,0 +1,55 @@
+from app.services.text_preprocessing import (
+    drop_repeated_lines,
+    estimate_tokens,
+    normalize_whitespace,
+    preprocess_text,
+    remove_duplicate_paragraphs,
+)
+
+
+def test_normalize_whitespace_collapses_spaces_and_blank_lines():
+    text = "  Pierwsza​   linia\t z tabem \r\n\r\n\r\n\r\nDruga linia   "
+    assert normalize_whitespace(text) == "Pierwsza linia z tabem\n\nDruga linia"
+
+
+def test_repeated_headers_and_boilerplate_are_dropped():
+    pages = []
+    for number in range(1, 4):
+        pages.append(f"Biologia - rozdział 2\nTreść strony {number} o komórkach.\nStrona {number} z 3")
+    text = "Skip to content\n" + "\n\n".join(pages)
+
+    cleaned, removed = drop_repeated_lines(text)
+
+    assert "Biologia - rozdział 2" not in cleaned
+    assert "Strona 2 z 3" not in cleaned
+    assert "Skip to content" not in cleaned
+    assert "Treść strony 2 o komórkach." in cleaned
+    assert removed == 7
+
+
+def test_exact_and_near_duplicate_paragraphs_are_removed():
+    paragraph = "Mitochondria produkują energię w postaci ATP podczas oddychania komórkowego w komórkach eukariotycznych."
+    near = paragraph.replace("produkują", "wytwarzają")
+    text = "\n\n".join([paragraph, "Rybosomy syntetyzują białka.", paragraph.upper(), near])
+
+    cleaned, removed = remove_duplicate_paragraphs(text, threshold=0.6)
+
+    assert cleaned == paragraph + "\n\nRybosomy syntetyzują białka."
+    assert removed == 2
+
+
+def test_preprocess_text_reports_trimming_and_stage_timings():
+    text = ("Akapit o fotosyntezie i chlorofilu w liściach roślin.\n\n" * 3) + "   Inny akapit.   "
+
+    cleaned, report = preprocess_text(text)
+
+    assert cleaned == "Akapit o fotosyntezie i chlorofilu w liściach roślin.\n\nInny akapit."
+    assert report.removed_lines + report.removed_paragraphs == 2
+    assert report.trimmed_chars == len(text) - len(cleaned)
+    assert report.cleaned_tokens == estimate_tokens(cleaned) < report.original_tokens
+    assert set(report.stage_timings) == {"whitespace", "repeated_lines", "duplicate_paragraphs", "token_estimate"}
+
+
+def test_text_that_would_be_emptied_is_kept():
+    cleaned, _ = preprocess_text("Menu")
+    assert cleaned == "Menu"
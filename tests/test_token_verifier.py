@@ -0,0 +1,108 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from jose import jwt
+
+from app.services import token_verifier
+from app.services.token_verifier import TokenCache, TokenVerificationError
+
+SECRET = "test-jwt-secret"
+
+
+def make_token(**overrides):
+    claims = {
+        "sub": "user-123",
+        "email": "user@example.com",
+        "role": "authenticated",
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+@pytest.fixture(autouse=True)
+def local_verifier(monkeypatch):
+    monkeypatch.setattr(token_verifier, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(token_verifier, "token_cache", TokenCache(max_size=2, ttl=300))
+    monkeypatch.setattr(token_verifier, "AUTH_REVOCATION_CHECK_INTERVAL", 60)
+
+
+def test_valid_token_is_verified_without_remote_call():
+    supabase = MagicMock()
+    user = token_verifier.get_user(make_token(), supabase)
+    assert user.id == "user-123"
+    assert user.email == "user@example.com"
+    supabase.auth.get_user.assert_not_called()
+
+
+@pytest.mark.parametrize("token", [
+    make_token(exp=int(time.time()) - 10),
+    make_token(aud="anon-other"),
+    jwt.encode({"sub": "x", "aud": "authenticated", "exp": int(time.time()) + 60}, "wrong-secret", algorithm="HS256"),
+    "not-a-jwt",
+])
+def test_invalid_tokens_are_rejected(token):
+    with pytest.raises(TokenVerificationError):
+        token_verifier.get_user(token, MagicMock())
+
+
+def test_cached_token_is_rechecked_after_revocation_interval(monkeypatch):
+    supabase = MagicMock()
+    token = make_token()
+    token_verifier.get_user(token, supabase)
+
+    monkeypatch.setattr(token_verifier, "AUTH_REVOCATION_CHECK_INTERVAL", 0)
+    supabase.auth.get_user.return_value = MagicMock(user=None)
+    with pytest.raises(TokenVerificationError):
+        token_verifier.get_user(token, supabase)
+    assert token_verifier.token_cache.get(token, time.time()) is None
+
+    # Unieważniony token nie może wrócić do cache po ponownej weryfikacji lokalnej
+    monkeypatch.setattr(token_verifier, "AUTH_REVOCATION_CHECK_INTERVAL", 60)
+    supabase.auth.get_user.reset_mock()
+    with pytest.raises(TokenVerificationError):
+        token_verifier.get_user(token, supabase)
+    assert token_verifier.token_cache.get(token, time.time()) is None
+    supabase.auth.get_user.assert_not_called()
+
+
+def test_failed_revocation_check_does_not_mark_token_fresh(monkeypatch):
+    supabase = MagicMock()
+    token = make_token()
+    token_verifier.get_user(token, supabase)
+
+    monkeypatch.setattr(token_verifier, "AUTH_REVOCATION_CHECK_INTERVAL", 0)
+    supabase.auth.get_user.side_effect = ConnectionError("supabase unreachable")
+    with pytest.raises(TokenVerificationError):
+        token_verifier.get_user(token, supabase)
+
+    supabase.auth.get_user.side_effect = None
+    supabase.auth.get_user.return_value = MagicMock(user=None)
+    with pytest.raises(TokenVerificationError):
+        token_verifier.get_user(token, supabase)
+
+
+def test_disabled_cache_checks_every_request(monkeypatch):
+    monkeypatch.setattr(token_verifier, "token_cache", TokenCache(max_size=0, ttl=300))
+    supabase = MagicMock()
+    token = make_token()
+    token_verifier.get_user(token, supabase)
+    token_verifier.get_user(token, supabase)
+    assert supabase.auth.get_user.call_count == 2
+
+    supabase.auth.get_user.return_value = MagicMock(user=None)
+    with pytest.raises(TokenVerificationError):
+        token_verifier.get_user(token, supabase)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TokenCache(max_size=2, ttl=300)
+    now = time.time()
+    cache.put("a", "user-a", now + 100, now)
+    cache.put("b", "user-b", now + 100, now)
+    cache.get("a", now)
+    cache.put("c", "user-c", now + 100, now)
+    assert cache.get("b", now) is None
+    assert cache.get("a", now).user == "user-a"
+    assert cache.get("c", now).expires_at == now + 100